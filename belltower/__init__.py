@@ -2,3 +2,5 @@ from belltower.bell import Bell
 from belltower.stroke import Stroke, HANDSTROKE, BACKSTROKE
 from belltower.bell_type import BellType, TOWER_BELLS, HAND_BELLS
 from belltower.ringing_room import RingingRoomTower
+from belltower.async_ringing_room import AsyncRingingRoomTower
+from belltower.tower_pool import TowerPool
@@ -0,0 +1,231 @@
+"""
+A module containing `StrikingAnalysis`, which measures how accurately each bell is struck.  All the
+statistics are computed with NumPy over whole touches at once, so analysing a peal takes
+milliseconds.  Requires `numpy` to be installed.
+"""
+
+from typing import Optional, Sequence, Any
+
+import numpy as np # type: ignore
+
+from belltower import Bell, Stroke, HANDSTROKE
+
+
+def _fit_rows(times: np.ndarray) -> Any:
+    """
+    Fits a straight line to the times of the blows in each row of a (rows x places) array, returning
+    the deviation of every blow from its row's line and the gap between blows in each row.  The
+    lines are the 'ideal' striking of each row, i.e. evenly spaced blows at the row's own speed.
+    """
+    places = np.arange(times.shape[1], dtype=np.float64)
+    places -= places.mean()
+    mean_times = times.mean(axis=1, keepdims=True)
+    gaps = (times - mean_times) @ places / max(places @ places, 1.0)
+    errors = times - mean_times - gaps[:, np.newaxis] * places
+    return errors, gaps
+
+
+class StrikingAnalysis:
+    """
+    Striking statistics for rows rung on a fixed number of bells.  Rows can be added one at a time
+    (e.g. from a `RowAssembler`), with the statistics of each row computed as it is added, or in
+    bulk with `add_rows`.  The deviation of each blow is measured from the 'ideal' time for its
+    place, found by fitting evenly spaced blows to its row.
+    """
+
+    def __init__(self, number_of_bells: int, handstroke_gap: float = 1.0,
+                 capacity: int = 1024) -> None:
+        """
+        Creates an empty analysis of rows on `number_of_bells` bells, rung with a handstroke gap of
+        `handstroke_gap` blows.  `capacity` is the number of rows to allocate space for initially
+        (more space is allocated as needed).
+        """
+        self.handstroke_gap = handstroke_gap
+        self._allocate(number_of_bells, max(capacity, 1))
+
+    # ===== ADDING ROWS =====
+
+    def attach(self, row_assembler: Any) -> None:
+        """
+        Analyses every row assembled by a `RowAssembler`.  If the assembler changes to a different
+        number of bells, the analysis is cleared.
+        """
+        row_assembler.on_row(self.add_row)
+        row_assembler.on_change(self._on_change)
+
+    def add_row(self, row: Sequence[Bell], stroke: Stroke, timestamps: Sequence[float]) -> None:
+        """ Adds one row, computing its deviations immediately. """
+        if len(row) != self.number_of_bells:
+            raise ValueError(f"Row has {len(row)} bells, but expected {self.number_of_bells}")
+        self._reserve(self._number_of_rows + 1)
+
+        r = self._number_of_rows
+        self._times[r] = timestamps
+        self._bells[r] = [bell.index for bell in row]
+        self._is_handstroke[r] = stroke.is_hand()
+        self._is_continuous[r] = self._next_row_is_continuous
+        self._next_row_is_continuous = True
+        self._number_of_rows += 1
+        self._compute(r, r + 1)
+
+    def add_rows(self, bells: Any, times: Any, first_stroke: Stroke = HANDSTROKE) -> None:
+        """
+        Adds a consecutive block of rows, given as (rows x places) arrays of bell indices and times,
+        where the strokes of the rows alternate starting with `first_stroke`.
+        """
+        bells = np.asarray(bells, dtype=np.intp)
+        times = np.asarray(times, dtype=np.float64)
+        if bells.shape != times.shape or bells.shape[1:] != (self.number_of_bells,):
+            raise ValueError(f"Expected two (rows x {self.number_of_bells}) arrays, "
+                             + f"got {bells.shape} and {times.shape}")
+        start = self._number_of_rows
+        end = start + len(bells)
+        self._reserve(end)
+
+        self._times[start:end] = times
+        self._bells[start:end] = bells
+        first_parity = 0 if first_stroke.is_hand() else 1
+        self._is_handstroke[start:end] = np.arange(len(bells)) % 2 == first_parity
+        self._is_continuous[start:end] = True
+        self._is_continuous[start] = self._next_row_is_continuous
+        self._next_row_is_continuous = True
+        self._number_of_rows = end
+        self._compute(start, end)
+
+    def break_touch(self) -> None:
+        """ Marks the next row as the start of a new touch, so no gap is measured before it. """
+        self._next_row_is_continuous = False
+
+    def clear(self, number_of_bells: Optional[int] = None) -> None:
+        """ Removes every row, optionally changing the number of bells. """
+        if number_of_bells is not None and number_of_bells != self.number_of_bells:
+            self._allocate(number_of_bells, len(self._times))
+            return
+        self._number_of_rows = 0
+        self._next_row_is_continuous = False
+
+    def recompute(self) -> None:
+        """ Recomputes the deviations of every row in one batch. """
+        self._compute(0, self._number_of_rows)
+
+    # ===== STATISTICS =====
+
+    @property
+    def number_of_rows(self) -> int:
+        """ Returns the number of rows that have been analysed. """
+        return self._number_of_rows
+
+    def deviations(self, stroke: Optional[Stroke] = None) -> np.ndarray:
+        """
+        Returns a (rows x bells) array of the number of seconds that each bell struck after its
+        ideal time in each row (negative if it was early), optionally only at one stroke.
+        """
+        return self._deviations[:self._number_of_rows][self._stroke_mask(stroke)]
+
+    def mean_deviation_by_bell(self, stroke: Optional[Stroke] = None) -> np.ndarray:
+        """ Returns the mean deviation of each bell, i.e. how late each bell tends to strike. """
+        return self.deviations(stroke).mean(axis=0)
+
+    def rms_by_bell(self, stroke: Optional[Stroke] = None) -> np.ndarray:
+        """ Returns the root-mean-square deviation of each bell. """
+        return np.sqrt(np.square(self.deviations(stroke)).mean(axis=0))
+
+    def rolling_rms_by_bell(self, window: int = 12) -> np.ndarray:
+        """
+        Returns a ((rows - window + 1) x bells) array of the RMS deviation of each bell over every
+        run of `window` consecutive rows.
+        """
+        if self._number_of_rows < window:
+            return np.empty((0, self.number_of_bells))
+        squares = np.square(self._deviations[:self._number_of_rows])
+        totals = np.cumsum(squares, axis=0)
+        totals = np.concatenate([np.zeros((1, self.number_of_bells)), totals])
+        return np.sqrt((totals[window:] - totals[:-window]) / window)
+
+    def handstroke_gap_errors(self) -> np.ndarray:
+        """
+        Returns the number of seconds by which each handstroke gap was longer than the ideal gap of
+        `handstroke_gap + 1` blows (negative if the gap was too short).
+        """
+        return self._row_gap_errors()[self._is_handstroke[:self._number_of_rows]
+                                      & self._is_continuous[:self._number_of_rows]]
+
+    def backstroke_gap_errors(self) -> np.ndarray:
+        """ Returns the number of seconds by which each gap before a backstroke was too long. """
+        return self._row_gap_errors()[~self._is_handstroke[:self._number_of_rows]
+                                      & self._is_continuous[:self._number_of_rows]]
+
+    def mean_gap(self) -> float:
+        """ Returns the mean gap between blows, in seconds. """
+        return float(self._gaps[:self._number_of_rows].mean()) if self._number_of_rows else 0.0
+
+    # ===== HELPER FUNCTIONS =====
+
+    def _allocate(self, number_of_bells: int, capacity: int) -> None:
+        """ Creates empty arrays with space for `capacity` rows of `number_of_bells` bells. """
+        self.number_of_bells = number_of_bells
+        self._number_of_rows = 0
+        # Indexed by (row, place)
+        self._times = np.empty((capacity, number_of_bells), dtype=np.float64)
+        self._bells = np.empty((capacity, number_of_bells), dtype=np.intp)
+        # Indexed by row
+        self._is_handstroke = np.empty(capacity, dtype=bool)
+        # False if a row doesn't follow on from the previous row (so there's no gap to measure)
+        self._is_continuous = np.empty(capacity, dtype=bool)
+        # The results of `_fit_rows`: deviations are indexed by (row, bell index)
+        self._deviations = np.empty((capacity, number_of_bells), dtype=np.float64)
+        self._gaps = np.empty(capacity, dtype=np.float64)
+
+        self._next_row_is_continuous = False
+
+    def _compute(self, start: int, end: int) -> None:
+        """ Computes the deviations of the rows in `start..end`. """
+        errors, self._gaps[start:end] = _fit_rows(self._times[start:end])
+        # Rearrange the deviations from place order into bell order
+        rows = np.arange(start, end)[:, np.newaxis]
+        self._deviations[rows, self._bells[start:end]] = errors
+
+    def _row_gap_errors(self) -> np.ndarray:
+        """
+        Returns the error in the gap before every row (between the last blow of the previous row and
+        the first blow of this one), which is meaningless for non-continuous rows.
+        """
+        n = self._number_of_rows
+        errors = np.zeros(n)
+        if n < 2:
+            return errors
+        times = self._times[:n]
+        actual = times[1:, 0] - times[:-1, -1]
+        # The ideal gap uses the average speed of the two rows either side of it
+        gap = (self._gaps[1:n] + self._gaps[:n - 1]) / 2
+        blows = np.where(self._is_handstroke[1:n], 1 + self.handstroke_gap, 1.0)
+        errors[1:] = actual - gap * blows
+        return errors
+
+    def _stroke_mask(self, stroke: Optional[Stroke]) -> Any:
+        """ Returns a mask selecting the rows at a given stroke (or every row if it is None). """
+        if stroke is None:
+            return slice(None)
+        is_handstroke = self._is_handstroke[:self._number_of_rows]
+        return is_handstroke if stroke.is_hand() else ~is_handstroke
+
+    def _reserve(self, number_of_rows: int) -> None:
+        """ Makes sure that there is space for at least `number_of_rows` rows. """
+        capacity = len(self._times)
+        if number_of_rows <= capacity:
+            return
+        while capacity < number_of_rows:
+            capacity *= 2
+        for name in ("_times", "_bells", "_is_handstroke", "_is_continuous", "_deviations",
+                     "_gaps"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._number_of_rows] = old[:self._number_of_rows]
+            setattr(self, name, new)
+
+    def _on_change(self, number_of_bells: int) -> None:
+        """ Called when the attached `RowAssembler` is reset. """
+        if number_of_bells != self.number_of_bells:
+            self.clear(number_of_bells)
+        else:
+            self.break_touch()
@@ -0,0 +1,458 @@
+"""
+A module containing an asyncio version of `RingingRoomTower`, which allows one event loop to drive
+many towers without needing a thread per connection.
+"""
+
+import asyncio
+import functools
+import inspect
+from typing import Optional, Callable, Dict, List, Iterable, Sequence, Set, Any
+
+import socketio # type: ignore
+
+from belltower import Bell, Stroke, BellType, call, tracing
+from belltower.chat import AsyncChatSender, PRIORITY_NORMAL
+from belltower.metadata_cache import MetadataCache
+from belltower.page_parsing import parse_page_async
+from belltower.ringing_room import BaseRingingRoomTower, SocketIOClientError, OUTAGE_REJECT, \
+    OUTAGE_QUEUE, JSON
+from belltower.row_gen import compile_row_gen
+from belltower.scheduling import AsyncStrikeScheduler, StrikeReport
+
+
+class AsyncRingingRoomTower(BaseRingingRoomTower):
+    """
+    A Tower for Ringing Room, driven by asyncio.  This has the same callback decorators as
+    `RingingRoomTower` (which can be given either normal functions or coroutine functions), but all
+    the actions are coroutines.  The connection is opened using `async with`:
+
+        async with AsyncRingingRoomTower(tower_id) as tower:
+            await tower.wait_loaded()
+            await tower.ring_bell(Bell.from_number(1))
+
+    Requires `aiohttp` to be installed.
+    """
+
+    def __init__(self, tower_id: int, url: str = "ringingroom.com",
+                 run_version_check: bool = True, session: Any = None,
+                 metadata_cache: Optional[MetadataCache] = None,
+                 outage_policy: str = OUTAGE_REJECT, queue_chat: bool = False) -> None:
+        """
+        Initialise a tower with a given room id and url.  Unlike `RingingRoomTower`, this doesn't
+        fetch anything until the tower is connected.  `session` is an optional
+        `aiohttp.ClientSession` to make HTTP requests with - if it is not given, the tower will
+        create (and close) its own.  `metadata_cache`, `outage_policy` and `queue_chat` are used in
+        the same way as by `RingingRoomTower`.
+        """
+        if outage_policy not in (OUTAGE_REJECT, OUTAGE_QUEUE):
+            raise ValueError(f"Unknown outage policy '{outage_policy}'")
+
+        self.tower_id = tower_id
+        self._http_server_url = url
+        self._run_version_check = run_version_check
+        self._metadata_cache = metadata_cache
+        self._metadata_is_cached = False
+        self._url: Optional[str] = None
+        self._tower_name: Optional[str] = None
+        self._bell_type: Optional[BellType] = None
+        self._socket_io_client: Optional[socketio.AsyncClient] = None
+        self._outage_policy = outage_policy
+        self._queue_chat = queue_chat
+
+        self._http_session = session
+        self._owns_http_session = False
+        # The tasks generated by coroutine callbacks, kept so that they don't get garbage collected
+        # before they finish
+        self._callback_tasks: Set[asyncio.Future] = set()
+        # The task finishing the re-sync of the tower state after a reconnect, if there is one
+        self._resync_task: Optional[asyncio.Future] = None
+        # The futures of the tasks currently suspended in `wait_for`
+        self._state_waiters: List[asyncio.Future] = []
+
+        self._init_state_and_callbacks()
+
+    # ===== CONNECTION =====
+
+    async def connect(self) -> None:
+        """ Fetches the tower page, then opens the socket-io connection and joins the tower. """
+        self.logger.debug("CONNECT")
+
+        if self._socket_io_client is not None:
+            raise Exception("Trying to connect twice")
+
+        if self._url is None:
+            await self.load_metadata()
+
+        try:
+            await self._create_client()
+        except socketio.exceptions.ConnectionError:
+            # The cached server may have been taken out of RR's load balancer
+            if not self._invalidate_cached_metadata():
+                raise
+            await self._fetch_metadata_async()
+            await self._create_client()
+
+    async def load_metadata(self) -> None:
+        """
+        Fetches the tower page and checks RR's version (or loads them from the metadata cache)
+        without connecting, so that `server_url` is known before `connect` is called.  `connect`
+        calls this if needed.
+        """
+        if self._http_session is None:
+            import aiohttp # type: ignore
+            self._http_session = aiohttp.ClientSession()
+            self._owns_http_session = True
+
+        if not self._load_cached_metadata():
+            await self._fetch_metadata_async()
+
+    async def disconnect(self) -> None:
+        """ Closes the socket-io connection, and cancels any still-running callbacks. """
+        self.logger.debug("DISCONNECT")
+        if self._socket_io_client:
+            self.logger.info("Disconnect")
+            # Remove the client first, so that `_on_disconnect` knows not to reconnect
+            client, self._socket_io_client = self._socket_io_client, None
+            # socket-io doesn't stop reconnecting when it is told to disconnect, so stop any
+            # reconnection attempts explicitly
+            client._reconnect_abort.set()
+            await client.disconnect()
+        self._connection_lost = False
+        self._outage_queue.clear()
+        self._state_before_resync = None
+        self._stop_chat_sender()
+        if self._resync_task is not None:
+            self._resync_task.cancel()
+            self._resync_task = None
+        for task in list(self._callback_tasks):
+            task.cancel()
+        if self._owns_http_session:
+            await self._http_session.close()
+            self._http_session = None
+            self._owns_http_session = False
+
+    async def check_version(self) -> str:
+        """
+        Checks that RR's version is compatible with this library, returning the version string.
+        """
+        # Get version from RR's API
+        async with self._http_session.get(self._version_api_url()) as response:
+            return self._check_version_response(await response.text())
+
+    async def _fetch_metadata_async(self) -> None:
+        """ Fetches the tower page (and the RR version, if needed), and adds them to the cache. """
+        self._url, self._tower_name, self._bell_type = await parse_page_async(
+            self.tower_id, self._http_server_url, self._http_session
+        )
+        rr_version = await self.check_version() if self._run_version_check else None
+        self._store_metadata(rr_version)
+
+    # ===== MISC =====
+
+    async def wait_loaded(self, timeout: Optional[float] = 10.0) -> None:
+        """
+        Pause the current task until this Tower's connection is open and stable, raising
+        `SocketIOClientError` if the bell state hasn't been received within `timeout` seconds.
+        """
+        if self._socket_io_client is None or not self._socket_io_client.connected:
+            raise SocketIOClientError("Not Connected")
+
+        if not await self.wait_for(self._loaded_predicate(), timeout):
+            raise SocketIOClientError("Not received bell state from RingingRoom")
+
+    # ===== WAITING FOR EVENTS =====
+    # These return False on timeout.
+
+    async def wait_for(self, predicate: Callable[[], bool],
+                       timeout: Optional[float] = None) -> bool:
+        """
+        Pause the current task until `predicate()` returns True, or until `timeout` seconds have
+        passed.  The predicate is re-checked as soon as each signal from Ringing Room is handled.
+        """
+        loop = asyncio.get_event_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while not predicate():
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                return False
+            waiter = loop.create_future()
+            self._state_waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                return predicate()
+        return True
+
+    async def wait_for_size(self, number_of_bells: int, timeout: Optional[float] = None) -> bool:
+        """ Pause the current task until the tower has a given number of bells. """
+        return await self.wait_for(self._size_predicate(number_of_bells), timeout)
+
+    async def wait_for_user(self, user_name: str, timeout: Optional[float] = None) -> bool:
+        """ Pause the current task until a user with a given name is in the tower. """
+        return await self.wait_for(self._user_predicate(user_name), timeout)
+
+    async def wait_for_call(self, call: str, timeout: Optional[float] = None) -> bool:
+        """ Pause the current task until a given call is next made (e.g. `call.LOOK_TO`). """
+        return await self.wait_for(self._call_predicate(call), timeout)
+
+    async def wait_for_set_at_hand(self, timeout: Optional[float] = None) -> bool:
+        """ Pause the current task until the bells are next set at handstroke. """
+        return await self.wait_for(self._set_at_hand_predicate(), timeout)
+
+    # ===== ACTIONS =====
+
+    async def ring_bell(self, bell: Bell, expected_stroke: Optional[Stroke] = None) -> bool:
+        """
+        Send a request to the the server if the bell can be rung on the given stroke.  Returns
+        `true` if the bell was rung successfully.
+        """
+        try:
+            data = self._bell_rung_data(bell, expected_stroke)
+            if data is None:
+                return False
+            self.metrics.record_ring_sent(bell.index, data["stroke"])
+            await self._emit("c_bell_rung", data)
+            return True
+        except Exception as e:
+            self.logger.error(e)
+            return False
+
+    async def set_at_hand(self) -> None:
+        """ Sets all the bells at handstroke. """
+        self.logger.info("(EMIT): Setting bells at handstroke")
+        await self._emit("c_set_bells", {"tower_id": self.tower_id})
+
+    async def set_size(self, number: int) -> None:
+        """ Set the number of bells in the tower. """
+        self.logger.info("(EMIT): Setting size to %s", number)
+        await self._emit("c_size_change", {"new_size": number, "tower_id": self.tower_id})
+
+    async def set_bell_type(self, new_type: BellType) -> None:
+        """ Set the bell type (tower or hand) of the current tower. """
+        self.logger.info("(EMIT): Setting bell type to %s", new_type)
+        await self._emit("c_audio_change", {
+            "new_audio": new_type.ringingroom_name(),
+            "tower_id": self.tower_id
+        })
+
+    async def assign(self, user_id: Optional[int], bell: Bell) -> None:
+        """ Assign a user to a given bell. """
+        await self._emit("c_assign_user", self._assign_user_data(user_id, bell))
+
+    async def unassign(self, bell: Bell) -> None:
+        """ Clear the assignment for a given bell. """
+        await self.assign(None, bell)
+
+    async def unassign_all(self) -> None:
+        """ Unassign all the bells. """
+        for b in range(self.number_of_bells):
+            await self.assign(None, Bell.from_index(b))
+
+    async def ring_rows(self, rows: Iterable[Sequence[Bell]], peal_speed: float = 180.0,
+                        handstroke_gap: float = 1.0) -> StrikeReport:
+        """
+        Rings a sequence of rows (starting at handstroke) at a steady speed, sleeping until each
+        blow's absolute deadline on the event loop's clock (see `RingingRoomTower.ring_rows`).
+        Returns once all the rows have been rung (or `stop_ringing` is called).
+        """
+        self._strike_scheduler = AsyncStrikeScheduler(self, peal_speed, handstroke_gap)
+        try:
+            return await self._strike_scheduler.ring_rows(rows)
+        finally:
+            self._strike_scheduler = None
+
+    def stop_ringing(self) -> None:
+        """ Stops `ring_rows` before its next blow.  Must be called from the event loop thread. """
+        if self._strike_scheduler is not None:
+            self._strike_scheduler.stop()
+
+    async def chat(self, user: str, message: str, email: str = "<belltower.py>",
+                   priority: int = PRIORITY_NORMAL) -> Optional[asyncio.Future]:
+        """
+        Sends a message on chat, using given user name (which doesn't have to valid).  If the tower
+        queues chat messages, this returns as soon as the message is queued, with a future which
+        resolves when it has been sent (see `RingingRoomTower.chat`).
+        """
+        if not self._queue_chat:
+            await self._send_chat(user, message, email)
+            return None
+        self._check_can_emit()
+        self.logger.debug("Queueing chat msg as '%s'/%s: %s", user, email, message)
+        if self._chat_sender is None:
+            self._chat_sender = AsyncChatSender(self._create_chat_queue(), self._send_chat)
+        return asyncio.wrap_future(self._chat_sender.put(user, message, email, priority))
+
+    async def set_wheatley_setting(self, name: str, value: Any) -> None:
+        """ Changes one of Wheatley's settings for everyone in the tower. """
+        await self.set_wheatley_settings({name: value})
+
+    async def set_wheatley_settings(self, settings: JSON) -> None:
+        """ Changes many of Wheatley's settings (given as a map from name to value) at once. """
+        self.logger.info("(EMIT): Changing Wheatley settings %s", settings)
+        await self._emit("c_wheatley_setting", {"tower_id": self.tower_id, "settings": settings})
+
+    async def set_row_gen(self, spec: JSON) -> None:
+        """
+        Changes the row generator (method or composition) for everyone in the tower, compiling it
+        straight away (see `RingingRoomTower.set_row_gen`).
+        """
+        row_gen = compile_row_gen(spec)
+        self.logger.info("(EMIT): Changing row generator to %s", row_gen)
+        await self._emit("c_wheatley_row_gen", {"tower_id": self.tower_id, "row_gen": spec})
+
+    async def stop_touch(self) -> None:
+        """ Stops the touch being rung by Wheatley. """
+        self.logger.info("(EMIT): Stopping touch")
+        await self._emit("c_wheatley_stop_touch", {"tower_id": self.tower_id})
+
+    async def make_call(self, call: str) -> None:
+        """
+        Broadcast a given call to all the users in the Tower.  This does not have to have a
+        corresponding sound (like 'Bob', 'Single', 'Look To', etc.), any string can be passed and
+        will appear in the centre of everyone's screens.
+        """
+        self.logger.info("(EMIT): Calling '%s'", call)
+        await self._emit("c_call", {"call": call, "tower_id": self.tower_id})
+
+    async def call_bob(self) -> None:
+        """ Calls a 'Bob' in the current tower.  Identical to `make_call(call.BOB)`. """
+        await self.make_call(call.BOB)
+
+    async def call_single(self) -> None:
+        """ Calls a 'Single' in the current tower.  Identical to `make_call(call.SINGLE)`. """
+        await self.make_call(call.SINGLE)
+
+    async def call_look_to(self) -> None:
+        """ Calls 'Look To' in the current tower.  Identical to `make_call(call.LOOK_TO)`. """
+        await self.make_call(call.LOOK_TO)
+
+    async def call_go(self) -> None:
+        """ Calls 'Go' in the current tower.  Identical to `make_call(call.GO)`. """
+        await self.make_call(call.GO)
+
+    async def call_thats_all(self) -> None:
+        """ Calls 'That's All' in the current tower.  Identical to `make_call(call.THATS_ALL)`. """
+        await self.make_call(call.THATS_ALL)
+
+    async def call_stand(self) -> None:
+        """ Calls 'Stand' in the current tower.  Identical to `make_call(call.STAND)`. """
+        await self.make_call(call.STAND)
+
+    # ===== HELPER FUNCTIONS =====
+
+    async def _emit(self, event: str, data: Any) -> None:
+        """ Emit a socket-io signal. """
+        if self.tracer.enabled_for(tracing.EMIT):
+            self.tracer.trace(tracing.EMIT, event, data)
+        if not self.is_connected:
+            self._emit_while_disconnected(event, data)
+            return
+        await self._send(event, data)
+
+    async def _send(self, event: str, data: Any) -> None:
+        """ Sends a socket-io signal immediately, without checking for an outage. """
+        if self._socket_io_client is None:
+            raise SocketIOClientError("Not Connected")
+        await self._socket_io_client.emit(event, data)
+
+    def _invoke_callbacks(self, event_type: str, callbacks: List[Callable[..., Any]],
+                          *args: Any) -> None:
+        """
+        Run every callback in a list of user callbacks with the given arguments.  Coroutine
+        callbacks are scheduled as tasks, so that they can't hold up the processing of other
+        signals.
+        """
+        if self._callbacks_held_back(event_type):
+            return
+        for c in callbacks:
+            result = c(*args)
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                self._callback_tasks.add(task)
+                task.add_done_callback(self._on_callback_task_done)
+
+    def _on_callback_task_done(self, task: asyncio.Future) -> None:
+        """ Called when the task of a coroutine callback finishes. """
+        self._callback_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error("Callback raised %r", task.exception())
+
+    def _notify_state_changed(self) -> None:
+        """ Wakes up the tasks waiting in `wait_for`, so that they re-check their predicates. """
+        waiters, self._state_waiters = self._state_waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _queue_depth_gauges(self) -> Dict[str, Callable[[], int]]:
+        """ Returns functions which measure the depths of this tower's queues, for `metrics`. """
+        return {
+            "callbacks": lambda: len(self._callback_tasks),
+            "chat": lambda: self._chat_queue.depth if self._chat_queue else 0,
+        }
+
+    # === INITIALISATION CODE ===
+
+    async def _create_client(self) -> None:
+        """ Generates the socket-io client and attaches callbacks. """
+        self._socket_io_client = socketio.AsyncClient(
+            reconnection_delay=self.RECONNECT_DELAY,
+            reconnection_delay_max=self.RECONNECT_DELAY_MAX
+        )
+        self._socket_io_client.on("connect", self._on_connect)
+        self._socket_io_client.on("disconnect", self._on_disconnect)
+        for event in self._signal_handlers:
+            self._socket_io_client.on(event, functools.partial(self._handle_signal, event))
+
+        await self._socket_io_client.connect(self._url)
+        self.logger.debug("Connected to %s", self._url)
+
+        await self._join_tower()
+        await self._request_global_state()
+
+    async def _join_tower(self) -> None:
+        """ Joins the tower as an anonymous user. """
+        self.logger.info("(EMIT): Joining tower %s", self.tower_id)
+        await self._send(
+            "c_join",
+            {"anonymous_user": True, "tower_id": self.tower_id},
+        )
+
+    async def _request_global_state(self) -> None:
+        """ Send a request to the server to get the current state of the tower. """
+        self.logger.debug("(EMIT): Requesting global state.")
+        await self._send('c_request_global_state', {"tower_id": self.tower_id})
+
+    # === RECONNECTING ===
+
+    async def _on_connect(self) -> None:
+        """ Called whenever the socket-io connection opens, including when reconnecting. """
+        if self._start_reconnect():
+            await self._rejoin()
+            if self._resync_task is None or self._resync_task.done():
+                self._resync_task = asyncio.ensure_future(self._settle_resync())
+
+    async def _rejoin(self) -> None:
+        """ Re-joins the tower, then sends the signals that were queued whilst disconnected. """
+        await self._join_tower()
+        await self._request_global_state()
+        while self._outage_queue:
+            await self._send(*self._outage_queue.popleft())
+
+    async def _settle_resync(self) -> None:
+        """ Waits for the new state to arrive after reconnecting, then finishes the re-sync. """
+        delay = self._try_finish_resync()
+        while delay is not None:
+            await asyncio.sleep(delay)
+            delay = self._try_finish_resync()
+
+    # === ENTER/EXIT FOR 'ASYNC WITH' BLOCKS ===
+
+    async def __aenter__(self) -> Any:
+        """ Called when entering an 'async with' block.  Opens the socket-io connection. """
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        """ Called when finishing an 'async with' block.  Disconnects the session. """
+        await self.disconnect()
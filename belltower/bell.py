@@ -11,7 +11,13 @@ MAX_BELL = len(BELL_NAMES)
 
 
 class Bell:
-    """ A class to encapsulate the idea of a bell. """
+    """
+    A class to encapsulate the idea of a bell.  Bells are immutable and interned, so there is only
+    ever one `Bell` object for each bell (meaning that creating Bells never allocates, and `==` is
+    just an identity check).
+    """
+
+    __slots__ = ("index",)
 
     @classmethod
     def from_str(cls, bell_str: str) -> 'Bell':
@@ -25,7 +31,7 @@ class Bell:
         except ValueError as e:
             raise ValueError(f"'{bell_str}' is not known bell symbol") from e
 
-        return cls(index)
+        return _BELLS[index]
 
     @classmethod
     def from_number(cls, bell_num: int) -> 'Bell':
@@ -33,7 +39,9 @@ class Bell:
         Generates a Bell from a 1-indexed number, so Bell.from_number(1) will return a Bell
         representing the treble.
         """
-        return cls(bell_num - 1)
+        if bell_num < 1 or bell_num > MAX_BELL:
+            raise ValueError(f"'{bell_num}' is not known bell number")
+        return _BELLS[bell_num - 1]
 
     @classmethod
     def from_index(cls, bell_index: int) -> 'Bell':
@@ -41,17 +49,23 @@ class Bell:
         Generates a Bell from a 0-indexed number, so Bell.from_number(0) will return a Bell
         representing the treble.
         """
-        return cls(bell_index)
+        if bell_index < 0 or bell_index >= MAX_BELL:
+            raise ValueError(f"'{bell_index}' is not known bell index")
+        return _BELLS[bell_index]
 
-    def __init__(self, index: int) -> None:
+    def __new__(cls, index: int) -> 'Bell':
         """
-        Constructs a Bell from a given 0-indexed index.  Should not be used outside this class -
-        see `Bell.from_index` and `Bell.from_number` instead.
+        Returns the Bell with a given 0-indexed index.  Should not be used outside this class - see
+        `Bell.from_index` and `Bell.from_number` instead.
         """
-        if index < 0 or index >= len(BELL_NAMES):
-            raise ValueError(f"'{index}' is not known bell index")
+        return cls.from_index(index)
 
-        self.index = index
+    @classmethod
+    def _create(cls, index: int) -> 'Bell':
+        """ Allocates a new Bell object.  Only used to build the table of interned Bells. """
+        bell = object.__new__(cls)
+        bell.index = index
+        return bell
 
     @property
     def number(self) -> int:
@@ -66,9 +80,17 @@ class Bell:
         return str(self)
 
     def __eq__(self, other: Any) -> bool:
-        """ Determines if two Bells are equal. """
-        return isinstance(other, Bell) and other.index == self.index
+        """ Determines if two Bells are equal.  Bells are interned, so this checks identity. """
+        return self is other
 
     def __hash__(self) -> int:
         """ Generates a has of a Bell. """
         return self.index
+
+    def __reduce__(self) -> Any:
+        """ Makes sure that copying or unpickling a Bell returns the interned Bell. """
+        return (Bell.from_index, (self.index,))
+
+
+# The table of interned Bells, indexed by `Bell.index`
+_BELLS = tuple(Bell._create(i) for i in range(MAX_BELL))
@@ -1,8 +1,23 @@
+from typing import Any
+
+
 class BellType:
-    """ The appearance and sounds of the bells in Ringing Room (either HAND_BELLS or TOWER_BELLS). """
+    """
+    The appearance and sounds of the bells in Ringing Room (either HAND_BELLS or TOWER_BELLS).  Like
+    `Stroke`, `BellType(x)` returns one of those two constants rather than creating a new object.
+    """
+
+    __slots__ = ("_is_hand",)
 
-    def __init__(self, is_hand: bool):
-        self._is_hand = is_hand
+    def __new__(cls, is_hand: bool) -> "BellType":
+        return HAND_BELLS if is_hand else TOWER_BELLS
+
+    @classmethod
+    def _create(cls, is_hand: bool) -> "BellType":
+        """ Allocates a new BellType object.  Only used to create HAND_BELLS and TOWER_BELLS. """
+        bell_type = object.__new__(cls)
+        bell_type._is_hand = is_hand
+        return bell_type
 
     def is_handbells(self) -> bool:
         """ Returns True if the tower is using hand bells. """
@@ -35,11 +50,16 @@ class BellType:
         return str(self)
 
     def __eq__(self, other) -> bool:
-        return isinstance(other, BellType) and other._is_hand == self._is_hand
+        # BellTypes are interned, so this is an identity check
+        return self is other
 
     def __hash__(self) -> int:
         """ Generates a has of a Bell. """
         return hash(self._is_hand)
 
-HAND_BELLS = BellType(True)
-TOWER_BELLS = BellType(False)
+    def __reduce__(self) -> Any:
+        """ Makes sure that copying or unpickling a BellType returns HAND_BELLS or TOWER_BELLS. """
+        return (BellType, (self._is_hand,))
+
+HAND_BELLS = BellType._create(True)
+TOWER_BELLS = BellType._create(False)
@@ -0,0 +1,337 @@
+"""
+A module containing the queue which chat messages are sent through.  Messages are rate limited by
+token buckets (one per tower, and one shared by every tower on the same socket-io server), messages
+from the same user which are queued close together are merged into one, and low-priority messages
+are dropped (and summarised in the next message) when the queue overflows.
+"""
+
+import asyncio
+import concurrent.futures
+import itertools
+import logging
+import threading
+import time
+from typing import Optional, Callable, Dict, List, Tuple, Any
+
+# Message priorities (lower values are sent first, and dropped last)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class TokenBucket:
+    """
+    A token bucket which refills at `rate` tokens per second, up to `burst` tokens.  Safe to share
+    between threads.
+    """
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, now: Optional[float] = None) -> float:
+        """
+        Takes a token if one is available, returning 0.  Otherwise, returns the number of seconds
+        until one will be available (and takes nothing).
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def wait_time(self, now: Optional[float] = None) -> float:
+        """ Returns the number of seconds until a token will be available, without taking one. """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            return max(0.0, (1 - self._tokens) / self.rate)
+
+    def give_back(self) -> None:
+        """ Returns a token which was taken but not used. """
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def _refill(self, now: float) -> None:
+        """ Adds the tokens generated since the last refill.  Must hold `_lock`. """
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = max(self._last_refill, now)
+
+
+# The token buckets shared by every tower connected to each socket-io server
+_server_buckets: Dict[str, TokenBucket] = {}
+_server_buckets_lock = threading.Lock()
+
+
+def server_bucket(server_url: str, rate: float, burst: float) -> TokenBucket:
+    """
+    Returns the token bucket shared by every tower on a given socket-io server, creating it (with
+    the given rate and burst) if it doesn't exist.
+    """
+    with _server_buckets_lock:
+        bucket = _server_buckets.get(server_url)
+        if bucket is None:
+            bucket = TokenBucket(rate, burst)
+            _server_buckets[server_url] = bucket
+        return bucket
+
+
+class _Message:
+    """ A chat message waiting to be sent. """
+
+    __slots__ = ("user", "message", "email", "priority", "sequence", "queue_time", "future")
+
+    def __init__(self, user: str, message: str, email: str, priority: int, sequence: int,
+                 queue_time: float) -> None:
+        self.user = user
+        self.message = message
+        self.email = email
+        self.priority = priority
+        self.sequence = sequence
+        self.queue_time = queue_time
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+
+
+# A batch of merged messages, as (user, message, email, futures of the merged messages)
+ChatBatch = Tuple[str, str, str, List[concurrent.futures.Future]]
+
+
+class ChatQueue:
+    """
+    The queue of chat messages waiting to be sent by one tower.  This only decides what to send and
+    when - the messages are sent by a `ChatSender` (or `AsyncChatSender`), which calls `poll`.
+    """
+
+    logger_name = "CHAT"
+
+    def __init__(self, tower_bucket: TokenBucket, server_bucket: Optional[TokenBucket] = None,
+                 coalesce_window: float = 0.25, max_depth: int = 50, max_length: int = 500,
+                 separator: str = " | ") -> None:
+        """
+        Creates a queue which sends a message whenever both `tower_bucket` and `server_bucket` have
+        a token.  Messages from the same user are held for `coalesce_window` seconds so that they
+        can be merged (up to `max_length` characters, joined with `separator`), and once `max_depth`
+        messages are waiting the lowest-priority message is dropped.
+        """
+        self.tower_bucket = tower_bucket
+        self.server_bucket = server_bucket
+        self.coalesce_window = coalesce_window
+        self.max_depth = max_depth
+        self.max_length = max_length
+        self.separator = separator
+
+        self._messages: List[_Message] = []
+        self._sequence_numbers = itertools.count()
+        self._lock = threading.Lock()
+        # The number of messages dropped since a message was last sent
+        self._unreported_drops = 0
+
+        self.messages_sent = 0
+        self.messages_merged = 0
+        self.messages_dropped = 0
+
+        self.logger = logging.getLogger(self.logger_name)
+
+    def put(self, user: str, message: str, email: str,
+            priority: int = PRIORITY_NORMAL) -> concurrent.futures.Future:
+        """
+        Queues a message, returning a future which resolves when it has been sent (possibly merged
+        with other messages), or is cancelled if the message is dropped.
+        """
+        entry = _Message(user, message, email, priority, next(self._sequence_numbers),
+                         time.monotonic())
+        with self._lock:
+            self._messages.append(entry)
+            if len(self._messages) > self.max_depth:
+                # Drop the newest of the lowest-priority messages
+                dropped = max(self._messages, key=lambda m: (m.priority, m.sequence))
+                self._messages.remove(dropped)
+                self._unreported_drops += 1
+                self.messages_dropped += 1
+                dropped.future.cancel()
+                self.logger.debug("Dropped chat message '%s'", dropped.message)
+        return entry.future
+
+    @property
+    def depth(self) -> int:
+        """ Returns the number of messages waiting to be sent. """
+        return len(self._messages)
+
+    def poll(self, now: Optional[float] = None) -> Tuple[Optional[ChatBatch], Optional[float]]:
+        """
+        Returns a batch of merged messages if one should be sent now (with None), or otherwise
+        (None and) the number of seconds to wait before polling again, or (None, None) if the queue
+        is empty.
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            if not self._messages:
+                return None, None
+            head = min(self._messages, key=lambda m: (m.priority, m.sequence))
+            # High priority messages aren't held back to be merged
+            if head.priority != PRIORITY_HIGH:
+                remaining = head.queue_time + self.coalesce_window - now
+                if remaining > 0:
+                    return None, remaining
+            wait = self.tower_bucket.wait_time(now)
+            if self.server_bucket is not None:
+                wait = max(wait, self.server_bucket.wait_time(now))
+            if wait > 0:
+                return None, wait
+            if not self._take_tokens(now):
+                return None, 0.01
+            return self._merge(head), None
+
+    def cancel_all(self) -> None:
+        """ Removes every message from the queue, cancelling their futures. """
+        with self._lock:
+            for entry in self._messages:
+                entry.future.cancel()
+            self._messages.clear()
+
+    # ===== HELPER FUNCTIONS =====
+
+    def _take_tokens(self, now: float) -> bool:
+        """ Takes a token from both buckets, or neither (if another tower took the last one). """
+        if self.tower_bucket.take(now) > 0:
+            return False
+        if self.server_bucket is not None and self.server_bucket.take(now) > 0:
+            self.tower_bucket.give_back()
+            return False
+        return True
+
+    def _merge(self, head: _Message) -> ChatBatch:
+        """ Removes `head` and the messages which can be merged with it.  Must hold `_lock`. """
+        merged = [head]
+        length = len(head.message)
+        for entry in self._messages:
+            if entry is head or entry.user != head.user or entry.email != head.email:
+                continue
+            length += len(self.separator) + len(entry.message)
+            if length > self.max_length:
+                break
+            merged.append(entry)
+        merged.sort(key=lambda m: m.sequence)
+        merged_ids = set(map(id, merged))
+        self._messages = [m for m in self._messages if id(m) not in merged_ids]
+
+        message = self.separator.join(m.message for m in merged)
+        if self._unreported_drops:
+            message += f" (+{self._unreported_drops} messages dropped)"
+            self._unreported_drops = 0
+        self.messages_sent += 1
+        self.messages_merged += len(merged) - 1
+        return head.user, message, head.email, [m.future for m in merged]
+
+
+def _resolve(futures: List[concurrent.futures.Future], exception: Optional[Exception]) -> None:
+    """ Resolves the futures of a batch of messages after it has been sent. """
+    for future in futures:
+        if future.set_running_or_notify_cancel():
+            if exception is None:
+                future.set_result(None)
+            else:
+                future.set_exception(exception)
+
+
+class ChatSender:
+    """ Sends the messages from a `ChatQueue` from a background thread. """
+
+    def __init__(self, queue: ChatQueue, send: Callable[[str, str, str], Any]) -> None:
+        """ Creates a sender which sends each batch of messages with `send(user, msg, email)`. """
+        self.queue = queue
+        self._send = send
+        self._wakeup = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="belltower-chat")
+        self._thread.start()
+
+    def put(self, user: str, message: str, email: str,
+            priority: int = PRIORITY_NORMAL) -> concurrent.futures.Future:
+        """ Queues a message to be sent (see `ChatQueue.put`). """
+        future = self.queue.put(user, message, email, priority)
+        with self._wakeup:
+            self._wakeup.notify()
+        return future
+
+    def stop(self, timeout: float = 1.0) -> None:
+        """ Stops the sender thread, cancelling any messages which haven't been sent yet. """
+        with self._wakeup:
+            self._running = False
+            self._wakeup.notify()
+        self._thread.join(timeout)
+        self.queue.cancel_all()
+
+    def _run(self) -> None:
+        """ The body of the sender thread. """
+        while True:
+            with self._wakeup:
+                if not self._running:
+                    return
+                batch, wait = self.queue.poll()
+                if batch is None:
+                    self._wakeup.wait(wait)
+                    continue
+            user, message, email, futures = batch
+            try:
+                self._send(user, message, email)
+            except Exception as e:
+                self.queue.logger.error("Failed to send chat message: %s", e)
+                _resolve(futures, e)
+            else:
+                _resolve(futures, None)
+
+
+class AsyncChatSender:
+    """ Sends the messages from a `ChatQueue` from an asyncio task. """
+
+    def __init__(self, queue: ChatQueue, send: Callable[[str, str, str], Any]) -> None:
+        """
+        Creates a sender which sends each batch of messages with `await send(user, message, email)`.
+        Must be created from a coroutine.
+        """
+        self.queue = queue
+        self._send = send
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+
+    def put(self, user: str, message: str, email: str,
+            priority: int = PRIORITY_NORMAL) -> concurrent.futures.Future:
+        """ Queues a message to be sent (see `ChatQueue.put`). """
+        future = self.queue.put(user, message, email, priority)
+        self._wakeup.set()
+        return future
+
+    def stop(self) -> None:
+        """ Cancels the sender task, and any messages which haven't been sent yet. """
+        self._task.cancel()
+        self.queue.cancel_all()
+
+    async def _run(self) -> None:
+        """ The body of the sender task. """
+        while True:
+            # Clear the event before polling, so that a message queued after polling still wakes us
+            self._wakeup.clear()
+            batch, wait = self.queue.poll()
+            if batch is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            user, message, email, futures = batch
+            try:
+                await self._send(user, message, email)
+            except Exception as e:
+                self.queue.logger.error("Failed to send chat message: %s", e)
+                _resolve(futures, e)
+            else:
+                _resolve(futures, None)
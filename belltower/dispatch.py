@@ -0,0 +1,137 @@
+"""
+A module containing `CallbackDispatcher`, which runs a tower's user callbacks on executor threads
+rather than on the socket-io receive thread, so that a slow callback can't hold up the processing of
+the signals that come after it.
+"""
+
+import collections
+import logging
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Optional, Callable, Deque, Dict, List, Hashable, Tuple, Any
+
+# The event type passed to the dispatcher for bell rings, which are run on their own executor
+BELL_RING = "bell_ring"
+
+# How the callbacks of each tower are ordered (see `CallbackDispatcher`)
+ORDER_PER_TOWER = "tower"
+ORDER_PER_EVENT = "event"
+ORDER_PER_BELL = "bell"
+
+# A batch of callbacks and the arguments to call them with
+_Job = Tuple[List[Callable[..., Any]], Tuple[Any, ...]]
+
+
+class _Lane:
+    """ A queue of jobs which must be run one at a time, in order. """
+
+    __slots__ = ("jobs", "running")
+
+    def __init__(self) -> None:
+        self.jobs: Deque[_Job] = collections.deque()
+        self.running = False
+
+
+class CallbackDispatcher:
+    """
+    Runs callbacks on executor threads.  Callbacks are split into 'lanes' - each lane's callbacks
+    are run in the order their events were received, but different lanes can run concurrently.
+    Every tower has its own lanes, which are split according to `ordering`:
+
+    - `ORDER_PER_EVENT` (the default): one lane per event type (e.g. all of a tower's chat
+      callbacks run in order), and bell ring callbacks are run on a dedicated executor so that they
+      never queue behind any other callbacks.
+    - `ORDER_PER_BELL`: like `ORDER_PER_EVENT`, but each bell gets its own lane (so ring callbacks
+      are only ordered within each bell).
+    - `ORDER_PER_TOWER`: one lane for all of a tower's callbacks, so that they run in exactly the
+      order that their events were received.  Use this if callbacks of different types share state
+      (e.g. ring callbacks which are reset by a size change callback).
+
+    One dispatcher can be shared between many towers - it is up to the owner to call `shutdown`.
+    """
+
+    logger_name = "DISPATCH"
+
+    def __init__(self, executor: Optional[Executor] = None, ordering: str = ORDER_PER_EVENT,
+                 ring_workers: int = 4) -> None:
+        """
+        Creates a dispatcher which runs non-ring callbacks on `executor` (or on a new thread pool if
+        that isn't given).  Bell ring callbacks run on a thread pool of `ring_workers` threads
+        owned by the dispatcher, unless `ordering` is `ORDER_PER_TOWER`.
+        """
+        if ordering not in (ORDER_PER_TOWER, ORDER_PER_EVENT, ORDER_PER_BELL):
+            raise ValueError(f"Unknown callback ordering '{ordering}'")
+        self.ordering = ordering
+
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(thread_name_prefix="belltower-callback")
+        self._ring_executor = ThreadPoolExecutor(
+            max_workers=ring_workers,
+            thread_name_prefix="belltower-ring-callback"
+        )
+
+        # Lanes are removed once they are empty, so that towers don't stay referenced forever
+        self._lanes: Dict[Hashable, _Lane] = {}
+        self._lock = threading.Lock()
+        self._queue_depth = 0
+
+        self.logger = logging.getLogger(self.logger_name)
+
+    def dispatch(self, tower: Hashable, event_type: str, callbacks: List[Callable[..., Any]],
+                 *args: Any) -> None:
+        """
+        Queues a list of callbacks for an event received by `tower`, which will be run with the
+        given arguments.  For bell rings, the first argument is the Bell that rang.
+        """
+        if not callbacks:
+            return
+
+        lane_key = self._lane_key(tower, event_type, args)
+        with self._lock:
+            lane = self._lanes.get(lane_key)
+            if lane is None:
+                lane = self._lanes[lane_key] = _Lane()
+            lane.jobs.append((callbacks, args))
+            self._queue_depth += 1
+            if lane.running:
+                return
+            lane.running = True
+        use_ring_executor = event_type == BELL_RING and self.ordering != ORDER_PER_TOWER
+        executor = self._ring_executor if use_ring_executor else self._executor
+        executor.submit(self._drain, lane_key, lane)
+
+    @property
+    def queue_depth(self) -> int:
+        """ Returns the number of events whose callbacks haven't finished running. """
+        return self._queue_depth
+
+    def shutdown(self, wait: bool = True) -> None:
+        """ Shuts down the executors, optionally waiting for the queued callbacks to run. """
+        self._ring_executor.shutdown(wait)
+        if self._owns_executor:
+            self._executor.shutdown(wait)
+
+    def _lane_key(self, tower: Hashable, event_type: str, args: Tuple[Any, ...]) -> Hashable:
+        """ Returns the key of the lane which runs the callbacks of an event. """
+        if self.ordering == ORDER_PER_TOWER:
+            return tower
+        if self.ordering == ORDER_PER_BELL and event_type == BELL_RING:
+            return (tower, event_type, args[0])
+        return (tower, event_type)
+
+    def _drain(self, lane_key: Hashable, lane: _Lane) -> None:
+        """ Runs the jobs in a lane until it is empty. """
+        while True:
+            with self._lock:
+                if not lane.jobs:
+                    lane.running = False
+                    del self._lanes[lane_key]
+                    return
+                callbacks, args = lane.jobs.popleft()
+            for c in callbacks:
+                try:
+                    c(*args)
+                except Exception:
+                    self.logger.exception("Callback %r raised an exception", c)
+            with self._lock:
+                self._queue_depth -= 1
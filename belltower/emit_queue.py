@@ -0,0 +1,132 @@
+"""
+A module containing a queue of outgoing socket-io signals, which are sent by a dedicated thread so
+that actions (e.g. ringing bells) don't block the caller on the transport.
+"""
+
+import concurrent.futures
+import heapq
+import itertools
+import logging
+import threading
+from typing import Optional, Callable, Dict, List, Tuple, Any
+
+# Signal priorities (lower values are sent first).  Bell rings jump ahead of everything else, so
+# that the timing of ringing doesn't suffer when lots of other traffic is being sent.
+PRIORITY_RING = 0
+PRIORITY_CALL = 1
+PRIORITY_CONTROL = 2
+PRIORITY_CHAT = 3
+
+EVENT_PRIORITIES: Dict[str, int] = {
+    "c_bell_rung": PRIORITY_RING,
+    "c_call": PRIORITY_CALL,
+    "c_msg_sent": PRIORITY_CHAT,
+}
+
+
+class EmitQueueFullError(Exception):
+    """ Error created when a signal is added to an `EmitQueue` which is already full. """
+
+    def __init__(self, event: str, max_size: int) -> None:
+        super().__init__()
+
+        self._event = event
+        self._max_size = max_size
+
+    def __str__(self) -> str:
+        return f"Can't send '{self._event}': emit queue is full ({self._max_size} signals)."
+
+
+class EmitQueue:
+    """
+    A priority queue of signals, which are sent in priority order (and in the order they were
+    queued within each priority) by a dedicated sender thread.
+    """
+
+    logger_name = "EMIT QUEUE"
+
+    def __init__(self, send: Callable[[str, Any], Any], max_size: int = 1000,
+                 block: bool = False) -> None:
+        """
+        Creates a queue which sends signals using `send`.  If the queue has `max_size` unsent
+        signals, then adding another will either wait for space (if `block` is True) or raise
+        `EmitQueueFullError`.
+        """
+        self._send = send
+        self.max_size = max_size
+        self.block = block
+
+        # Heap entries are (priority, sequence number, event, data, future)
+        self._heap: List[Tuple[int, int, str, Any, concurrent.futures.Future]] = []
+        self._sequence_numbers = itertools.count()
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name="belltower-emit")
+
+        self.logger = logging.getLogger(self.logger_name)
+
+    def put(self, event: str, data: Any,
+            priority: Optional[int] = None) -> concurrent.futures.Future:
+        """
+        Queues a signal to be sent, returning a future which resolves when the signal has been
+        written to the transport.  If no priority is given, it is looked up from `EVENT_PRIORITIES`.
+        """
+        if priority is None:
+            priority = EVENT_PRIORITIES.get(event, PRIORITY_CONTROL)
+
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._condition:
+            while len(self._heap) >= self.max_size:
+                if not self.block:
+                    raise EmitQueueFullError(event, self.max_size)
+                self._condition.wait()
+            entry = (priority, next(self._sequence_numbers), event, data, future)
+            heapq.heappush(self._heap, entry)
+            self._condition.notify_all()
+        return future
+
+    @property
+    def depth(self) -> int:
+        """ Returns the number of signals waiting to be sent. """
+        return len(self._heap)
+
+    def start(self) -> None:
+        """ Starts the sender thread. """
+        self._running = True
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        """
+        Stops the sender thread, giving it up to `timeout` seconds to send the signals which are
+        still queued.  Any signals left after that are cancelled.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        with self._condition:
+            for entry in self._heap:
+                entry[4].cancel()
+            self._heap.clear()
+            self._condition.notify_all()
+
+    def _run(self) -> None:
+        """ The body of the sender thread. """
+        while True:
+            with self._condition:
+                while not self._heap and self._running:
+                    self._condition.wait()
+                if not self._heap:
+                    return
+                _, _, event, data, future = heapq.heappop(self._heap)
+                self._condition.notify_all()
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                self._send(event, data)
+            except Exception as e:
+                self.logger.error("Failed to send '%s': %s", event, e)
+                future.set_exception(e)
+            else:
+                future.set_result(None)
@@ -0,0 +1,277 @@
+"""
+A module containing typed event classes for the signals received from Ringing Room.  Each signal's
+JSON payload is decoded (and validated) exactly once, by the decoder for its signal name in
+`DECODERS`, and the resulting event is passed to the tower's internal handlers and to any
+subscriptions made with `RingingRoomTower.on_event`.
+"""
+
+import abc
+from typing import Optional, Callable, Dict, List, Tuple, Any
+
+from belltower import Bell, BellType
+
+# A type alias for untyped JSON
+JSON = Dict[str, Any]
+
+
+class EventDecodeError(ValueError):
+    """ Error created when the payload of a signal doesn't have the expected format. """
+
+    def __init__(self, signal: str, reason: str) -> None:
+        super().__init__()
+
+        self._signal = signal
+        self._reason = reason
+
+    def __str__(self) -> str:
+        return f"Invalid '{self._signal}' signal: {self._reason}"
+
+
+class Event(abc.ABC):
+    """ The base class of every event decoded from a Ringing Room signal. """
+
+    __slots__: Tuple[str, ...] = ()
+
+    # The name of the socket-io signal which is decoded into this type of event
+    signal = ""
+
+    @classmethod
+    @abc.abstractmethod
+    def decode(cls, data: JSON) -> Any:
+        """ Decodes the JSON payload of a signal into an event. """
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and all(
+            getattr(self, slot) == getattr(other, slot) for slot in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{slot}={getattr(self, slot)!r}" for slot in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+# ===== BELL STATE EVENTS =====
+
+class BellRung(Event):
+    """ A bell has been rung ('s_bell_rung'). """
+
+    __slots__ = ("bell", "global_bell_state")
+    signal = "s_bell_rung"
+
+    def __init__(self, bell: Bell, global_bell_state: List[bool]) -> None:
+        self.bell = bell
+        # `global_bell_state[i]` is True if the bell with index `i` is now at handstroke
+        self.global_bell_state = global_bell_state
+
+    @classmethod
+    def decode(cls, data: JSON) -> Any:
+        return cls(Bell.from_number(data["who_rang"]), data["global_bell_state"])
+
+
+class GlobalState(Event):
+    """ The state of every bell, sent on joining a tower or when the bells are set at hand. """
+
+    __slots__ = ("global_bell_state",)
+    signal = "s_global_state"
+
+    def __init__(self, global_bell_state: List[bool]) -> None:
+        self.global_bell_state = global_bell_state
+
+    @classmethod
+    def decode(cls, data: JSON) -> Any:
+        return cls(data["global_bell_state"])
+
+
+class SizeChange(Event):
+    """ The number of bells in the tower has changed ('s_size_change'). """
+
+    __slots__ = ("size",)
+    signal = "s_size_change"
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+
+    @classmethod
+    def decode(cls, data: JSON) -> Any:
+        return cls(int(data["size"]))
+
+
+class AudioChange(Event):
+    """ The bells have switched between tower and hand bells ('s_audio_change'). """
+
+    __slots__ = ("bell_type",)
+    signal = "s_audio_change"
+
+    def __init__(self, bell_type: BellType) -> None:
+        self.bell_type = bell_type
+
+    @classmethod
+    def decode(cls, data: JSON) -> Any:
+        return cls(BellType.from_ringingroom_name(data["new_audio"]))
+
+
+class CallMade(Event):
+    """ A call has been made ('s_call'). """
+
+    __slots__ = ("call",)
+    signal = "s_call"
+
+    def __init__(self, call: str) -> None:
+        self.call = call
+
+    @classmethod
+    def decode(cls, data: JSON) -> Any:
+        return cls(data["call"])
+
+
+# ===== USER EVENTS =====
+
+class UserEntered(Event):
+    """ A user has entered the tower ('s_user_entered'). """
+
+    __slots__ = ("user_id", "user_name")
+    signal = "s_user_entered"
+
+    def __init__(self, user_id: int, user_name: str) -> None:
+        self.user_id = user_id
+        self.user_name = user_name
+
+    @classmethod
+    def decode(cls, data: JSON) -> Any:
+        return cls(data["user_id"], data["username"])
+
+
+class UserLeft(Event):
+    """ A user has left the tower ('s_user_left'). """
+
+    __slots__ = ("user_id", "user_name")
+    signal = "s_user_left"
+
+    def __init__(self, user_id: int, user_name: str) -> None:
+        self.user_id = user_id
+        self.user_name = user_name
+
+    @classmethod
+    def decode(cls, data: JSON) -> Any:
+        return cls(data["user_id"], data["username"])
+
+
+class UserList(Event):
+    """ The list of users in the tower, sent when we join it ('s_set_userlist'). """
+
+    __slots__ = ("users",)
+    signal = "s_set_userlist"
+
+    def __init__(self, users: List[UserEntered]) -> None:
+        self.users = users
+
+    @classmethod
+    def decode(cls, data: JSON) -> Any:
+        return cls([UserEntered.decode(user) for user in data["user_list"]])
+
+
+class AssignUser(Event):
+    """ A bell has been assigned to a user, or unassigned if `user_id` is None. """
+
+    __slots__ = ("bell", "user_id")
+    signal = "s_assign_user"
+
+    def __init__(self, bell: Bell, user_id: Optional[int]) -> None:
+        self.bell = bell
+        self.user_id = user_id
+
+    @classmethod
+    def decode(cls, data: JSON) -> Any:
+        user_id = data["user"] or None
+        if not (isinstance(user_id, int) or user_id is None):
+            raise EventDecodeError(cls.signal, f"User ID {user_id!r} is not an integer")
+        return cls(Bell.from_number(data["bell"]), user_id)
+
+
+class ChatMessage(Event):
+    """ A chat message has been sent ('s_msg_sent'). """
+
+    __slots__ = ("user_name", "message")
+    signal = "s_msg_sent"
+
+    def __init__(self, user_name: str, message: str) -> None:
+        self.user_name = user_name
+        self.message = message
+
+    @classmethod
+    def decode(cls, data: JSON) -> Any:
+        return cls(data["user"], data["msg"])
+
+
+# ===== WHEATLEY EVENTS =====
+
+class WheatleySetting(Event):
+    """ Some of Wheatley's settings have been changed ('s_wheatley_setting'). """
+
+    __slots__ = ("settings",)
+    signal = "s_wheatley_setting"
+
+    def __init__(self, settings: JSON) -> None:
+        # A map from setting names to their new values
+        self.settings = settings
+
+    @classmethod
+    def decode(cls, data: JSON) -> Any:
+        settings = data.get("settings", data)
+        if not isinstance(settings, dict):
+            raise EventDecodeError(cls.signal, f"Settings {settings!r} are not an object")
+        return cls({name: value for name, value in settings.items() if name != "tower_id"})
+
+
+class WheatleyRowGen(Event):
+    """ The row generator (method or composition) has been changed ('s_wheatley_row_gen'). """
+
+    __slots__ = ("spec",)
+    signal = "s_wheatley_row_gen"
+
+    def __init__(self, spec: JSON) -> None:
+        # The row generator spec, as described in `belltower.row_gen`
+        self.spec = spec
+
+    @classmethod
+    def decode(cls, data: JSON) -> Any:
+        spec = data.get("row_gen", data)
+        if not isinstance(spec, dict):
+            raise EventDecodeError(cls.signal, f"Row generator {spec!r} is not an object")
+        return cls({key: value for key, value in spec.items() if key != "tower_id"})
+
+
+class WheatleyStopTouch(Event):
+    """ The touch being rung has been stopped ('s_wheatley_stop_touch'). """
+
+    __slots__ = ()
+    signal = "s_wheatley_stop_touch"
+
+    @classmethod
+    def decode(cls, data: JSON) -> Any:
+        return cls()
+
+
+# ===== DECODING =====
+
+# A map from signal names to the functions which decode their payloads
+DECODERS: Dict[str, Callable[[JSON], Event]] = {
+    event_type.signal: event_type.decode for event_type in (
+        BellRung, GlobalState, SizeChange, AudioChange, CallMade, UserEntered, UserLeft, UserList,
+        AssignUser, ChatMessage, WheatleySetting, WheatleyRowGen, WheatleyStopTouch,
+    )
+}
+
+
+def decode_event(signal: str, data: JSON) -> Event:
+    """
+    Decodes the payload of a signal into an event, raising `EventDecodeError` if the payload is
+    malformed.  Raises `KeyError` if the signal has no decoder.
+    """
+    decoder = DECODERS[signal]
+    try:
+        return decoder(data)
+    except EventDecodeError:
+        raise
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        raise EventDecodeError(signal, f"{type(e).__name__}: {e}") from e
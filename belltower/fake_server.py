@@ -0,0 +1,382 @@
+"""
+A module containing a local stand-in for a Ringing Room server, which can be used to test and
+benchmark bots without connecting to ringingroom.com.  It serves the tower pages and version API
+that `RingingRoomTower` fetches, responds to the socket-io signals that Ringing Room responds to,
+and can replay recorded streams of events into a tower at configurable rates.
+
+Requires `aiohttp` to be installed.
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import logging
+import threading
+import time
+from typing import Optional, Dict, List, Iterable, Iterator, Tuple, Any
+
+import socketio # type: ignore
+
+from belltower import BellType, TOWER_BELLS
+
+# A type alias for untyped JSON
+JSON = Dict[str, Any]
+# A type alias for one event in a stream: `(seconds since the previous event, event name, data)`
+StreamEvent = Tuple[float, str, JSON]
+
+
+class FakeTower:
+    """ The state of one tower hosted by a `FakeRingingRoomServer`. """
+
+    def __init__(self, tower_id: int, name: str, bell_type: BellType, size: int) -> None:
+        self.tower_id = tower_id
+        self.name = name
+        self.bell_type = bell_type
+        self.bell_state: List[bool] = [True] * size
+        self.users: Dict[int, str] = {}
+        self.assignments: Dict[int, int] = {}
+
+    @property
+    def room(self) -> str:
+        """ The name of the socket-io room containing every client in this tower. """
+        return str(self.tower_id)
+
+    def apply(self, event: str, data: JSON) -> None:
+        """ Updates this tower's state to match an event sent by the server. """
+        if event in ("s_bell_rung", "s_global_state"):
+            self.bell_state = list(data["global_bell_state"])
+        elif event == "s_size_change":
+            self.bell_state = [True] * data["size"]
+            self.assignments = {b: u for b, u in self.assignments.items() if b <= data["size"]}
+        elif event == "s_audio_change":
+            self.bell_type = BellType.from_ringingroom_name(data["new_audio"])
+        elif event == "s_user_entered":
+            self.users[data["user_id"]] = data["username"]
+        elif event == "s_user_left":
+            self.users.pop(data["user_id"], None)
+            self.assignments = {b: u for b, u in self.assignments.items() if u != data["user_id"]}
+        elif event == "s_assign_user":
+            if data["user"]:
+                self.assignments[data["bell"]] = data["user"]
+            else:
+                self.assignments.pop(data["bell"], None)
+
+
+class FakeRingingRoomServer:
+    """
+    A local stand-in for a Ringing Room server, which runs its own event loop in a background thread
+    so that it can be used from synchronous code:
+
+        with FakeRingingRoomServer() as server:
+            server.add_tower(123456789, size=8)
+            with RingingRoomTower(123456789, server.url) as tower:
+                ...
+
+    This implements just enough of Ringing Room for belltower to work - it doesn't do any
+    authentication and every client is allowed to do anything.
+    """
+
+    logger_name = "FAKE RR"
+    SOCKETIO_VERSION = "1.0"
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """ Creates a server which will listen on a given port (`0` picks any free port). """
+        self._host = host
+        self._port = port
+        self._towers: Dict[int, FakeTower] = {}
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._runner: Any = None
+        self._sio: Any = None
+
+        self.logger = logging.getLogger(self.logger_name)
+
+    # ===== STARTING/STOPPING =====
+
+    def start(self) -> None:
+        """ Starts the server in a background thread, returning once it accepts connections. """
+        if self._thread is not None:
+            raise Exception("Trying to start the server twice")
+
+        started = concurrent.futures.Future() # type: concurrent.futures.Future
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, args=(started,), daemon=True)
+        self._thread.start()
+        # Propagate any exceptions from binding to the port
+        started.result()
+        self.logger.info("Fake Ringing Room server running at %s", self.url)
+
+    def stop(self) -> None:
+        """ Stops the server and waits for its thread to finish. """
+        if self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """ The URL that towers should be given to connect to this server. """
+        return f"http://{self._host}:{self._port}"
+
+    # ===== TOWERS =====
+
+    def add_tower(self, tower_id: int, name: str = "Fake Tower", bell_type: BellType = TOWER_BELLS,
+                  size: int = 8) -> FakeTower:
+        """ Creates a new tower on this server. """
+        tower = FakeTower(tower_id, name, bell_type, size)
+        self._towers[tower_id] = tower
+        return tower
+
+    def get_tower(self, tower_id: int) -> FakeTower:
+        """ Returns the state of a tower on this server. """
+        return self._towers[tower_id]
+
+    def add_user(self, tower_id: int, user_id: int, username: str) -> None:
+        """ Makes a (fake) user enter a tower. """
+        self.send(tower_id, "s_user_entered", {"user_id": user_id, "username": username})
+
+    def remove_user(self, tower_id: int, user_id: int) -> None:
+        """ Makes a (fake) user leave a tower. """
+        username = self._towers[tower_id].users[user_id]
+        self.send(tower_id, "s_user_left", {"user_id": user_id, "username": username})
+
+    # ===== SENDING/REPLAYING EVENTS =====
+
+    def send(self, tower_id: int, event: str, data: JSON) -> None:
+        """ Sends a signal to every client in a tower, waiting until it has been sent. """
+        asyncio.run_coroutine_threadsafe(
+            self._broadcast(self._towers[tower_id], event, data), self._loop
+        ).result()
+
+    def replay(self, tower_id: int, events: Iterable[StreamEvent],
+               speed: Optional[float] = 1.0) -> "concurrent.futures.Future[List[float]]":
+        """
+        Starts replaying a stream of events into a tower.  `speed` is a multiplier for the rate at
+        which events are sent (so `2.0` replays twice as fast as recorded), or `None` to send the
+        events as fast as possible.  Returns a future which resolves to the `time.perf_counter()`
+        time at which each event was sent.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._replay(self._towers[tower_id], events, speed), self._loop
+        )
+
+    async def _replay(self, tower: FakeTower, events: Iterable[StreamEvent],
+                      speed: Optional[float]) -> List[float]:
+        send_times: List[float] = []
+        # Events are scheduled against absolute deadlines so that the time spent sending doesn't
+        # accumulate as drift
+        deadline = time.perf_counter()
+        for delay, event, data in events:
+            if speed is not None:
+                deadline += delay / speed
+                sleep_time = deadline - time.perf_counter()
+                if sleep_time > 0:
+                    await asyncio.sleep(sleep_time)
+            send_times.append(time.perf_counter())
+            await self._broadcast(tower, event, data)
+        return send_times
+
+    async def _broadcast(self, tower: FakeTower, event: str, data: JSON) -> None:
+        tower.apply(event, data)
+        await self._sio.emit(event, data, room=tower.room)
+
+    # ===== HTTP HANDLERS =====
+
+    async def _tower_page(self, request: Any) -> Any:
+        from aiohttp import web # type: ignore
+
+        try:
+            tower = self._towers[int(request.match_info["tower_id"])]
+        except (KeyError, ValueError):
+            return web.Response(status=404, text="Tower not found")
+        # Mimic the lines of the real tower page that `page_parsing.parse_page` looks for
+        html = "\n".join([
+            "<script>",
+            "window.tower_parameters = {",
+            f'    id: {tower.tower_id},',
+            f'    name: "{tower.name}",',
+            f'    audio: "{tower.bell_type.ringingroom_name()}",',
+            f'    server_ip: "{self.url}",',
+            "};",
+            "</script>",
+        ])
+        return web.Response(text=html, content_type="text/html")
+
+    async def _version(self, request: Any) -> Any:
+        from aiohttp import web # type: ignore
+
+        return web.json_response({"socketio-version": self.SOCKETIO_VERSION})
+
+    # ===== SOCKET-IO HANDLERS =====
+
+    async def _on_join(self, sid: str, data: JSON) -> None:
+        tower = self._towers[data["tower_id"]]
+        self._sio.enter_room(sid, tower.room)
+        await self._sio.emit("s_set_userlist", {"user_list": [
+            {"user_id": user_id, "username": username}
+            for user_id, username in tower.users.items()
+        ]}, room=sid)
+        await self._sio.emit("s_size_change", {"size": len(tower.bell_state)}, room=sid)
+        for bell, user_id in tower.assignments.items():
+            await self._sio.emit("s_assign_user", {"bell": bell, "user": user_id}, room=sid)
+
+    async def _on_request_global_state(self, sid: str, data: JSON) -> None:
+        tower = self._towers[data["tower_id"]]
+        await self._sio.emit("s_global_state", {"global_bell_state": tower.bell_state}, room=sid)
+
+    async def _on_bell_rung(self, sid: str, data: JSON) -> None:
+        tower = self._towers[data["tower_id"]]
+        index = data["bell"] - 1
+        # Like RR, ignore rings where the client's idea of the stroke is out of date
+        if index >= len(tower.bell_state) or tower.bell_state[index] != data["stroke"]:
+            return
+        bell_state = list(tower.bell_state)
+        bell_state[index] = not bell_state[index]
+        await self._broadcast(tower, "s_bell_rung",
+                              {"global_bell_state": bell_state, "who_rang": data["bell"]})
+
+    async def _on_set_bells(self, sid: str, data: JSON) -> None:
+        tower = self._towers[data["tower_id"]]
+        await self._broadcast(tower, "s_global_state",
+                              {"global_bell_state": [True] * len(tower.bell_state)})
+
+    async def _on_size_change(self, sid: str, data: JSON) -> None:
+        tower = self._towers[data["tower_id"]]
+        await self._broadcast(tower, "s_size_change", {"size": data["new_size"]})
+
+    async def _on_audio_change(self, sid: str, data: JSON) -> None:
+        tower = self._towers[data["tower_id"]]
+        await self._broadcast(tower, "s_audio_change", {"new_audio": data["new_audio"]})
+
+    async def _on_assign_user(self, sid: str, data: JSON) -> None:
+        tower = self._towers[data["tower_id"]]
+        await self._broadcast(tower, "s_assign_user", {"bell": data["bell"], "user": data["user"]})
+
+    async def _on_msg_sent(self, sid: str, data: JSON) -> None:
+        tower = self._towers[data["tower_id"]]
+        await self._broadcast(tower, "s_msg_sent", data)
+
+    async def _on_call(self, sid: str, data: JSON) -> None:
+        tower = self._towers[data["tower_id"]]
+        await self._broadcast(tower, "s_call", {"call": data["call"]})
+
+    async def _on_wheatley_setting(self, sid: str, data: JSON) -> None:
+        tower = self._towers[data["tower_id"]]
+        await self._broadcast(tower, "s_wheatley_setting", {"settings": data["settings"]})
+
+    async def _on_wheatley_row_gen(self, sid: str, data: JSON) -> None:
+        tower = self._towers[data["tower_id"]]
+        await self._broadcast(tower, "s_wheatley_row_gen", {"row_gen": data["row_gen"]})
+
+    async def _on_wheatley_stop_touch(self, sid: str, data: JSON) -> None:
+        tower = self._towers[data["tower_id"]]
+        await self._broadcast(tower, "s_wheatley_stop_touch", {})
+
+    # ===== INITIALISATION CODE =====
+
+    def _run(self, started: concurrent.futures.Future) -> None:
+        """ The body of the server's background thread. """
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._start_app())
+        except Exception as e:
+            started.set_exception(e)
+            return
+        started.set_result(None)
+        self._loop.run_forever()
+        self._loop.close()
+
+    async def _start_app(self) -> None:
+        from aiohttp import web # type: ignore
+
+        self._sio = socketio.AsyncServer(async_mode="aiohttp")
+        app = web.Application()
+        self._sio.attach(app)
+        app.router.add_get("/api/version", self._version)
+        app.router.add_get("/{tower_id}", self._tower_page)
+
+        handlers = {
+            "c_join": self._on_join,
+            "c_request_global_state": self._on_request_global_state,
+            "c_bell_rung": self._on_bell_rung,
+            "c_set_bells": self._on_set_bells,
+            "c_size_change": self._on_size_change,
+            "c_audio_change": self._on_audio_change,
+            "c_assign_user": self._on_assign_user,
+            "c_msg_sent": self._on_msg_sent,
+            "c_call": self._on_call,
+            "c_wheatley_setting": self._on_wheatley_setting,
+            "c_wheatley_row_gen": self._on_wheatley_row_gen,
+            "c_wheatley_stop_touch": self._on_wheatley_stop_touch,
+        }
+        for event, handler in handlers.items():
+            self._sio.on(event, handler)
+
+        # Close any connections which are still open 0.1 seconds after the server is stopped, rather
+        # than waiting for their clients to disconnect
+        self._runner = web.AppRunner(app, shutdown_timeout=0.1)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self._host, self._port)
+        await site.start()
+        # Find out which port we were given, in case `port` was 0
+        self._port = site._server.sockets[0].getsockname()[1]
+
+    async def _shutdown(self) -> None:
+        """ Closes every connection, then cancels the tasks left running (e.g. by engineio). """
+        await self._runner.cleanup()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # === ENTER/EXIT FOR 'WITH' BLOCKS ===
+
+    def __enter__(self) -> Any:
+        self.start()
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.stop()
+
+
+# ===== EVENT STREAMS =====
+
+def load_event_stream(path: str) -> List[StreamEvent]:
+    """
+    Loads a recorded stream of events from a file with one JSON object per line, each of the form
+    `{"delay": <seconds since the previous event>, "event": <name>, "data": <payload>}`.
+    """
+    events: List[StreamEvent] = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                obj = json.loads(line)
+                events.append((obj["delay"], obj["event"], obj["data"]))
+    return events
+
+
+def save_event_stream(path: str, events: Iterable[StreamEvent]) -> None:
+    """ Saves a stream of events in the format read by `load_event_stream`. """
+    with open(path, "w") as f:
+        for delay, event, data in events:
+            f.write(json.dumps({"delay": delay, "event": event, "data": data}) + "\n")
+
+
+def rounds_stream(number_of_bells: int, number_of_rows: int,
+                  bell_gap: float = 0.2) -> Iterator[StreamEvent]:
+    """
+    Generates a stream of 's_bell_rung' events for a band ringing rounds from bells set at hand,
+    with one blow every `bell_gap` seconds and a one-blow handstroke gap.
+    """
+    bell_state = [True] * number_of_bells
+    for row in range(number_of_rows):
+        for place in range(number_of_bells):
+            delay = bell_gap * 2 if place == 0 and row % 2 == 0 and row > 0 else bell_gap
+            bell_state[place] = not bell_state[place]
+            yield delay, "s_bell_rung", {
+                "global_bell_state": list(bell_state),
+                "who_rang": place + 1
+            }
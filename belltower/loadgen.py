@@ -0,0 +1,277 @@
+"""
+A command line load generator, which simulates many bands ringing at once so that a (self-hosted)
+Ringing Room server can be capacity-planned.  `N` towers each have `M` ringing clients (each an
+`AsyncRingingRoomTower` ringing its share of the bells), and the towers are spread over a pool of
+processes.  Every tower rings rounds with a handstroke gap, at an equal share of a target aggregate
+blow rate, and each client records the time between emitting a bell ring and receiving it back
+from the server.  The clients' histograms are merged into one report.
+
+Run with `python -m belltower.loadgen --help` to see the options.  Without `--url`, a local
+`FakeRingingRoomServer` is started, so the load generator can be run offline.
+
+Requires `aiohttp` to be installed.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import random
+import sys
+import time
+from typing import Optional, List, Sequence, Tuple, Any
+
+from belltower import call, Bell, HANDSTROKE
+from belltower.metadata_cache import MetadataCache
+from belltower.metrics import Histogram
+
+# The upper bounds of the latency histogram buckets, which are log-spaced from 0.1ms to about 6.5s
+# (much finer than `metrics.DEFAULT_BUCKETS`, so that the percentiles are worth reporting)
+LATENCY_BUCKETS = tuple(0.0001 * 2 ** (i / 4) for i in range(65))
+# The percentiles included in the report
+PERCENTILES = (0.5, 0.9, 0.99, 0.999)
+# The number of seconds to wait for rings to be echoed after the last blow has been rung
+ECHO_TIMEOUT = 2.0
+
+
+class ClientResult:
+    """ The results of one simulated ringer. """
+
+    def __init__(self, tower_id: int, client: int) -> None:
+        self.tower_id = tower_id
+        self.client = client
+        self.rings_sent = 0
+        # The time between emitting each ring and receiving its echo
+        self.latency = Histogram(LATENCY_BUCKETS)
+        # The reason that the client failed, or None if it didn't
+        self.error: Optional[str] = None
+
+    @property
+    def rings_echoed(self) -> int:
+        """ Returns the number of rings which were echoed back by the server. """
+        return self.latency.count
+
+
+class LoadReport:
+    """ The merged results of every simulated ringer. """
+
+    def __init__(self, results: Sequence[ClientResult], duration: float) -> None:
+        self.results = list(results)
+        # The number of seconds that the towers were ringing for
+        self.duration = duration
+        self.latency = Histogram(LATENCY_BUCKETS)
+        for result in self.results:
+            self.latency.merge(result.latency)
+
+    @property
+    def rings_sent(self) -> int:
+        """ Returns the number of rings sent by every client. """
+        return sum(result.rings_sent for result in self.results)
+
+    @property
+    def rings_echoed(self) -> int:
+        """ Returns the number of rings which were echoed back to the clients that sent them. """
+        return self.latency.count
+
+    @property
+    def failed_clients(self) -> List[ClientResult]:
+        """ Returns the results of the clients which failed. """
+        return [result for result in self.results if result.error is not None]
+
+    def __str__(self) -> str:
+        lines = [
+            f"{len(self.results)} clients in {len({r.tower_id for r in self.results})} towers, "
+            + f"{len(self.failed_clients)} failed",
+            f"{self.rings_sent} rings sent in {self.duration:.1f}s "
+            + f"({self.rings_sent / self.duration:.1f} blows/s), "
+            + f"{self.rings_sent - self.rings_echoed} not echoed",
+            f"Emit-to-echo latency: mean {self.latency.mean * 1000:.2f}ms",
+        ]
+        for fraction in PERCENTILES:
+            upper_bound = self.latency.percentile(fraction) * 1000
+            lines.append(f"    p{fraction * 100:g}: <= {upper_bound:.2f}ms")
+        for result in self.failed_clients:
+            lines.append(f"Tower {result.tower_id} client {result.client} failed: {result.error}")
+        return "\n".join(lines)
+
+
+def bell_gap_for_blow_rate(blow_rate: float, number_of_bells: int,
+                           handstroke_gap: float = 1.0) -> float:
+    """
+    Returns the number of seconds between consecutive blows needed to ring `blow_rate` blows per
+    second on average, where the handstroke gap is `handstroke_gap` blows long.
+    """
+    # Each whole pull (a handstroke and a backstroke row) takes `2n + handstroke_gap` blow gaps
+    return 2 * number_of_bells / ((2 * number_of_bells + handstroke_gap) * blow_rate)
+
+
+# ===== RINGING (IN THE WORKER PROCESSES) =====
+
+async def _ring_tower(url: str, tower_id: int, clients: int, number_of_bells: int,
+                      bell_gap: float, handstroke_gap: float, duration: float, jitter: float,
+                      session: Any, metadata_cache: MetadataCache) -> List[ClientResult]:
+    """ Rings rounds in one tower, with the bells shared between `clients` simulated ringers. """
+    from belltower.async_ringing_room import AsyncRingingRoomTower
+
+    results = [ClientResult(tower_id, c) for c in range(clients)]
+    towers = [AsyncRingingRoomTower(tower_id, url, session=session, metadata_cache=metadata_cache)
+              for _ in range(clients)]
+    for tower, result in zip(towers, results):
+        tower.metrics.echo_round_trip = result.latency
+    bells = [Bell.from_index(i) for i in range(number_of_bells)]
+
+    try:
+        # Connect the first client on its own, so that the others can use the cached metadata
+        await towers[0].connect()
+        await asyncio.gather(*(tower.connect() for tower in towers[1:]))
+        await asyncio.gather(*(tower.wait_loaded() for tower in towers))
+        # Get every client to agree that the bells are all at handstroke before ringing
+        leader = towers[0]
+        if leader.number_of_bells != number_of_bells:
+            await leader.set_size(number_of_bells)
+        else:
+            await leader.set_at_hand()
+        await asyncio.gather(*(
+            tower.wait_for(lambda t=tower: t.number_of_bells == number_of_bells
+                           and all(t.get_stroke(b) == HANDSTROKE for b in bells), 10.0)
+            for tower in towers
+        ))
+        await leader.make_call(call.LOOK_TO)
+
+        # Ring rounds, where the bell in each place is rung by client `place % clients`.  Blows are
+        # scheduled against absolute deadlines so that slow emits don't reduce the blow rate.
+        rng = random.Random(tower_id)
+        loop = asyncio.get_event_loop()
+        start = loop.time() + bell_gap
+        blow = 0
+        while True:
+            row, place = divmod(blow, number_of_bells)
+            deadline = start + (blow + row // 2 * handstroke_gap) * bell_gap
+            if deadline - start >= duration:
+                break
+            if jitter:
+                deadline += rng.gauss(0, jitter)
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            client = place % clients
+            if await towers[client].ring_bell(bells[place]):
+                results[client].rings_sent += 1
+            blow += 1
+
+        await leader.make_call(call.STAND)
+        # Wait for the last rings to be echoed
+        rings_sent = sum(result.rings_sent for result in results)
+        await leader.wait_for(
+            lambda: sum(result.rings_echoed for result in results) >= rings_sent, ECHO_TIMEOUT
+        )
+    except Exception as e:
+        for result in results:
+            result.error = f"{type(e).__name__}: {e}"
+    finally:
+        await asyncio.gather(*(tower.disconnect() for tower in towers), return_exceptions=True)
+    return results
+
+
+async def _ring_towers(url: str, tower_ids: Sequence[int], *args: Any) -> List[ClientResult]:
+    """ Rings in many towers at once, sharing one HTTP session and metadata cache. """
+    import aiohttp # type: ignore
+
+    async with aiohttp.ClientSession() as session:
+        metadata_cache = MetadataCache()
+        results = await asyncio.gather(*(
+            _ring_tower(url, tower_id, *args, session=session, metadata_cache=metadata_cache)
+            for tower_id in tower_ids
+        ))
+    return [result for tower_results in results for result in tower_results]
+
+
+def _run_worker(job: Tuple[Any, ...]) -> List[ClientResult]:
+    """ The body of each worker process, which rings in its share of the towers. """
+    log_level, url, tower_ids, *args = job
+    logging.basicConfig(level=log_level)
+    return asyncio.run(_ring_towers(url, tower_ids, *args))
+
+
+# ===== RUNNING THE LOAD =====
+
+def run_load(url: str, tower_ids: Sequence[int], clients: int = 4, number_of_bells: int = 8,
+             blow_rate: float = 100.0, duration: float = 30.0, processes: Optional[int] = None,
+             handstroke_gap: float = 1.0, jitter: float = 0.0,
+             log_level: int = logging.WARNING) -> LoadReport:
+    """
+    Rings rounds on `number_of_bells` bells in every tower in `tower_ids` for `duration` seconds,
+    with `clients` simulated ringers per tower, at a total of `blow_rate` blows per second.  The
+    towers are spread over `processes` processes (by default, one per CPU).  Blows are moved
+    randomly by up to about `jitter` seconds (the standard deviation), to simulate human striking.
+    """
+    tower_ids = list(tower_ids)
+    if not tower_ids or clients < 1 or number_of_bells < 1:
+        raise ValueError("Need at least one tower, client and bell")
+    processes = min(processes or multiprocessing.cpu_count(), len(tower_ids))
+    bell_gap = bell_gap_for_blow_rate(blow_rate / len(tower_ids), number_of_bells, handstroke_gap)
+    jobs = [
+        (log_level, url, tower_ids[i::processes], clients, number_of_bells, bell_gap,
+         handstroke_gap, duration, jitter)
+        for i in range(processes)
+    ]
+    # Use fresh processes, rather than forking a process which may be running a server's threads
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        results = pool.map(_run_worker, jobs)
+    return LoadReport([result for worker_results in results for result in worker_results],
+                      duration)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m belltower.loadgen",
+                                     description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--url", default=None,
+                        help="The server to load (default: start a local fake server)")
+    parser.add_argument("--towers", type=int, default=4, help="The number of towers (N)")
+    parser.add_argument("--clients", type=int, default=4,
+                        help="The number of ringing clients per tower (M)")
+    parser.add_argument("--first-tower-id", type=int, default=100000000,
+                        help="The ID of the first tower (the others follow consecutively)")
+    parser.add_argument("--bells", type=int, default=8, help="The number of bells in each tower")
+    parser.add_argument("--blow-rate", type=float, default=100.0,
+                        help="The target number of blows per second, over all the towers")
+    parser.add_argument("--duration", type=float, default=30.0,
+                        help="The number of seconds to ring for")
+    parser.add_argument("--handstroke-gap", type=float, default=1.0,
+                        help="The length of the handstroke gap, in blows")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="The standard deviation of the striking errors, in seconds")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="The number of worker processes (default: one per CPU)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log at INFO level")
+    args = parser.parse_args(argv)
+
+    log_level = logging.INFO if args.verbose else logging.WARNING
+    logging.basicConfig(level=log_level)
+    tower_ids = range(args.first_tower_id, args.first_tower_id + args.towers)
+
+    server = None
+    url = args.url
+    if url is None:
+        from belltower.fake_server import FakeRingingRoomServer
+
+        server = FakeRingingRoomServer()
+        server.start()
+        for tower_id in tower_ids:
+            server.add_tower(tower_id, f"Load Tower {tower_id}", size=args.bells)
+        url = server.url
+
+    try:
+        started = time.perf_counter()
+        report = run_load(url, tower_ids, args.clients, args.bells, args.blow_rate, args.duration,
+                          args.processes, args.handstroke_gap, args.jitter, log_level)
+        print(report)
+        print(f"Finished in {time.perf_counter() - started:.1f}s")
+    finally:
+        if server is not None:
+            server.stop()
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
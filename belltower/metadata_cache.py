@@ -0,0 +1,240 @@
+"""
+A module containing `MetadataCache`, which stores the metadata parsed from tower pages (and the
+version of the Ringing Room servers) so that reconnecting to a tower doesn't have to fetch them
+again.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Optional, Dict, Set, Tuple, Any
+
+from belltower import BellType
+from belltower.page_parsing import fix_url
+
+# The key of a cache entry: the (fixed) URL of the HTTP server, and the tower ID
+_Key = Tuple[str, int]
+
+
+class TowerMetadata:
+    """ The metadata of a tower which is needed before connecting to it. """
+
+    __slots__ = ("server_ip", "tower_name", "bell_type", "rr_version", "fetch_time")
+
+    def __init__(self, server_ip: str, tower_name: str, bell_type: BellType,
+                 rr_version: Optional[str] = None, fetch_time: Optional[float] = None) -> None:
+        self.server_ip = server_ip
+        self.tower_name = tower_name
+        self.bell_type = bell_type
+        # The 'socketio-version' reported by RR, or None if the version check wasn't run
+        self.rr_version = rr_version
+        # The (wall-clock) time when the metadata was fetched, so that it is valid across restarts
+        self.fetch_time = time.time() if fetch_time is None else fetch_time
+
+    def to_json(self) -> Dict[str, Any]:
+        """ Converts this metadata to a JSON-serialisable dictionary. """
+        return {
+            "server_ip": self.server_ip,
+            "tower_name": self.tower_name,
+            "bell_type": self.bell_type.ringingroom_name(),
+            "rr_version": self.rr_version,
+            "fetch_time": self.fetch_time,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> Any:
+        """ Creates metadata from a dictionary generated by `to_json`. """
+        return cls(data["server_ip"], data["tower_name"],
+                   BellType.from_ringingroom_name(data["bell_type"]), data["rr_version"],
+                   data["fetch_time"])
+
+    def __repr__(self) -> str:
+        return (f"TowerMetadata({self.server_ip!r}, {self.tower_name!r}, {self.bell_type}, "
+                + f"{self.rr_version!r})")
+
+
+class MetadataCache:
+    """
+    A cache of `TowerMetadata`, keyed by HTTP server URL and tower ID.  Entries expire `ttl` seconds
+    after they were fetched.  One cache can be shared between many towers and threads.
+
+    If a `path` is given, the cache is loaded from (and saved to) a JSON file at that path, so that
+    it survives restarts.  Changes are saved `save_delay` seconds after they are made (so that
+    joining lots of towers only writes the file once), and when the cache is closed.  Saving merges
+    the cache with the current contents of the file, so many processes can share one file.
+
+    Note that the cached bell type is the bell type when the tower page was fetched - if it has
+    changed since then, the tower will have the wrong bell type until the next 's_audio_change'.
+    """
+
+    logger_name = "METADATA CACHE"
+
+    def __init__(self, ttl: float = 3600.0, path: Optional[str] = None,
+                 save_delay: float = 1.0) -> None:
+        self.ttl = ttl
+        self.path = path
+        self.save_delay = save_delay
+        self._entries: Dict[_Key, TowerMetadata] = {}
+        self._lock = threading.Lock()
+
+        # The changes which haven't been saved to the file yet: the keys which were added or
+        # removed, and whether the whole cache was cleared
+        self._dirty = False
+        self._added_keys: Set[_Key] = set()
+        self._removed_keys: Set[_Key] = set()
+        self._cleared = False
+        self._save_timer: Optional[threading.Timer] = None
+
+        self.logger = logging.getLogger(self.logger_name)
+
+        if path is not None:
+            self._entries = self._read_file()
+
+    def get(self, url: str, tower_id: int) -> Optional[TowerMetadata]:
+        """ Returns the cached metadata of a tower, or None if it isn't cached or has expired. """
+        key = (fix_url(url), tower_id)
+        with self._lock:
+            metadata = self._entries.get(key)
+            if metadata is None:
+                return None
+            if time.time() - metadata.fetch_time > self.ttl:
+                del self._entries[key]
+                return None
+            return metadata
+
+    def put(self, url: str, tower_id: int, metadata: TowerMetadata) -> None:
+        """ Adds (or replaces) the metadata of a tower. """
+        key = (fix_url(url), tower_id)
+        with self._lock:
+            self._entries[key] = metadata
+            self._added_keys.add(key)
+            self._removed_keys.discard(key)
+            self._schedule_save()
+
+    def invalidate(self, url: str, tower_id: int) -> None:
+        """ Removes the metadata of a tower from the cache, if it is cached. """
+        key = (fix_url(url), tower_id)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._added_keys.discard(key)
+            self._removed_keys.add(key)
+            self._schedule_save()
+
+    def clear(self) -> None:
+        """ Removes every entry from the cache. """
+        with self._lock:
+            self._entries.clear()
+            self._added_keys.clear()
+            self._removed_keys.clear()
+            self._cleared = True
+            self._schedule_save()
+
+    def flush(self) -> None:
+        """ Saves any unsaved changes to the file at `path` (if there is one). """
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if self._dirty:
+                self._save()
+
+    def close(self) -> None:
+        """ Saves any unsaved changes.  The cache can still be used after it is closed. """
+        self.flush()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ===== HELPER FUNCTIONS =====
+
+    def _schedule_save(self) -> None:
+        """ Saves the cache `save_delay` seconds from now, if it has a file.  Must hold `_lock`. """
+        if self.path is None:
+            return
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _read_file(self) -> Dict[_Key, TowerMetadata]:
+        """ Reads the (unexpired) entries from the file at `path`. """
+        entries: Dict[_Key, TowerMetadata] = {}
+        try:
+            with open(self.path) as f: # type: ignore
+                data = json.load(f)
+            now = time.time()
+            for entry in data:
+                metadata = TowerMetadata.from_json(entry["metadata"])
+                if now - metadata.fetch_time <= self.ttl:
+                    entries[(entry["url"], entry["tower_id"])] = metadata
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.warning("Ignoring unreadable metadata cache '%s': %s", self.path, e)
+        return entries
+
+    def _save(self) -> None:
+        """
+        Applies the unsaved changes to the entries in the file at `path` (which another process may
+        have changed), and writes them back to it.  Must hold `_lock`.
+        """
+        with self._file_lock():
+            entries = {} if self._cleared else self._read_file()
+            for key in self._removed_keys:
+                entries.pop(key, None)
+            for key in self._added_keys:
+                if key in self._entries:
+                    entries[key] = self._entries[key]
+            data = [
+                {"url": url, "tower_id": tower_id, "metadata": metadata.to_json()}
+                for (url, tower_id), metadata in entries.items()
+            ]
+            # Write to a temporary file and then rename it, so that a crash can't corrupt the cache
+            directory, name = os.path.split(os.path.abspath(self.path)) # type: ignore
+            try:
+                with tempfile.NamedTemporaryFile("w", dir=directory, prefix=name + ".",
+                                                 suffix=".tmp", delete=False) as f:
+                    json.dump(data, f)
+                os.replace(f.name, self.path) # type: ignore
+            except OSError as e:
+                self.logger.warning("Failed to save metadata cache '%s': %s", self.path, e)
+                return
+        self._entries = entries
+        self._added_keys.clear()
+        self._removed_keys.clear()
+        self._cleared = False
+        self._dirty = False
+
+    def _file_lock(self) -> Any:
+        """
+        Returns a context manager which holds an exclusive lock on the cache's file, so that
+        processes sharing it can't lose each other's changes.  The lock is only taken on platforms
+        with `fcntl`.
+        """
+        try:
+            import fcntl
+        except ImportError:
+            return contextlib.nullcontext()
+
+        @contextlib.contextmanager
+        def lock() -> Any:
+            with open(f"{self.path}.lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return lock()
+
+    # === ENTER/EXIT FOR 'WITH' BLOCKS ===
+
+    def __enter__(self) -> Any:
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
@@ -0,0 +1,259 @@
+"""
+A module containing a place notation parser and `Method`, which generates the rows of methods and
+touches as NumPy arrays.  Place notation is compiled into permutation arrays once per (notation,
+stage) pair, so generating whole peals only takes a few array operations per lead.  Requires
+`numpy` to be installed.
+"""
+
+import functools
+from typing import Optional, Dict, List, Iterator, Sequence, Tuple, Any
+
+import numpy as np # type: ignore
+
+from belltower import call, Bell
+from belltower.bell import BELL_NAMES, MAX_BELL
+
+# The characters which mean that every bell swaps with its neighbour
+_CROSS_CHARS = "xX-"
+
+
+class PlaceNotationError(ValueError):
+    """ Error created when place notation can't be parsed. """
+
+    def __init__(self, place_notation: str, reason: str) -> None:
+        super().__init__()
+
+        self._place_notation = place_notation
+        self._reason = reason
+
+    def __str__(self) -> str:
+        return f"Invalid place notation '{self._place_notation}': {self._reason}"
+
+
+def _change_permutation(places: Sequence[int], stage: int) -> Optional[List[int]]:
+    """
+    Converts a set of (0-indexed) places into a permutation, such that `row[permutation]` is the
+    row after the change.  Places at the ends of the row are added if they are implied (e.g. '4' on
+    six bells means '14'), and None is returned if the places leave a bell in the middle of the row
+    with nothing to swap with.
+    """
+    permutation = list(range(stage))
+    i = 0
+    for place in sorted(set(places)) + [stage]:
+        if (place - i) % 2:
+            if i == 0:
+                # An implied lead, i.e. the treble's place
+                i = 1
+            elif place != stage:
+                return None
+        # Every bell between the last place and this one swaps with its neighbour (if this is the
+        # end of the row and there are an odd number of bells left, the last one makes a place)
+        while i + 1 < place:
+            permutation[i], permutation[i + 1] = i + 1, i
+            i += 2
+        i = place + 1
+    return permutation
+
+
+def _split_changes(notation: str) -> List[str]:
+    """ Splits a block of place notation (e.g. 'x16x16') into one string per change. """
+    changes: List[str] = []
+    current = ""
+    for char in notation:
+        if char in _CROSS_CHARS:
+            if current:
+                changes.append(current)
+                current = ""
+            changes.append("x")
+        elif char == ".":
+            if current:
+                changes.append(current)
+                current = ""
+        elif not char.isspace():
+            current += char
+    if current:
+        changes.append(current)
+    return changes
+
+
+def _expand_place_notation(place_notation: str) -> List[str]:
+    """
+    Expands place notation into one string per change.  Blocks separated by commas, or prefixed by
+    '&', are palindromic (so 'x16x16x16,12' is 'x16x16x16x16x16x12'), and blocks prefixed by '+'
+    are not.
+    """
+    if "," in place_notation:
+        blocks = ["&" + block for block in place_notation.split(",")]
+    else:
+        blocks = [place_notation]
+
+    changes: List[str] = []
+    for block in blocks:
+        block = block.strip()
+        is_palindrome = block.startswith("&")
+        block_changes = _split_changes(block.lstrip("&+"))
+        changes.extend(block_changes)
+        if is_palindrome:
+            changes.extend(reversed(block_changes[:-1]))
+    return changes
+
+
+@functools.lru_cache(maxsize=None)
+def compile_place_notation(place_notation: str, stage: int) -> np.ndarray:
+    """
+    Compiles place notation into a (changes x stage) array of permutations, where `row[perm]` is
+    the row after applying the change `perm` to `row`.  The result is cached and read-only.
+    """
+    if stage < 1 or stage > MAX_BELL:
+        raise ValueError(f"Stage {stage} must be between 1 and {MAX_BELL}")
+
+    permutations: List[List[int]] = []
+    for change in _expand_place_notation(place_notation):
+        places: List[int] = []
+        if change != "x":
+            for char in change:
+                try:
+                    place = BELL_NAMES.index(char.upper())
+                except ValueError as e:
+                    raise PlaceNotationError(place_notation, f"'{char}' isn't a place") from e
+                if place >= stage:
+                    raise PlaceNotationError(place_notation, f"'{char}' is above stage {stage}")
+                places.append(place)
+        elif stage % 2:
+            raise PlaceNotationError(place_notation, f"'x' is not possible on {stage} bells")
+        permutation = _change_permutation(places, stage)
+        if permutation is None:
+            raise PlaceNotationError(place_notation, f"'{change}' is not possible on {stage} bells")
+        permutations.append(permutation)
+    if not permutations:
+        raise PlaceNotationError(place_notation, "no changes")
+
+    array = np.array(permutations, dtype=np.int8)
+    array.flags.writeable = False
+    return array
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_lead(place_notation: str, stage: int, call_notation: Optional[str]) -> np.ndarray:
+    """
+    Returns a (lead length + 1) x stage array, where row `i` is the permutation which takes the lead
+    head to the `i`th row of the lead (so the last row is the permutation to the next lead head).
+    If `call_notation` is given, its changes replace the changes at the end of the lead.
+    """
+    changes = compile_place_notation(place_notation, stage)
+    if call_notation is not None:
+        call_changes = compile_place_notation(call_notation, stage)
+        if len(call_changes) > len(changes):
+            raise PlaceNotationError(call_notation, "call is longer than the lead")
+        changes = np.concatenate([changes[:len(changes) - len(call_changes)], call_changes])
+
+    lead = np.empty((len(changes) + 1, stage), dtype=np.int8)
+    lead[0] = np.arange(stage)
+    for i, change in enumerate(changes):
+        lead[i + 1] = lead[i][change]
+    lead.flags.writeable = False
+    return lead
+
+
+class Method:
+    """
+    A method, defined by its place notation for one lead.  Calls are given as place notation which
+    replaces the changes at the end of the lead (e.g. a bob in Plain Bob Major is '14', replacing
+    the lead end '12').  Calls which affect the start of the next lead (as in Grandsire) are not
+    supported.
+    """
+
+    # The calls used if none are given: the usual bob and single for methods with a '12' lead end
+    DEFAULT_CALLS = {call.BOB: "14", call.SINGLE: "1234"}
+
+    def __init__(self, place_notation: str, stage: int, name: str = "",
+                 calls: Optional[Dict[str, str]] = None) -> None:
+        self.place_notation = place_notation
+        self.stage = stage
+        self.name = name
+        self.calls = dict(self.DEFAULT_CALLS if calls is None else calls)
+        # Compile the plain lead now, so that invalid place notation is reported straight away
+        self._plain_lead = _compile_lead(place_notation, stage, None)
+
+    @property
+    def lead_length(self) -> int:
+        """ Returns the number of rows in one lead of this method. """
+        return len(self._plain_lead) - 1
+
+    def lead(self, lead_head: Optional[Sequence[int]] = None,
+             call_name: Optional[str] = None) -> np.ndarray:
+        """
+        Returns the rows of one lead (plus the next lead head) as an array of bell indices,
+        starting from `lead_head` (rounds if not given), optionally with a call at the lead end.
+        """
+        head = np.arange(self.stage) if lead_head is None else np.asarray(lead_head)
+        return head[self._lead_permutations(call_name)]
+
+    def touch(self, calls: Sequence[Optional[str]],
+              start: Optional[Sequence[int]] = None) -> np.ndarray:
+        """
+        Returns the rows of a touch as a (rows x stage) array of bell indices.  `calls` has one
+        entry per lead, which is either the name of a call (e.g. `call.BOB`) or None for a plain
+        lead.
+        The rows start with `start` (rounds if not given) and end with the last lead's lead end,
+        followed by the final lead head.
+        """
+        call_names = list(calls)
+        head = np.arange(self.stage) if start is None else np.asarray(start)
+        lead_length = self.lead_length
+        # Find every lead head (which is a short sequential loop over the leads) ...
+        leads = np.empty((len(call_names), lead_length + 1, self.stage), dtype=np.int8)
+        heads = np.empty((len(call_names) + 1, self.stage), dtype=np.int8)
+        heads[0] = head
+        for i, call_name in enumerate(call_names):
+            leads[i] = self._lead_permutations(call_name)
+            heads[i + 1] = heads[i][leads[i][-1]]
+        # ... and then generate every row with one indexing operation
+        rows = heads[:-1][np.arange(len(call_names))[:, np.newaxis, np.newaxis], leads[:, :-1]]
+        return np.concatenate([rows.reshape(-1, self.stage), heads[-1:]])
+
+    def plain_course(self) -> np.ndarray:
+        """ Returns the rows of a plain course, from rounds back to rounds. """
+        return self.touch([None] * self.leads_in_plain_course())
+
+    def leads_in_plain_course(self) -> int:
+        """ Returns the number of leads before a plain course comes back to rounds. """
+        lead_head_permutation = self._plain_lead[-1]
+        row = lead_head_permutation
+        leads = 1
+        while not np.array_equal(row, np.arange(self.stage)):
+            row = row[lead_head_permutation]
+            leads += 1
+        return leads
+
+    def _lead_permutations(self, call_name: Optional[str]) -> np.ndarray:
+        """ Returns the permutations of a lead (see `_compile_lead`) with a given call. """
+        if call_name is None:
+            return self._plain_lead
+        try:
+            call_notation = self.calls[call_name]
+        except KeyError as e:
+            raise ValueError(f"Method '{self.name}' has no call '{call_name}'") from e
+        return _compile_lead(self.place_notation, self.stage, call_notation)
+
+    def __str__(self) -> str:
+        return self.name or f"{self.place_notation} ({self.stage} bells)"
+
+    def __repr__(self) -> str:
+        return f"Method({self.place_notation!r}, {self.stage}, {self.name!r})"
+
+
+def to_bells(rows: Any) -> List[Tuple[Bell, ...]]:
+    """ Converts an array of bell indices (e.g. from `Method.touch`) into rows of `Bell`s. """
+    bells = [Bell.from_index(i) for i in range(MAX_BELL)]
+    return [tuple(bells[i] for i in row) for row in np.asarray(rows).tolist()]
+
+
+def iter_bells(rows: Any) -> Iterator[Tuple[Bell, ...]]:
+    """
+    Lazily converts an array of bell indices into rows of `Bell`s, e.g. to pass a long touch to
+    `RingingRoomTower.ring_rows` without converting it all at once.
+    """
+    bells = [Bell.from_index(i) for i in range(MAX_BELL)]
+    for row in np.asarray(rows).tolist():
+        yield tuple(bells[i] for i in row)
@@ -0,0 +1,299 @@
+"""
+A module containing the metrics recorded by each tower (echo round-trip times of our own bell rings,
+the rates of incoming signals, queue depths and reconnections), and an optional exporter which
+serves them in Prometheus' text format.
+"""
+
+import bisect
+import collections
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Callable, Counter, Deque, Dict, List, Iterable, Tuple, Any
+
+from belltower.bell import MAX_BELL
+
+# The default upper bounds of histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# The default number of seconds after which a ring that hasn't been echoed is assumed to have been
+# dropped by the server
+DEFAULT_ECHO_TIMEOUT = 10.0
+# The default number of seconds over which `TowerMetrics.signal_rates` are measured
+DEFAULT_RATE_WINDOW = 60
+
+
+class Histogram:
+    """ A histogram of observed values, with fixed bucket boundaries. """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        # `counts[i]` is the number of observations in bucket `i`, and the last entry counts
+        # observations greater than every bucket's upper bound
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """ Adds an observation to the histogram. """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: 'Histogram') -> None:
+        """ Adds the observations of another histogram (with the same buckets) to this one. """
+        if other.buckets != self.buckets:
+            raise ValueError("Can't merge histograms with different buckets")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+    @property
+    def mean(self) -> float:
+        """ Returns the mean of the observed values (or 0 if nothing has been observed). """
+        return self.sum / self.count if self.count else 0.0
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Returns an estimate of the value that `fraction` of the observations are less than, i.e.
+        the upper bound of the bucket containing that observation.
+        """
+        target = fraction * self.count
+        cumulative = 0
+        for upper_bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return upper_bound
+        return float("inf")
+
+
+class TowerMetrics:
+    """ The metrics recorded by one tower.  All times are measured with `time.perf_counter`. """
+
+    def __init__(self, echo_timeout: float = DEFAULT_ECHO_TIMEOUT,
+                 rate_window: int = DEFAULT_RATE_WINDOW) -> None:
+        self.start_time = time.perf_counter()
+        # The time between emitting each of our bell rings and receiving it back from the server
+        self.echo_round_trip = Histogram()
+        # The number of signals received from Ringing Room, by name
+        self.signals_received: Counter[str] = collections.Counter()
+        self.connects = 0
+        # Functions which return the current depths of the tower's queues, by queue name
+        self.queue_depth_gauges: Dict[str, Callable[[], int]] = {}
+
+        # Rings which aren't echoed within this many seconds are assumed to have been dropped
+        self.echo_timeout = echo_timeout
+        # `signal_rates` are measured over this many seconds
+        self.rate_window = rate_window
+
+        # The time at which we last rang each bell, or 0 if there is no ring waiting to be echoed,
+        # and whether that ring was at handstroke
+        self._ring_send_times: List[float] = [0.0] * MAX_BELL
+        self._ring_send_strokes: List[bool] = [True] * MAX_BELL
+        # The signals received in each whole second of the last `rate_window` seconds, oldest first
+        self._recent_signals: Deque[Tuple[int, Counter[str]]] = collections.deque()
+
+    # ===== RECORDING =====
+
+    def record_signal(self, event: str) -> None:
+        """ Records that a signal has been received. """
+        self.signals_received[event] += 1
+        second = int(time.perf_counter())
+        if not self._recent_signals or self._recent_signals[-1][0] != second:
+            self._recent_signals.append((second, collections.Counter()))
+            while self._recent_signals[0][0] < second - self.rate_window:
+                self._recent_signals.popleft()
+        self._recent_signals[-1][1][event] += 1
+
+    def record_ring_sent(self, bell_index: int, handstroke: bool) -> None:
+        """ Records that we are about to emit a ring of a given bell at a given stroke. """
+        self._ring_send_times[bell_index] = time.perf_counter()
+        self._ring_send_strokes[bell_index] = handstroke
+
+    def record_ring_received(self, bell_index: int, handstroke: Optional[bool] = None) -> None:
+        """
+        Records that a bell has been rung at a given stroke (or an unknown stroke, if that is None),
+        completing a round-trip if it is the echo of our ring.  A ring of the bell at the other
+        stroke, or after `echo_timeout`, means that our ring was dropped, so it is forgotten.
+        """
+        send_time = self._ring_send_times[bell_index]
+        if send_time:
+            self._ring_send_times[bell_index] = 0.0
+            round_trip = time.perf_counter() - send_time
+            if round_trip <= self.echo_timeout and (
+                handstroke is None or handstroke == self._ring_send_strokes[bell_index]
+            ):
+                self.echo_round_trip.observe(round_trip)
+
+    def record_connect(self) -> None:
+        """ Records that the socket-io connection has been (re)opened. """
+        self.connects += 1
+        # Any rings which were waiting to be echoed were lost with the old connection
+        self._ring_send_times = [0.0] * MAX_BELL
+
+    # ===== QUERIES =====
+
+    @property
+    def reconnects(self) -> int:
+        """ Returns the number of times that the connection has been re-opened. """
+        return max(0, self.connects - 1)
+
+    def signal_rates(self) -> Dict[str, float]:
+        """
+        Returns the mean number of signals of each type received per second over the last
+        `rate_window` seconds (or since the tower was created, if that is more recent).
+        """
+        now = time.perf_counter()
+        totals: Counter[str] = collections.Counter()
+        # Copy the buckets, since the receive thread may add new ones while we're reading them
+        for second, counts in list(self._recent_signals):
+            if second >= now - self.rate_window:
+                totals.update(counts)
+        elapsed = min(now - self.start_time, self.rate_window)
+        return {event: count / elapsed for event, count in totals.items()} if elapsed > 0 else {}
+
+    def queue_depths(self) -> Dict[str, int]:
+        """ Returns the current depth of each of the tower's queues. """
+        return {name: gauge() for name, gauge in self.queue_depth_gauges.items()}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """ Returns all the metrics as a dictionary (e.g. to be logged or serialised as JSON). """
+        return {
+            "echo_round_trip": {
+                "count": self.echo_round_trip.count,
+                "mean": self.echo_round_trip.mean,
+                "p50": self.echo_round_trip.percentile(0.5),
+                "p99": self.echo_round_trip.percentile(0.99),
+            },
+            "signals_received": dict(self.signals_received),
+            "signal_rates": self.signal_rates(),
+            "queue_depths": self.queue_depths(),
+            "reconnects": self.reconnects,
+        }
+
+
+# ===== PROMETHEUS EXPORTER =====
+
+def _escape_label_value(value: Any) -> str:
+    """ Escapes a value so that it can be put in quotes as a Prometheus label value. """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(towers: Iterable[Any]) -> str:
+    """ Renders the metrics of a collection of towers in Prometheus' text exposition format. """
+    lines: List[str] = []
+
+    def family(name: str, metric_type: str, help_text: str) -> None:
+        lines.append(f"# HELP belltower_{name} {help_text}")
+        lines.append(f"# TYPE belltower_{name} {metric_type}")
+
+    towers = list(towers)
+    labels_by_tower = [
+        f'tower_id="{_escape_label_value(t.tower_id)}",server="{_escape_label_value(t.server_url)}"'
+        for t in towers
+    ]
+
+    family("echo_round_trip_seconds", "histogram",
+           "Time between emitting a bell ring and receiving it back from the server.")
+    for tower, labels in zip(towers, labels_by_tower):
+        histogram = tower.metrics.echo_round_trip
+        cumulative = 0
+        for upper_bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'belltower_echo_round_trip_seconds_bucket{{{labels},le="{upper_bound}"}} '
+                         + f"{cumulative}")
+        lines.append(f'belltower_echo_round_trip_seconds_bucket{{{labels},le="+Inf"}} '
+                     + f"{histogram.count}")
+        lines.append(f"belltower_echo_round_trip_seconds_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"belltower_echo_round_trip_seconds_count{{{labels}}} {histogram.count}")
+
+    family("signals_received_total", "counter", "Signals received from Ringing Room.")
+    for tower, labels in zip(towers, labels_by_tower):
+        for event, count in tower.metrics.signals_received.items():
+            lines.append(f'belltower_signals_received_total{{{labels},'
+                         + f'event="{_escape_label_value(event)}"}} {count}')
+
+    family("queue_depth", "gauge", "Number of items waiting in each of the tower's queues.")
+    for tower, labels in zip(towers, labels_by_tower):
+        for queue, depth in tower.metrics.queue_depths().items():
+            lines.append(f'belltower_queue_depth{{{labels},queue="{_escape_label_value(queue)}"}} '
+                         + f"{depth}")
+
+    family("reconnects_total", "counter", "Times that the socket-io connection was re-opened.")
+    for tower, labels in zip(towers, labels_by_tower):
+        lines.append(f"belltower_reconnects_total{{{labels}}} {tower.metrics.reconnects}")
+
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusExporter:
+    """
+    Serves the metrics of a set of towers over HTTP (at any path) in Prometheus' text format, from
+    a background thread.
+    """
+
+    logger_name = "METRICS"
+
+    def __init__(self, towers: Iterable[Any] = (), host: str = "127.0.0.1",
+                 port: int = 9464) -> None:
+        self._towers = list(towers)
+        self._lock = threading.Lock()
+        self._host = host
+        self._port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+
+        self.logger = logging.getLogger(self.logger_name)
+
+    def add_tower(self, tower: Any) -> None:
+        """ Adds a tower whose metrics should be exported. """
+        with self._lock:
+            self._towers.append(tower)
+
+    def remove_tower(self, tower: Any) -> None:
+        """ Stops exporting the metrics of a tower. """
+        with self._lock:
+            self._towers.remove(tower)
+
+    def start(self) -> None:
+        """ Starts serving the metrics from a background thread. """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                with exporter._lock:
+                    body = prometheus_text(exporter._towers).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                exporter.logger.debug(format, *args)
+
+        self._server = ThreadingHTTPServer((self._host, self._port), Handler)
+        self._port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True,
+                         name="belltower-metrics").start()
+        self.logger.info("Serving metrics at %s", self.url)
+
+    def stop(self) -> None:
+        """ Stops serving the metrics. """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def url(self) -> str:
+        """ The URL that the metrics are served at. """
+        return f"http://{self._host}:{self._port}/metrics"
+
+    # === ENTER/EXIT FOR 'WITH' BLOCKS ===
+
+    def __enter__(self) -> Any:
+        self.start()
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.stop()
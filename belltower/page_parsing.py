@@ -3,14 +3,21 @@ A module to store functions related to parsing the HTML of the Ringing Room towe
 things like the load-balanced URL of the socket-io server and the initial bell sounds.
 """
 
-from typing import Tuple
+from typing import Any, Optional, Tuple
 import re
+import threading
 
 import urllib
 import requests
 
 from belltower import BellType
 
+# The maximum number of connections kept open to each host by the shared HTTP session
+HTTP_POOL_SIZE = 32
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
 
 class TowerNotFoundError(ValueError):
     """ An error class created whenever the user inputs an incorrect room id. """
@@ -36,31 +43,39 @@ class InvalidURLError(Exception):
         return f"Unable to make a connection to '{self._url}'."
 
 
-def _fix_url(url: str) -> str:
+def http_session() -> requests.Session:
+    """
+    Returns the `requests.Session` shared by every tower for its HTTP requests, so that connections
+    (and their TCP/TLS handshakes) are reused between requests and between towers.
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=HTTP_POOL_SIZE,
+                                                    pool_maxsize=HTTP_POOL_SIZE)
+            _http_session.mount("http://", adapter)
+            _http_session.mount("https://", adapter)
+        return _http_session
+
+
+def fix_url(url: str) -> str:
     """ Add 'https://' to the start of a URL if necessary """
     corrected_url = url if url.startswith("http") else "https://" + url
 
     return corrected_url
 
 
-def parse_page(tower_id: int, unfixed_http_server_url: str) -> Tuple[str, str, BellType]:
-    """
-    Parses the following things from the ringingroom.com page code:
-    1. The URL of the socket server, Which (since the addition of load balancing) is not
-       necessarily the same as the URL of the http server that people will put into their browser
-       URL bars.
-    2. The human-readable name of the tower (not to be confused with the tower ID)
-    3. The initial BellType (tower or handbells).  This isn't sent as a socketio signal, and
-       therefore must be parsed from the page.
-    """
-    http_server_url = _fix_url(unfixed_http_server_url)
+def _tower_page_url(tower_id: int, unfixed_http_server_url: str) -> Tuple[str, str]:
+    """ Returns the fixed URL of the http server, along with the URL of the given tower's page. """
+    http_server_url = fix_url(unfixed_http_server_url)
     url = urllib.parse.urljoin(http_server_url, str(tower_id)) # type: ignore
 
-    try:
-        html = requests.get(url).text
-    except requests.exceptions.ConnectionError as e:
-        raise InvalidURLError(http_server_url) from e
+    return http_server_url, url
 
+
+def _parse_html(html: str, tower_id: int, http_server_url: str) -> Tuple[str, str, BellType]:
+    """ Extracts the information returned by `parse_page` from the HTML of a tower page. """
     try:
         # Trying to extract the following line in the rendered html:
         # 
@@ -78,3 +93,42 @@ def parse_page(tower_id: int, unfixed_http_server_url: str) -> Tuple[str, str, B
         return load_balancing_url, tower_name, BellType.from_ringingroom_name(bell_type_str)
     except ValueError as e:
         raise TowerNotFoundError(tower_id, http_server_url) from e
+
+
+def parse_page(tower_id: int, unfixed_http_server_url: str) -> Tuple[str, str, BellType]:
+    """
+    Parses the following things from the ringingroom.com page code:
+    1. The URL of the socket server, Which (since the addition of load balancing) is not
+       necessarily the same as the URL of the http server that people will put into their browser
+       URL bars.
+    2. The human-readable name of the tower (not to be confused with the tower ID)
+    3. The initial BellType (tower or handbells).  This isn't sent as a socketio signal, and
+       therefore must be parsed from the page.
+    """
+    http_server_url, url = _tower_page_url(tower_id, unfixed_http_server_url)
+
+    try:
+        html = http_session().get(url).text
+    except requests.exceptions.ConnectionError as e:
+        raise InvalidURLError(http_server_url) from e
+
+    return _parse_html(html, tower_id, http_server_url)
+
+
+async def parse_page_async(tower_id: int, unfixed_http_server_url: str,
+                           session: Any) -> Tuple[str, str, BellType]:
+    """
+    The same as `parse_page`, but fetches the page using a given `aiohttp.ClientSession` so that it
+    doesn't block the event loop.
+    """
+    import aiohttp # type: ignore
+
+    http_server_url, url = _tower_page_url(tower_id, unfixed_http_server_url)
+
+    try:
+        async with session.get(url) as response:
+            html = await response.text()
+    except aiohttp.ClientConnectionError as e:
+        raise InvalidURLError(http_server_url) from e
+
+    return _parse_html(html, tower_id, http_server_url)
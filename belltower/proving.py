@@ -0,0 +1,171 @@
+"""
+A module for proving touches, i.e. checking that no row is rung more than once.  Every row is packed
+into one integer (4 bits per bell, which fits `MAX_BELL` = 16 bells into 64 bits), so whole peals
+can be proved with a single sort and rows rung live can be checked with one set lookup.  Requires
+`numpy` to be installed.
+"""
+
+import logging
+from typing import Optional, Callable, Dict, List, Sequence, Tuple, Any
+
+import numpy as np # type: ignore
+
+from belltower import Bell, Stroke
+from belltower.bell import MAX_BELL
+
+# The number of bits used to store each bell of a packed row
+BITS_PER_BELL = 4
+
+# A pair of indices of rows which are the same, the earlier row first
+FalsePair = Tuple[int, int]
+
+
+def pack_row(row: Sequence[Any]) -> int:
+    """ Packs a row (of `Bell`s or bell indices) into a single integer. """
+    packed = 0
+    for place, bell in enumerate(row):
+        packed |= (bell.index if isinstance(bell, Bell) else bell) << (BITS_PER_BELL * place)
+    return packed
+
+
+def pack_rows(rows: Any) -> np.ndarray:
+    """ Packs a (rows x stage) array of bell indices into a 1D array of integers. """
+    rows = np.asarray(rows, dtype=np.uint64)
+    if rows.ndim != 2 or rows.shape[1] > MAX_BELL:
+        raise ValueError(f"Expected a (rows x stage) array of at most {MAX_BELL} bells, "
+                         + f"got {rows.shape}")
+    shifts = np.arange(rows.shape[1], dtype=np.uint64) * np.uint64(BITS_PER_BELL)
+    return np.bitwise_or.reduce(rows << shifts, axis=1)
+
+
+def false_pairs(rows: Any) -> List[FalsePair]:
+    """
+    Returns every pair of consecutive occurrences of the same row in a (rows x stage) array of bell
+    indices, sorted by the index of the later row.  Note that `Method.touch` includes the final
+    lead head, which must be removed before proving a touch which comes round.
+    """
+    packed = pack_rows(rows)
+    # A stable sort keeps equal rows in the order they were rung
+    order = np.argsort(packed, kind="stable")
+    is_repeat = packed[order[1:]] == packed[order[:-1]]
+    firsts = order[:-1][is_repeat]
+    seconds = order[1:][is_repeat]
+    by_second = np.argsort(seconds, kind="stable")
+    return list(zip(firsts[by_second].tolist(), seconds[by_second].tolist()))
+
+
+def first_false_pair(rows: Any) -> Optional[FalsePair]:
+    """ Returns the first repeated row in a touch (see `false_pairs`), or None if it is true. """
+    pairs = false_pairs(rows)
+    return pairs[0] if pairs else None
+
+
+def is_true(rows: Any) -> bool:
+    """ Returns True if no row in a (rows x stage) array of bell indices is repeated. """
+    packed = pack_rows(rows)
+    return len(np.unique(packed)) == len(packed)
+
+
+class Prover:
+    """
+    Proves a touch incrementally, as rows are appended one at a time (e.g. from a `RowAssembler`)
+    or in blocks.  Every row which repeats an earlier row is recorded in `false_pairs`, and the
+    `on_false` callbacks are called as soon as it is added.
+    """
+
+    logger_name = "PROVING"
+
+    def __init__(self) -> None:
+        # Maps each packed row to the index of its latest occurrence
+        self._rows: Dict[int, int] = {}
+        self.number_of_rows = 0
+        self.false_pairs: List[FalsePair] = []
+
+        self._invoke_on_false: List[Callable[[int, int, Tuple[int, ...]], Any]] = []
+
+        self.logger = logging.getLogger(self.logger_name)
+
+    def attach(self, row_assembler: Any) -> None:
+        """
+        Proves every row assembled by a `RowAssembler`, starting a new touch whenever the assembler
+        is reset (i.e. when the bells are set at hand or the tower changes size).
+        """
+        row_assembler.on_row(self._on_row)
+        row_assembler.on_change(lambda _: self.reset())
+
+    # ===== CALLBACK DECORATORS =====
+
+    def on_false(self, func: Callable[[int, int, Tuple[int, ...]], Any]) \
+            -> Callable[[int, int, Tuple[int, ...]], Any]:
+        """
+        Adds a callback for a row being repeated, which is passed the index of the earlier row, the
+        index of the repeat and the row (as bell indices).
+        """
+        self._invoke_on_false.append(func)
+        return func
+
+    # ===== PROVING =====
+
+    def add_row(self, row: Sequence[Any]) -> Optional[FalsePair]:
+        """
+        Adds a row (of `Bell`s or bell indices), returning the pair of rows that it makes false (or
+        None if it is true so far).
+        """
+        packed = pack_row(row)
+        index = self.number_of_rows
+        self.number_of_rows += 1
+        previous = self._rows.get(packed)
+        self._rows[packed] = index
+        if previous is None:
+            return None
+        self._record_false((previous, index), row)
+        return previous, index
+
+    def add_rows(self, rows: Any) -> List[FalsePair]:
+        """
+        Adds a (rows x stage) array of bell indices in one batch, returning the false pairs that it
+        creates (with indices counted from the start of the touch).
+        """
+        rows = np.asarray(rows)
+        start = self.number_of_rows
+        packed = pack_rows(rows).tolist()
+        new_pairs: List[FalsePair] = []
+        for offset, packed_row in enumerate(packed):
+            previous = self._rows.get(packed_row)
+            self._rows[packed_row] = start + offset
+            if previous is not None:
+                new_pairs.append((previous, start + offset))
+        self.number_of_rows += len(packed)
+        for pair in new_pairs:
+            self._record_false(pair, rows[pair[1] - start])
+        return new_pairs
+
+    def reset(self) -> None:
+        """ Forgets every row, so that the next row starts a new touch. """
+        self._rows.clear()
+        self.number_of_rows = 0
+        self.false_pairs = []
+
+    @property
+    def is_true(self) -> bool:
+        """ Returns True if no row has been repeated since the last reset. """
+        return not self.false_pairs
+
+    @property
+    def first_false_pair(self) -> Optional[FalsePair]:
+        """ Returns the first pair of repeated rows, or None if the touch is true so far. """
+        return self.false_pairs[0] if self.false_pairs else None
+
+    # ===== HELPER FUNCTIONS =====
+
+    def _record_false(self, pair: FalsePair, row: Sequence[Any]) -> None:
+        """ Records that a pair of rows are the same, and calls the `on_false` callbacks. """
+        bells = tuple(bell.index if isinstance(bell, Bell) else int(bell) for bell in row)
+        self.false_pairs.append(pair)
+        self.logger.debug("Row %d repeats row %d", pair[1], pair[0])
+        for c in self._invoke_on_false:
+            c(pair[0], pair[1], bells)
+
+    def _on_row(self, row: Sequence[Bell], stroke: Stroke, timestamps: Any) -> None:
+        """ Callback for a row being assembled. """
+        self.add_row(row)
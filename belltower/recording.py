@@ -0,0 +1,424 @@
+"""
+A module for recording every signal received by a tower into a compact binary file, and for
+replaying those files back into the callbacks of a tower.
+
+A recording is made of two files:
+1. The record file (at the path given), containing a fixed-size header followed by fixed-width
+   8-byte records.  Each record holds a timestamp, an event code, one byte and one 16-bit word, so
+   a bell ring (whose byte packs the bell and tower size, and whose word is the handstroke mask of
+   the new bell state) takes exactly one record.  Events that need more data (e.g. user IDs or
+   strings) are followed by one 'argument' record holding two 32-bit values.  Signals which don't
+   fit into records are stored inline as length-prefixed JSON.
+2. The string file (at the path plus `.strings`), containing the strings used by the recording
+   (user names, chat messages, calls, etc.), each prefixed by its length.  Strings are referred to
+   by their byte offset in this file, and recently used strings are only stored once.
+
+The reader memory-maps both files and reads strings lazily by their offsets, so recordings of
+multi-hour sessions never need to fit into memory as Python objects.
+"""
+
+import collections
+import functools
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Optional, Dict, List, Iterator, Tuple, Any
+
+from belltower import BellType, HAND_BELLS, TOWER_BELLS
+from belltower.ringing_room import RingingRoomTower
+
+# A type alias for untyped JSON
+JSON = Dict[str, Any]
+
+MAGIC = b"BTREC\x00"
+FORMAT_VERSION = 2
+# The number of timestamp ticks per second.  A 32-bit timestamp can only represent just under 5
+# days, so longer recordings contain an _EPOCH record each time the timestamps wrap around.
+TICKS_PER_SECOND = 10_000
+# The number of ticks in each epoch
+_EPOCH_TICKS = 1 << 32
+# The number of strings whose offsets are remembered by the recorder, and whose decoded values are
+# cached by the reader
+STRING_CACHE_SIZE = 4096
+
+# magic, format version, tower ID, wall-clock start time
+_HEADER = struct.Struct("<6sHqd")
+# timestamp, event code, byte, word
+_RECORD = struct.Struct("<IBBH")
+# The two 32-bit values of an 'argument' record
+_ARGS = struct.Struct("<II")
+# The length prefix of each string in the string file, and of each inline JSON payload
+_STRING_LENGTH = struct.Struct("<I")
+
+# Event codes.  Codes marked with (+args) are followed by an argument record.
+_TOWER_INFO = 0     # byte: is_handbells                   (+args): tower name, 0
+_BELL_RUNG = 1      # byte: who_rang-1 | (size-1) << 4     word: handstroke mask
+_GLOBAL_STATE = 2   # byte: size                           word: handstroke mask
+_SIZE_CHANGE = 3    # byte: size
+_AUDIO_CHANGE = 4   # byte: is_handbells
+_CALL = 5           # (+args): call, 0
+_USER_ENTERED = 6   # (+args): user ID, user name
+_USER_LEFT = 7      # (+args): user ID, user name
+_USER_LIST = 8      # (+args): number of users, 0 - followed by that many _USER_LIST_ITEMs
+_USER_LIST_ITEM = 9 # (+args): user ID, user name
+_ASSIGN_USER = 10   # byte: bell number                    (+args): user ID (0 if unassigned), 0
+_CHAT = 11          # (+args): user name, message
+_OTHER = 12         # (+args): event name, payload length - followed by the JSON payload
+_EPOCH = 13         # word: the number of times that the timestamps have wrapped around
+
+_EVENT_NAMES = {
+    _BELL_RUNG: "s_bell_rung",
+    _GLOBAL_STATE: "s_global_state",
+    _SIZE_CHANGE: "s_size_change",
+    _AUDIO_CHANGE: "s_audio_change",
+    _CALL: "s_call",
+    _USER_ENTERED: "s_user_entered",
+    _USER_LEFT: "s_user_left",
+    _USER_LIST: "s_set_userlist",
+    _ASSIGN_USER: "s_assign_user",
+    _CHAT: "s_msg_sent",
+}
+
+
+def _mask_from_bell_state(bell_state: List[bool]) -> int:
+    mask = 0
+    for i, is_handstroke in enumerate(bell_state):
+        if is_handstroke:
+            mask |= 1 << i
+    return mask
+
+
+def _bell_state_from_mask(mask: int, size: int) -> List[bool]:
+    return [bool(mask >> i & 1) for i in range(size)]
+
+
+def _check_str(value: Any) -> str:
+    """
+    Raises `TypeError` if a value isn't a string, so that payloads containing other values are
+    stored as JSON rather than being converted to strings.
+    """
+    if not isinstance(value, str):
+        raise TypeError(f"{value!r} is not a string")
+    return value
+
+
+class SessionRecorder:
+    """
+    Records every signal received by a tower into a compact binary file.  This should be attached
+    before the tower is connected, and used as a context manager:
+
+        tower = RingingRoomTower(765432918)
+        with SessionRecorder(tower, "session.rec"), tower:
+            ...
+    """
+
+    logger_name = "RECORDER"
+
+    def __init__(self, tower: RingingRoomTower, path: str) -> None:
+        self._path = path
+        self._records: Any = open(path, "wb")
+        self._strings: Any = open(path + ".strings", "wb")
+        # The offsets of the most recently used strings in the string file
+        self._string_offsets: Dict[str, int] = collections.OrderedDict()
+        self._strings_length = 0
+        self._start_time = time.perf_counter()
+        self._epoch = 0
+
+        self.logger = logging.getLogger(self.logger_name)
+
+        self._records.write(_HEADER.pack(MAGIC, FORMAT_VERSION, tower.tower_id, time.time()))
+        self._write(0, _TOWER_INFO, int(tower.bell_type.is_handbells()), 0,
+                    self._intern(tower.tower_name), 0)
+
+        tower.add_signal_listener(self.record)
+
+    def record(self, event: str, data: JSON, timestamp: Optional[float] = None) -> None:
+        """
+        Appends a signal to the recording.  Called automatically for every signal, with the
+        `time.perf_counter()` time at which it arrived (which defaults to now).  Signals whose
+        payloads don't fit into records are stored as JSON, and signals which can't be stored at all
+        are logged and skipped, so recording never stops the tower from handling a signal.
+        """
+        if self._records is None:
+            return
+        ticks = self._ticks(time.perf_counter() if timestamp is None else timestamp)
+        try:
+            self._record(ticks, event, data)
+        except (AttributeError, KeyError, TypeError, ValueError, struct.error):
+            try:
+                self._record_other(ticks, event, data)
+            except (TypeError, ValueError) as e:
+                self.logger.warning("Can't record '%s' signal %r: %s", event, data, e)
+
+    def close(self) -> None:
+        """ Flushes and closes the recording. """
+        if self._records is not None:
+            self._records.close()
+            self._strings.close()
+            self._records = None
+
+    # ===== HELPER FUNCTIONS =====
+
+    def _record(self, ticks: int, event: str, data: JSON) -> None:
+        """
+        Encodes a signal into records, raising an exception (before anything is written) if it
+        doesn't fit.
+        """
+        if event == "s_bell_rung":
+            bell_state = data["global_bell_state"]
+            who_rang = data["who_rang"]
+            if not (1 <= who_rang <= 16 and 1 <= len(bell_state) <= 16):
+                raise ValueError("Bell out of range")
+            byte = (who_rang - 1) | (len(bell_state) - 1) << 4
+            self._write(ticks, _BELL_RUNG, byte, _mask_from_bell_state(bell_state))
+        elif event == "s_global_state":
+            bell_state = data["global_bell_state"]
+            self._write(ticks, _GLOBAL_STATE, len(bell_state), _mask_from_bell_state(bell_state))
+        elif event == "s_size_change":
+            self._write(ticks, _SIZE_CHANGE, data["size"], 0)
+        elif event == "s_audio_change" and data["new_audio"] in ("Hand", "Tower"):
+            self._write(ticks, _AUDIO_CHANGE, int(data["new_audio"] == "Hand"), 0)
+        elif event == "s_call":
+            self._write(ticks, _CALL, 0, 0, self._intern(data["call"]), 0)
+        elif event in ("s_user_entered", "s_user_left"):
+            code = _USER_ENTERED if event == "s_user_entered" else _USER_LEFT
+            user_id = data["user_id"]
+            _ARGS.pack(user_id, 0)
+            self._write(ticks, code, 0, 0, user_id, self._intern(data["username"]))
+        elif event == "s_set_userlist":
+            users = [(user["user_id"], user["username"]) for user in data["user_list"]]
+            for user_id, user_name in users:
+                _ARGS.pack(user_id, 0)
+                _check_str(user_name)
+            self._write(ticks, _USER_LIST, 0, 0, len(users), 0)
+            for user_id, user_name in users:
+                self._write(ticks, _USER_LIST_ITEM, 0, 0, user_id, self._intern(user_name))
+        elif event == "s_assign_user":
+            self._write(ticks, _ASSIGN_USER, data["bell"], 0, data["user"] or 0, 0)
+        elif event == "s_msg_sent" and data.keys() == {"user", "msg"}:
+            # Messages with any other fields (e.g. the `email` and `time` sent by Ringing Room)
+            # are stored as JSON, so that none of their fields are lost
+            user = self._intern(data["user"])
+            self._write(ticks, _CHAT, 0, 0, user, self._intern(data["msg"]))
+        else:
+            self._record_other(ticks, event, data)
+
+    def _record_other(self, ticks: int, event: str, data: JSON) -> None:
+        """ Stores a signal's payload inline, as length-prefixed JSON. """
+        payload = json.dumps(data).encode("utf-8")
+        self._write(ticks, _OTHER, 0, 0, self._intern(event), len(payload))
+        self._records.write(payload)
+
+    def _ticks(self, timestamp: float) -> int:
+        """
+        Converts a `time.perf_counter()` time into a timestamp (within the current epoch), writing
+        an _EPOCH record first if the timestamps have wrapped around.
+        """
+        seconds = max(0.0, timestamp - self._start_time)
+        epoch, ticks = divmod(int(seconds * TICKS_PER_SECOND), _EPOCH_TICKS)
+        if epoch != self._epoch:
+            self._epoch = epoch
+            self._records.write(_RECORD.pack(0, _EPOCH, 0, epoch))
+        return ticks
+
+    def _write(self, ticks: int, code: int, byte: int, word: int, *args: int) -> None:
+        """
+        Writes one record, followed by an argument record if any args are given.  Both records are
+        packed before either is written, so nothing is written if the values don't fit.
+        """
+        record = _RECORD.pack(ticks, code, byte, word)
+        if args:
+            record += _ARGS.pack(*args)
+        self._records.write(record)
+
+    def _intern(self, string: str) -> int:
+        """
+        Returns the offset of a string in the string file, adding it if it hasn't been used
+        recently.
+        """
+        offset = self._string_offsets.get(string)
+        if offset is not None:
+            self._string_offsets.move_to_end(string) # type: ignore
+            return offset
+        encoded = _check_str(string).encode("utf-8")
+        offset = self._strings_length
+        _ARGS.pack(offset, 0)  # Raise `struct.error` if the string file is over 4GB
+        self._strings.write(_STRING_LENGTH.pack(len(encoded)) + encoded)
+        self._strings_length += _STRING_LENGTH.size + len(encoded)
+        self._string_offsets[string] = offset
+        if len(self._string_offsets) > STRING_CACHE_SIZE:
+            self._string_offsets.popitem(last=False) # type: ignore
+        return offset
+
+    # === ENTER/EXIT FOR 'WITH' BLOCKS ===
+
+    def __enter__(self) -> Any:
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
+
+
+class SessionReader:
+    """
+    Reads a recording made by `SessionRecorder`.  The record file is memory-mapped, and the signals
+    are decoded lazily as they are iterated over.
+    """
+
+    logger_name = "RECORDING READER"
+
+    def __init__(self, path: str) -> None:
+        self.logger = logging.getLogger(self.logger_name)
+
+        with open(path, "rb") as f:
+            # The header and the tower info record are always written when the recording is made
+            if os.fstat(f.fileno()).st_size < _HEADER.size + _RECORD.size + _ARGS.size:
+                raise ValueError(f"'{path}' is too short to be a belltower recording")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.tower_id, self.start_time = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not a belltower recording")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"'{path}' has unsupported format version {version}")
+        with open(path + ".strings", "rb") as f:
+            # Empty files can't be memory-mapped (but then no strings are referred to)
+            self._strings_mmap = (mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                                  if os.fstat(f.fileno()).st_size else b"")
+        # Strings are read from the string file when they are first needed
+        self._string = functools.lru_cache(maxsize=STRING_CACHE_SIZE)(self._read_string)
+
+        # The first record is always the tower info
+        _, code, is_hand, _ = _RECORD.unpack_from(self._mmap, _HEADER.size)
+        name_offset, _ = _ARGS.unpack_from(self._mmap, _HEADER.size + _RECORD.size)
+        self.tower_name = self._string(name_offset)
+        self.bell_type: BellType = HAND_BELLS if is_hand else TOWER_BELLS
+
+    def signals(self) -> Iterator[Tuple[float, str, JSON]]:
+        """
+        Iterates over the recorded signals, as `(seconds since the start, event name, payload)`
+        tuples.  The payloads are in the same form as the ones sent by Ringing Room.  If the
+        recording was cut off part way through a signal (e.g. because the recording process was
+        killed), this stops (with a warning) after the last complete signal.
+        """
+        mm = self._mmap
+        string = self._string
+        offset = _HEADER.size
+        end = len(mm)
+        # The tower size isn't stored on every record, so it has to be tracked during decoding
+        size = 0
+        epoch_ticks = 0
+
+        while offset < end:
+            record_offset = offset
+            if offset + _RECORD.size > end:
+                break
+            ticks, code, byte, word = _RECORD.unpack_from(mm, offset)
+            offset += _RECORD.size
+            seconds = (epoch_ticks + ticks) / TICKS_PER_SECOND
+
+            if code == _BELL_RUNG:
+                size = (byte >> 4) + 1
+                yield seconds, "s_bell_rung", {
+                    "global_bell_state": _bell_state_from_mask(word, size),
+                    "who_rang": (byte & 0xf) + 1
+                }
+                continue
+            if code == _GLOBAL_STATE:
+                size = byte
+                yield seconds, "s_global_state", {
+                    "global_bell_state": _bell_state_from_mask(word, size)
+                }
+                continue
+            if code == _SIZE_CHANGE:
+                size = byte
+                yield seconds, "s_size_change", {"size": size}
+                continue
+            if code == _AUDIO_CHANGE:
+                yield seconds, "s_audio_change", {"new_audio": "Hand" if byte else "Tower"}
+                continue
+            if code == _EPOCH:
+                epoch_ticks = word * _EPOCH_TICKS
+                continue
+
+            # All the other events are followed by an argument record
+            if offset + _ARGS.size > end:
+                break
+            a, b = _ARGS.unpack_from(mm, offset)
+            offset += _ARGS.size
+
+            if code == _TOWER_INFO:
+                continue
+            elif code == _CALL:
+                yield seconds, "s_call", {"call": string(a)}
+            elif code in (_USER_ENTERED, _USER_LEFT):
+                yield seconds, _EVENT_NAMES[code], {"user_id": a, "username": string(b)}
+            elif code == _USER_LIST:
+                if offset + a * (_RECORD.size + _ARGS.size) > end:
+                    break
+                user_list = []
+                for _ in range(a):
+                    user_id, name_id = _ARGS.unpack_from(mm, offset + _RECORD.size)
+                    offset += _RECORD.size + _ARGS.size
+                    user_list.append({"user_id": user_id, "username": string(name_id)})
+                yield seconds, "s_set_userlist", {"user_list": user_list}
+            elif code == _ASSIGN_USER:
+                yield seconds, "s_assign_user", {"bell": byte, "user": a or ""}
+            elif code == _CHAT:
+                yield seconds, "s_msg_sent", {"user": string(a), "msg": string(b)}
+            elif code == _OTHER:
+                if offset + b > end:
+                    break
+                payload = bytes(mm[offset:offset + b])
+                offset += b
+                yield seconds, string(a), json.loads(payload.decode("utf-8"))
+            else:
+                raise ValueError(f"Unknown event code {code} at byte {record_offset}")
+        else:
+            return
+        self.logger.warning("Recording is truncated at byte %d, ignoring the rest", record_offset)
+
+    def replay(self, tower: RingingRoomTower, speed: Optional[float] = 1.0) -> None:
+        """
+        Replays the recorded signals into the callbacks of a tower (which can be created with
+        `RingingRoomTower.offline`).  `speed` is a multiplier for the rate at which signals are
+        replayed, or `None` to replay them as fast as possible.  Signal listeners are passed the
+        recorded times of the signals, in seconds since the start of the recording, whatever the
+        speed.
+        """
+        start = time.perf_counter()
+        for seconds, event, data in self.signals():
+            if speed is not None:
+                sleep_time = start + seconds / speed - time.perf_counter()
+                if sleep_time > 0:
+                    time.sleep(sleep_time)
+            if event in tower._signal_handlers:
+                tower._handle_signal(event, data, seconds)
+
+    def offline_tower(self) -> RingingRoomTower:
+        """ Creates an offline tower with the same ID, name and bell type as the recording. """
+        return RingingRoomTower.offline(self.tower_id, self.tower_name, self.bell_type)
+
+    def close(self) -> None:
+        """ Closes the memory-mapped files. """
+        self._mmap.close()
+        if isinstance(self._strings_mmap, mmap.mmap):
+            self._strings_mmap.close()
+
+    # ===== HELPER FUNCTIONS =====
+
+    def _read_string(self, offset: int) -> str:
+        """ Reads the string at a given offset in the string file. """
+        length, = _STRING_LENGTH.unpack_from(self._strings_mmap, offset)
+        start = offset + _STRING_LENGTH.size
+        return bytes(self._strings_mmap[start:start + length]).decode("utf-8")
+
+    # === ENTER/EXIT FOR 'WITH' BLOCKS ===
+
+    def __enter__(self) -> Any:
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
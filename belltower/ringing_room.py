@@ -1,51 +1,127 @@
 import collections
+from concurrent.futures import Future, ThreadPoolExecutor
+import functools
 import logging
 import datetime
-from time import sleep
-from typing import Optional, Callable, Dict, List, Any
+import threading
+import time
+from time import perf_counter
+from types import MappingProxyType
+from typing import (Optional, Callable, Deque, Dict, List, Iterable, Mapping, Sequence, Tuple,
+                    Any)
 
 import socketio # type: ignore
-import requests
 import urllib
 import json
 
-from belltower import call, Bell, Stroke, HANDSTROKE, BellType, HAND_BELLS, TOWER_BELLS
-from belltower.page_parsing import parse_page
+from belltower import call, Bell, Stroke, HANDSTROKE, BACKSTROKE, BellType, HAND_BELLS, TOWER_BELLS
+from belltower.bell import MAX_BELL
+from belltower.page_parsing import parse_page, http_session
+from belltower.scheduling import BaseStrikeScheduler, StrikeScheduler, StrikeReport
+from belltower.emit_queue import EmitQueue
+from belltower.dispatch import CallbackDispatcher, BELL_RING
+from belltower.metrics import TowerMetrics
+from belltower.metadata_cache import MetadataCache, TowerMetadata
+from belltower import events
+from belltower.events import Event, EventDecodeError
+from belltower.row_gen import RowGenerator, compile_row_gen
+from belltower.tower_state import TowerState
+from belltower import tracing
+from belltower.tracing import Tracer
+from belltower.chat import ChatQueue, ChatSender, TokenBucket, server_bucket, PRIORITY_NORMAL
 
 # A type alias for untyped JSON
 JSON = Dict[str, Any]
 
-class RingingRoomTower:
-    """ A Tower for Ringing Room. """
+# Policies for signals emitted whilst the connection is down (see `RingingRoomTower.__init__`)
+OUTAGE_REJECT = "reject"
+OUTAGE_QUEUE = "queue"
+
+# The types of callback which are held back whilst the tower state is being re-synchronised after a
+# reconnect, and are instead generated from the differences between the old and new states
+_RESYNCED_EVENT_TYPES = frozenset([
+    "user_enter", "user_leave", "assign", "unassign", "set_at_hand", "size_change"
+])
+
+class BaseRingingRoomTower:
+    """
+    The parts of a Ringing Room tower which don't depend on how it is connected: the tower state,
+    the callback decorators and the handlers of the signals received from Ringing Room.  This is
+    shared by `RingingRoomTower` and `AsyncRingingRoomTower`, which add the connection and actions.
+    """
 
     logger_name = "TOWER"
     EXPECTED_RR_MAJOR = 1
     EXPECTED_RR_MINOR = 0
-
-    def __init__(self, tower_id: int, url: str = "ringingroom.com",
-                 run_version_check: bool = True) -> None:
-        """ Initialise a tower with a given room id and url. """
-        self.tower_id = tower_id
-        self._url, self._tower_name, self._bell_type = parse_page(tower_id, url)
-        self._socket_io_client: Optional[socketio.Client] = None
+    # The delays between attempts to reconnect start at `RECONNECT_DELAY` seconds and double after
+    # every failed attempt, up to `RECONNECT_DELAY_MAX` seconds
+    RECONNECT_DELAY = 0.5
+    RECONNECT_DELAY_MAX = 10.0
+    # The maximum number of signals which are queued whilst disconnected, under `OUTAGE_QUEUE`
+    MAX_OUTAGE_QUEUE = 1000
+    # RR may send the signals describing a tower (user list, assignments, etc.) in any order, so
+    # after reconnecting the new state is assumed to be complete this many seconds after the global
+    # state arrives
+    RESYNC_SETTLE_TIME = 0.5
+    # If chat messages are queued (see `RingingRoomTower.__init__`), they are rate limited to
+    # `CHAT_RATE` messages per second per tower (with bursts of up to `CHAT_BURST`) and
+    # `SERVER_CHAT_RATE` per socket-io server, and messages from the same user sent within
+    # `CHAT_COALESCE_WINDOW` seconds are merged.  Once `MAX_CHAT_QUEUE` messages are waiting, the
+    # lowest-priority messages are dropped.
+    CHAT_RATE = 1.0
+    CHAT_BURST = 5
+    SERVER_CHAT_RATE = 5.0
+    SERVER_CHAT_BURST = 10
+    CHAT_COALESCE_WINDOW = 0.25
+    MAX_CHAT_QUEUE = 50
+
+    def _init_state_and_callbacks(self) -> None:
+        """
+        Initialises the tower state and the (empty) callback lists.  This is separate from
+        `__init__` so that other kinds of tower (e.g. `AsyncRingingRoomTower`) can share it without
+        having to fetch the tower page on construction.
+        """
         # This is used by `_on_global_bell_state` to determine whether or not a `s_global_state`
         # signal is caused by us entering the tower or by a user setting the bells at handstroke
         self._waiting_for_first_global_state = True
 
-        # Check that RR has a compatible version
-        if run_version_check:
-            self.check_version()
-
         # === CURRENT TOWER STATE ===
-        self._bell_state: List[Stroke] = []
-        self._assigned_users: Dict[Bell, int] = {}
-        # A map from user IDs to the corresponding user name
-        self._user_name_map: Dict[int, str] = {}
+        # The size, users and assignments are kept in an immutable snapshot, which is only ever
+        # replaced (never modified) by the thread handling signals, so other threads can read it
+        # without locking
+        self._state = TowerState()
+        # The bell state changes on every blow, so it isn't part of the snapshot.  It is stored as a
+        # bitmask (where bit `i` is set if the bell with index `i` is at handstroke), which is also
+        # only ever replaced, so bell rings can update it without building a new snapshot.
+        self._handstroke_mask = 0
+        # Calls and set-at-hands are events rather than state, so they are counted so that
+        # `wait_for` predicates can tell when a new one has happened
+        self._call_counts: Dict[str, int] = collections.Counter()
+        self._set_at_hand_count = 0
+
+        # === CONNECTION STATE ===
+        # Set when the connection drops unexpectedly, until it is re-opened
+        self._connection_lost = False
+        # The signals emitted whilst the connection was down, under `OUTAGE_QUEUE`
+        self._outage_queue: Deque[Tuple[str, Any]] = collections.deque()
+        # The state held before reconnecting, which is compared to the new state once it has been
+        # received.  This is None unless the state is being re-synchronised.
+        self._state_before_resync: Optional[TowerState] = None
+        # The time when the global state arrived whilst re-synchronising
+        self._resync_state_time = 0.0
+        # Held whilst handling signals during a re-sync, so that it can finish on another thread
+        self._resync_lock = threading.Lock()
 
         # === CALLBACK LISTS ===
         # While-ringing actions
         self._invoke_on_call: Dict[str, List[Callable[[], Any]]] = collections.defaultdict(list)
-        self._invoke_on_bell_ring: List[Callable[[Bell, Stroke], Any]] = []
+        # Every bell ring callback, with the bitmask of the bells and the stroke it is filtered to
+        self._bell_ring_subscriptions: List[Tuple[Callable[[Bell, Stroke], Any], int,
+                                                  Optional[Stroke]]] = []
+        # The callbacks for each (stroke, bell), indexed by `[is_backstroke][bell.index]`, which are
+        # rebuilt whenever a callback is added so that ringing a bell doesn't need any filtering
+        self._bell_ring_dispatch: List[List[List[Callable[[Bell, Stroke], Any]]]] = \
+            [[[] for _ in range(MAX_BELL)] for _ in range(2)]
         # Between-touch actions
         self._invoke_on_size_change: List[Callable[[int], Any]] = []
         self._invoke_on_set_at_hand: List[Callable[[], Any]] = []
@@ -53,57 +129,97 @@ class RingingRoomTower:
         self._invoke_on_type_change: List[Callable[[], Any]] = []
         self._invoke_on_user_enter: List[Callable[[int, str], Any]] = []
         self._invoke_on_user_leave: List[Callable[[int, str], Any]] = []
+        # Callbacks which are only run for one user, by user ID
+        self._invoke_on_user_enter_by_id: Dict[int, List[Callable[[int, str], Any]]] = \
+            collections.defaultdict(list)
+        self._invoke_on_user_leave_by_id: Dict[int, List[Callable[[int, str], Any]]] = \
+            collections.defaultdict(list)
         self._invoke_on_assign: List[Callable[[int, str, Bell], Any]] = []
         self._invoke_on_unassign: List[Callable[[Bell], Any]] = []
         self._invoke_on_chat: List[Callable[[str, str], Any]] = []
+        # Subscriptions to typed events, by event type (where `Event` subscribes to every event)
+        self._invoke_on_event: Dict[type, List[Callable[[Event, float], Any]]] = \
+            collections.defaultdict(list)
 
         # Code specific to the Wheatley/RR interface
         self._invoke_on_setting_change: List[Callable[[str, Any], Any]] = []
-        self._invoke_on_row_gen_change: List[Callable[[Any], Any]] = []
+        self._invoke_on_row_gen_change: List[Callable[[RowGenerator], Any]] = []
         self._invoke_on_stop_touch: List[Callable[[], Any]] = []
+        # The latest value of every Wheatley setting which has been received
+        self._wheatley_settings: Mapping[str, Any] = MappingProxyType({})
+        # The latest row generator, which is compiled as soon as it is received (see
+        # `belltower.row_gen`), or None if no row generator has been received
+        self._row_gen: Optional[RowGenerator] = None
+
+        # The queue and sender of chat messages, if chat messages are queued.  These are created
+        # when the first message is sent.
+        self._chat_queue: Optional[ChatQueue] = None
+        self._chat_sender: Any = None
+
+        # The scheduler used by `ring_rows`, if the tower is currently ringing rows
+        self._strike_scheduler: Optional[BaseStrikeScheduler] = None
+
+        # Functions which are passed every signal received from RR, before that signal is handled
+        self._signal_listeners: List[Callable[[str, JSON, float], Any]] = []
+        self._signal_handlers = self._event_handlers()
+
+        # Structured tracing, which is off until a sink is added (see `belltower.tracing`)
+        self.tracer = Tracer()
+
+        # Latency, throughput and queue depth metrics (see `belltower.metrics`)
+        self.metrics = TowerMetrics()
+        self.metrics.queue_depth_gauges.update(self._queue_depth_gauges())
 
         self.logger = logging.getLogger(self.logger_name)
 
     # ===== MISC =====
 
-    def wait_loaded(self) -> None:
-        """ Pause the current thread until this Tower's connection is open and stable. """
-        if self._socket_io_client is None or not self._socket_io_client.connected:
-            raise SocketIOClientError("Not Connected")
-
-        iteration = 0
-        # Wait up to 2 seconds
-        while iteration < 20:
-            if self._bell_state:
-                break
-            iteration += 1
-            sleep(0.1)
-        else:
-            raise SocketIOClientError("Not received bell state from RingingRoom")
+    def add_signal_listener(
+        self, func: Callable[[str, JSON, float], Any]
+    ) -> Callable[[str, JSON, float], Any]:
+        """
+        Adds a function which will be passed the name, (raw JSON) payload and `time.perf_counter()`
+        arrival time of every socket-io signal received from Ringing Room, before the signal is
+        handled by this tower.
+        """
+        self._signal_listeners.append(func)
+        return func
 
     def user_name_from_id(self, user_id: int) -> Optional[str]:
         """
         Converts a numerical user ID into the corresponding user name, returning None if user_id is
         not in the tower.
         """
-        return self._user_name_map.get(user_id)
+        return self._state.users.get(user_id)
 
     def get_assignment(self, bell: Bell) -> Optional[int]:
         """
         Returns the user ID of the user assigned to a given Bell, or None if that bell is either
         unassigned or doesn't exist.
         """
-        return self._assigned_users.get(bell)
+        return self._state.assignments.get(bell)
+
+    def get_bells_of(self, user_id: int) -> Tuple[Bell, ...]:
+        """ Returns the bells assigned to a given user (in order), which may be empty. """
+        return self._state.bells_of(user_id)
+
+    @property
+    def state(self) -> TowerState:
+        """
+        Returns an immutable snapshot of the tower's size, users and assignments, which is
+        consistent even whilst signals are being handled on another thread.
+        """
+        return self._state
 
     @property
-    def all_users(self) -> Dict[int, str]:
-        """ Returns a list of one user-(id, name) pair for each user in the tower. """
-        return dict(self._user_name_map)
+    def all_users(self) -> Mapping[int, str]:
+        """ Returns a (read-only) map from the ID to the name of each user in the tower. """
+        return self._state.users
 
     @property
     def number_of_bells(self) -> int:
         """ Returns the number of bells currently in the tower. """
-        return len(self._bell_state)
+        return self._state.number_of_bells
 
     @property
     def bell_type(self) -> BellType:
@@ -115,44 +231,84 @@ class RingingRoomTower:
         """ Returns the human-readable name of the current tower. """
         return self._tower_name
 
+    @property
+    def server_url(self) -> str:
+        """
+        Returns the URL of the (load-balanced) socket-io server that this tower connects to.  This
+        is not necessarily the same as the URL of the http server.
+        """
+        return self._url
+
+    @property
+    def wheatley_settings(self) -> Mapping[str, Any]:
+        """ Returns a (read-only) map of the Wheatley settings received from Ringing Room. """
+        return self._wheatley_settings
+
+    @property
+    def row_gen(self) -> Optional[RowGenerator]:
+        """
+        Returns the latest (already compiled) row generator received from Ringing Room, or None if
+        no row generator has been received.
+        """
+        return self._row_gen
+
+    @property
+    def is_connected(self) -> bool:
+        """ Returns True if this tower's socket-io connection is currently open. """
+        return self._socket_io_client is not None and self._socket_io_client.connected
+
     def get_stroke(self, bell: Bell) -> Optional[Stroke]:
         """ Returns the stroke of a given Bell, or None if the bell is not in the tower. """
-        if bell.index >= len(self._bell_state) or bell.index < 0:
-            self.logger.error(f"Bell {bell} not in tower")
+        if not self._state.has_bell(bell):
+            self.logger.error("Bell %s not in tower", bell)
             return None
-        return self._bell_state[bell.index]
+        return HANDSTROKE if self._handstroke_mask >> bell.index & 1 else BACKSTROKE
 
     def dump_debug_state(self, log_level: str = logging.WARNING) -> None:
         """ Dump the entire state of this tower to the console for debugging. """
+        state = self._state
         # Create a string of the bell strokes (separated into blocks of 4)
         stroke_string = ""
-        for i, stroke in enumerate(self._bell_state):
+        for i in range(state.number_of_bells):
             if i % 4 == 0 and i > 0:
                 stroke_string += " "
-            stroke_string += "H" if stroke.is_hand() else "B"
+            stroke_string += "H" if self._handstroke_mask >> i & 1 else "B"
         # Print debug messages
         self.logger.log(log_level, "===== RR TOWER DEBUG DUMP =====")
-        self.logger.log(log_level, f"Joined tower #{self.tower_id}: '{self._tower_name}'")
-        self.logger.log(log_level, f"SocketIO connected to {self._url}")
-        self.logger.log(log_level, f"Ringing on {self.number_of_bells} {self._bell_type}")
-        self.logger.log(log_level, f"Users: {self._user_name_map}")
-        self.logger.log(log_level, f"Bell strokes: {stroke_string}")
-        if len(self._assigned_users) == 0:
-            self.logger.log(log_level, f"No bells assigned")
+        self.logger.log(log_level, "Joined tower #%s: '%s'", self.tower_id, self._tower_name)
+        self.logger.log(log_level, "SocketIO connected to %s", self._url)
+        self.logger.log(log_level, "Ringing on %s %s", state.number_of_bells, self._bell_type)
+        self.logger.log(log_level, "Users: %s", dict(state.users))
+        self.logger.log(log_level, "Bell strokes: %s", stroke_string)
+        if len(state.assignments) == 0:
+            self.logger.log(log_level, "No bells assigned")
         else:
-            for b, i in self._assigned_users.items():
-                self.logger.log(log_level, f"Bell {b} assigned to #{i}/{self.user_name_from_id(i)}")
+            for b, i in state.assignments.items():
+                self.logger.log(log_level, "Bell %s assigned to #%s/%s", b, i, state.users.get(i))
+        # Dump the recent trace records, if they are being kept
+        self.tracer.dump(self.logger, log_level)
 
     # ===== CALLBACK DECORATORS =====
 
-    def on_bell_ring(self, func: Callable[[Bell, Stroke], Any]) -> Callable[[Bell, Stroke], Any]:
+    def on_bell_ring(self, func: Optional[Callable[[Bell, Stroke], Any]] = None, *,
+                     bells: Optional[Iterable[Bell]] = None,
+                     stroke: Optional[Stroke] = None) -> Any:
         """
         Adds a given function as a callback for a bell being rung.  Note that the stroke refers to
         the state of the bell **before** it rang (meaning that the first blows after setting at hand
-        will be considered to be a handstroke).
+        will be considered to be a handstroke).  Use `on_bell_ring(bells=[...], stroke=...)` to only
+        run the callback when given bells ring, or at one stroke.
         """
-        self._invoke_on_bell_ring.append(func)
-        return func
+        def f(func: Callable[[Bell, Stroke], Any]) -> Callable[[Bell, Stroke], Any]:
+            bell_mask = (1 << MAX_BELL) - 1
+            if bells is not None:
+                bell_mask = 0
+                for bell in bells:
+                    bell_mask |= 1 << bell.index
+            self._bell_ring_subscriptions.append((func, bell_mask, stroke))
+            self._rebuild_bell_ring_dispatch()
+            return func
+        return f if func is None else f(func)
 
     def on_call(self, call: str):
         """ Adds a given function as a callback for a given call. """
@@ -179,21 +335,35 @@ class RingingRoomTower:
         self._invoke_on_set_at_hand.append(func)
         return func
 
-    def on_user_enter(self, func: Callable[[int, str], Any]) -> Callable[[int, str], Any]:
+    def on_user_enter(self, func: Optional[Callable[[int, str], Any]] = None, *,
+                      user_id: Optional[int] = None) -> Any:
         """
         Adds a callback for a user entering the tower.  The callback passes both a unique numerical
-        ID and a non-unique user name.
+        ID and a non-unique user name.  Use `on_user_enter(user_id=...)` to only run the callback
+        for one user.
         """
-        self._invoke_on_user_enter.append(func)
-        return func
+        def f(func: Callable[[int, str], Any]) -> Callable[[int, str], Any]:
+            if user_id is None:
+                self._invoke_on_user_enter.append(func)
+            else:
+                self._invoke_on_user_enter_by_id[user_id].append(func)
+            return func
+        return f if func is None else f(func)
 
-    def on_user_leave(self, func: Callable[[int, str], Any]) -> Callable[[int, str], Any]:
+    def on_user_leave(self, func: Optional[Callable[[int, str], Any]] = None, *,
+                      user_id: Optional[int] = None) -> Any:
         """
         Adds a callback for a user leaving the tower.  The callback passes both a unique numerical
-        ID and a non-unique user name.
+        ID and a non-unique user name.  Use `on_user_leave(user_id=...)` to only run the callback
+        for one user.
         """
-        self._invoke_on_user_leave.append(func)
-        return func
+        def f(func: Callable[[int, str], Any]) -> Callable[[int, str], Any]:
+            if user_id is None:
+                self._invoke_on_user_leave.append(func)
+            else:
+                self._invoke_on_user_leave_by_id[user_id].append(func)
+            return func
+        return f if func is None else f(func)
 
     def on_assign(self, func: Callable[[int, str, Bell], Any]) -> Callable[[int, str, Bell], Any]:
         """
@@ -213,87 +383,188 @@ class RingingRoomTower:
         self._invoke_on_chat.append(func)
         return func
 
-    # ===== ACTIONS =====
+    def on_setting_change(self, func: Callable[[str, Any], Any]) -> Callable[[str, Any], Any]:
+        """
+        Adds a callback for one of Wheatley's settings being changed.  The callback passes the name
+        and new value of the setting, and is called once for every setting which was changed.
+        """
+        self._invoke_on_setting_change.append(func)
+        return func
 
-    def ring_bell(self, bell: Bell, expected_stroke: Optional[Stroke] = None) -> bool:
+    def on_row_gen_change(self,
+                          func: Callable[[RowGenerator], Any]) -> Callable[[RowGenerator], Any]:
         """
-        Send a request to the the server if the bell can be rung on the given stroke.  Returns
-        `true` if the bell was rung successfully.
+        Adds a callback for the row generator (method or composition) being changed.  The callback
+        passes a `RowGenerator`, which has already been compiled.
         """
-        try:
-            stroke = self.get_stroke(bell)
-            if expected_stroke is not None and stroke != expected_stroke:
-                self.logger.error(f"Bell {bell} on opposite stroke")
-                return False
-            bell_num: int = bell.number
-            is_handstroke: bool = stroke.is_hand()
-            self._emit("c_bell_rung", {"bell": bell_num, "stroke": is_handstroke, "tower_id": self.tower_id})
-            return True
-        except Exception as e:
-            self.logger.error(e)
-            return False
+        self._invoke_on_row_gen_change.append(func)
+        return func
 
-    def set_at_hand(self) -> None:
-        """ Sets all the bells at handstroke. """
-        self.logger.info("(EMIT): Setting bells at handstroke")
-        self._emit("c_set_bells", {"tower_id": self.tower_id})
-    
-    def set_size(self, number: int) -> None:
-        """ Set the number of bells in the tower. """
-        self.logger.info(f"(EMIT): Setting size to {number}")
-        self._emit("c_size_change", {"new_size": number, "tower_id": self.tower_id})
+    def on_stop_touch(self, func: Callable[[], Any]) -> Callable[[], Any]:
+        """ Adds a callback for the touch being stopped from Ringing Room. """
+        self._invoke_on_stop_touch.append(func)
+        return func
 
-    def set_bell_type(self, new_type: BellType):
-        """ Set the bell type (tower or hand) of the current tower. """
-        self.logger.info(f"(EMIT): Setting bell type to {new_type}")
-        self._emit("c_audio_change", {
-            "new_audio": new_type.ringingroom_name(),
-            "tower_id": self.tower_id
-        })
+    def on_event(self, event_type: type = Event) -> Callable[[Callable[[Event, float], Any]],
+                                                             Callable[[Event, float], Any]]:
+        """
+        Adds a given function as a subscription to a type of event from `belltower.events` (or to
+        every event, if no type is given).  The function is passed the event object and the time
+        (from `time.perf_counter`) when its signal was received.
+        """
+        def f(func: Callable[[Event, float], Any]) -> Callable[[Event, float], Any]:
+            self._invoke_on_event[event_type].append(func)
+            return func
+        return f
 
-    def assign(self, user_id: Optional[int], bell: Bell) -> None:
-        """ Assign a user to a given bell. """
+    # ===== HELPER FUNCTIONS =====
+
+    # The predicates of the `wait_for_*` methods, which are shared by the sync and async towers
+
+    def _loaded_predicate(self) -> Callable[[], bool]:
+        """ Returns a predicate which is True once the tower's bell state has been received. """
+        return lambda: self._state.number_of_bells > 0
+
+    def _size_predicate(self, number_of_bells: int) -> Callable[[], bool]:
+        """ Returns a predicate which is True when the tower has a given number of bells. """
+        return lambda: self._state.number_of_bells == number_of_bells
+
+    def _user_predicate(self, user_name: str) -> Callable[[], bool]:
+        """ Returns a predicate which is True when a user with a given name is in the tower. """
+        return lambda: user_name in self._state.users.values()
+
+    def _call_predicate(self, call: str) -> Callable[[], bool]:
+        """ Returns a predicate which becomes True once a given call is next made. """
+        count = self._call_counts[call]
+        return lambda: self._call_counts[call] > count
+
+    def _set_at_hand_predicate(self) -> Callable[[], bool]:
+        """ Returns a predicate which becomes True once the bells are next set at handstroke. """
+        count = self._set_at_hand_count
+        return lambda: self._set_at_hand_count > count
+
+    def _notify_state_changed(self) -> None:
+        """
+        Called after every signal has been handled, so that subclasses can wake up anything waiting
+        for the tower's state to change.
+        """
+
+    def _invoke_callbacks(self, event_type: str, callbacks: List[Callable[..., Any]],
+                          *args: Any) -> None:
+        """
+        Run every callback in a list of user callbacks with the given arguments.  `event_type`
+        names the kind of event, so that subclasses can decide how to run the callbacks.
+        """
+        if self._callbacks_held_back(event_type):
+            return
+        for c in callbacks:
+            c(*args)
+
+    def _callbacks_held_back(self, event_type: str) -> bool:
+        """
+        Returns True if callbacks of a given type shouldn't be run because the tower state is being
+        re-synchronised (they are generated by `_finish_resync` instead).
+        """
+        return self._state_before_resync is not None and event_type in _RESYNCED_EVENT_TYPES
+
+    def _invoke_user_callbacks(self, event_type: str, callbacks: List[Callable[[int, str], Any]],
+                               callbacks_by_id: Dict[int, List[Callable[[int, str], Any]]],
+                               user_id: int, user_name: str) -> None:
+        """ Runs the callbacks for every user, then those for the given user, for a user event. """
+        if user_id in callbacks_by_id:
+            callbacks = callbacks + callbacks_by_id[user_id]
+        self._invoke_callbacks(event_type, callbacks, user_id, user_name)
+
+    def _rebuild_bell_ring_dispatch(self) -> None:
+        """ Rebuilds the table of bell ring callbacks for each stroke and bell. """
+        self._bell_ring_dispatch = [
+            [
+                [func for (func, bell_mask, stroke) in self._bell_ring_subscriptions
+                 if bell_mask >> index & 1 and stroke in (None, table_stroke)]
+                for index in range(MAX_BELL)
+            ]
+            for table_stroke in (HANDSTROKE, BACKSTROKE)
+        ]
+
+    def _bell_rung_data(self, bell: Bell, expected_stroke: Optional[Stroke]) -> Optional[JSON]:
+        """
+        Generates the payload of a 'c_bell_rung' signal, or returns None (and logs an error) if the
+        bell isn't on the expected stroke.
+        """
+        stroke = self.get_stroke(bell)
+        if expected_stroke is not None and stroke != expected_stroke:
+            self.logger.error("Bell %s on opposite stroke", bell)
+            return None
+        bell_num: int = bell.number
+        is_handstroke: bool = stroke.is_hand()
+        return {"bell": bell_num, "stroke": is_handstroke, "tower_id": self.tower_id}
+
+    def _assign_user_data(self, user_id: Optional[int], bell: Bell) -> JSON:
+        """ Checks an assignment and generates the payload of the 'c_assign_user' signal. """
         if bell.number > self.number_of_bells:
             raise ValueError(f"Bell {bell.number} exceeds tower size of {self.number_of_bells}")
         if user_id is None:
-            self.logger.info(f"(EMIT): Unassigning bell {bell.number}")
+            self.logger.info("(EMIT): Unassigning bell %s", bell.number)
         else:
             user_name = self.user_name_from_id(user_id)
             if user_name is None:
                 raise ValueError(f"Assigning non-existent user #{user_id} to bell {bell.number}")
-            self.logger.info(f"(EMIT): Assigning user #{user_id}('{user_name}') to {bell.number}")
-        self._emit("c_assign_user", {
+            self.logger.info("(EMIT): Assigning user #%s('%s') to %s", user_id, user_name,
+                             bell.number)
+        return {
             "bell": bell.number,
             "user": user_id or '',
             "tower_id": self.tower_id
-        })
-
-    def unassign(self, bell: Bell) -> None:
-        """ Clear the assignment for a given bell. """
-        self.assign(None, bell)
-
-    def unassign_all(self) -> None:
-        """ Unassign all the bells. """
-        for b in range(self.number_of_bells):
-            self.assign(None, Bell.from_index(b))
-
-    def chat(self, user: str, message: str, email: str = "<belltower.py>") -> None:
-        """ Sends a message on chat, using given user name (which doesn't have to valid). """
-        self.logger.info(f"(EMIT): Making chat msg as '{user}'/{email}: {message}")
-        self._emit("c_msg_sent", {
+        }
+
+    def _create_chat_queue(self) -> ChatQueue:
+        """ Creates the chat queue, using the rate limits of this tower and its server. """
+        self._chat_queue = ChatQueue(
+            TokenBucket(self.CHAT_RATE, self.CHAT_BURST),
+            server_bucket(self._url, self.SERVER_CHAT_RATE, self.SERVER_CHAT_BURST),
+            self.CHAT_COALESCE_WINDOW,
+            self.MAX_CHAT_QUEUE
+        )
+        return self._chat_queue
+
+    def _send_chat(self, user: str, message: str, email: str) -> Any:
+        """ Sends a chat message, returning whatever `_emit` returns. """
+        self.logger.info("(EMIT): Making chat msg as '%s'/%s: %s", user, email, message)
+        return self._emit("c_msg_sent", self._chat_data(user, message, email))
+
+    def _stop_chat_sender(self) -> None:
+        """ Stops sending queued chat messages, cancelling any which haven't been sent. """
+        if self._chat_sender is not None:
+            self._chat_sender.stop()
+            self._chat_sender = None
+
+    def _chat_data(self, user: str, message: str, email: str) -> JSON:
+        """ Generates the payload of a 'c_msg_sent' signal. """
+        return {
             "user": user,
             "msg": message,
             "email": email,
             "time": datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000Z"),
             "tower_id": self.tower_id
-        })
+        }
 
-    def check_version(self) -> bool:
-        # Get version from RR's API
-        url = urllib.parse.urljoin(self._url, "api/version")
-        response = requests.get(url)
-        versions = json.loads(response.text)
-        semver = versions["socketio-version"].split(".")
+    def _version_api_url(self) -> str:
+        """ Returns the URL of RR's version API. """
+        return urllib.parse.urljoin(self._url, "api/version")
+
+    def _check_version_response(self, response_text: str) -> str:
+        """
+        Checks the response of RR's version API against the version that this library expects,
+        raising `InvalidRRVersionError` if the two are incompatible.  Returns RR's version string.
+        """
+        versions = json.loads(response_text)
+        rr_version: str = versions["socketio-version"]
+        self._check_rr_version(rr_version)
+        return rr_version
+
+    def _check_rr_version(self, rr_version: str) -> None:
+        """ Raises `InvalidRRVersionError` if RR's socket-io version string is incompatible. """
+        semver = rr_version.split(".")
         # Unpack the major/minor versions from the semver string
         rr_major = int(semver[0])
         rr_minor = int(semver[1]) if len(semver) > 1 else 0
@@ -304,169 +575,192 @@ class RingingRoomTower:
                 f"{self.EXPECTED_RR_MAJOR}.{self.EXPECTED_RR_MINOR}"
             )
 
-    # ===== CALLS =====
-
-    def make_call(self, call: str) -> None:
+    def _load_cached_metadata(self) -> bool:
         """
-        Broadcast a given call to all the users in the Tower.  This does not have to have a
-        corresponding sound (like 'Bob', 'Single', 'Look To', etc.), any string can be passed and
-        will appear in the centre of everyone's screens.
+        Loads this tower's metadata from the metadata cache, returning False if it isn't cached
+        (or if the version check is needed but the cached entry has no version).
         """
-        self.logger.info(f"(EMIT): Calling '{call}'")
-        self._emit("c_call", {"call": call, "tower_id": self.tower_id})
-
-    def call_bob(self) -> None:
-        """ Calls a 'Bob' in the current tower.  Identical to `Tower.make_call(call.BOB)`. """
-        self.make_call(call.BOB)
-
-    def call_single(self) -> None:
-        """ Calls a 'Single' in the current tower.  Identical to `Tower.make_call(call.SINGLE)`. """
-        self.make_call(call.SINGLE)
-
-    def call_look_to(self) -> None:
-        """ Calls 'Look To' in the current tower.  Identical to `Tower.make_call(call.LOOK_TO)`. """
-        self.make_call(call.LOOK_TO)
-
-    def call_go(self) -> None:
-        """ Calls 'Go' in the current tower.  Identical to `Tower.make_call(call.GO)`. """
-        self.make_call(call.GO)
-
-    def call_thats_all(self) -> None:
-        """ Calls 'That's All' in the current tower.  Identical to `Tower.make_call(call.THATS_ALL)`. """
-        self.make_call(call.THATS_ALL)
-
-    def call_stand(self) -> None:
-        """ Calls 'Stand' in the current tower.  Identical to `Tower.make_call(call.STAND)`. """
-        self.make_call(call.STAND)
-
-    # ===== HELPER FUNCTIONS =====
-
-    def _emit(self, event: str, data: Any) -> None:
-        """ Emit a socket-io signal. """
-        if self._socket_io_client is None or not self._socket_io_client.connected:
-            raise SocketIOClientError("Not Connected")
-        self._socket_io_client.emit(event, data)
+        self._metadata_is_cached = False
+        if self._metadata_cache is None:
+            return False
+        metadata = self._metadata_cache.get(self._http_server_url, self.tower_id)
+        if metadata is None:
+            return False
+        if self._run_version_check:
+            if metadata.rr_version is None:
+                return False
+            self._check_rr_version(metadata.rr_version)
 
-    @staticmethod
-    def _bells_set_at_hand(number: int) -> List[Stroke]:
-        """ Returns the representation of `number` bells, all set at handstroke. """
-        return [HANDSTROKE for _ in range(number)]
+        self._url, self._tower_name, self._bell_type = (
+            metadata.server_ip, metadata.tower_name, metadata.bell_type
+        )
+        self._metadata_is_cached = True
+        self.logger.debug("Using cached metadata %r", metadata)
+        return True
+
+    def _store_metadata(self, rr_version: Optional[str]) -> None:
+        """ Adds this tower's freshly fetched metadata to the metadata cache (if there is one). """
+        self._metadata_is_cached = False
+        if self._metadata_cache is not None:
+            self._metadata_cache.put(self._http_server_url, self.tower_id, TowerMetadata(
+                self._url, self._tower_name, self._bell_type, rr_version
+            ))
+
+    def _invalidate_cached_metadata(self) -> bool:
+        """
+        Called when the socket-io server can't be connected to.  If the server URL came from the
+        cache, then the cache entry is removed and True is returned (so the caller should re-fetch
+        the metadata and retry).
+        """
+        if not self._metadata_is_cached or self._metadata_cache is None:
+            return False
+        self.logger.warning(
+            "Failed to connect to cached server '%s', re-fetching the tower page", self._url
+        )
+        self._metadata_cache.invalidate(self._http_server_url, self.tower_id)
+        return True
 
-    def _update_bell_state(self, bell_state: List[Stroke]) -> None:
-        self._bell_state = bell_state
-        self.logger.debug(f"RECEIVED: Bells '{''.join([s.char() for s in bell_state])}'")
+    def _set_bells_at_hand(self, number: int) -> None:
+        """
+        Sets the bell state to `number` bells, all set at handstroke, and removes the assignments of
+        any bells which no longer exist.
+        """
+        self._handstroke_mask = (1 << number) - 1
+        self._state = self._state.with_size(number)
+
+    def _update_bell_state(self, bell_state: List[bool]) -> None:
+        """ Overwrites the entire bell state with a list of `is_handstroke` values. """
+        mask = 0
+        for i, is_handstroke in enumerate(bell_state):
+            if is_handstroke:
+                mask |= 1 << i
+        self._handstroke_mask = mask
+        # Only the bell state has changed, unless the number of bells is different
+        if len(bell_state) != self._state.number_of_bells:
+            self._state = self._state.with_size(len(bell_state))
+        self._log_bell_state()
+
+    def _log_bell_state(self) -> None:
+        """ Logs the bell state, but only builds the string if debug logging is enabled. """
+        if self.logger.isEnabledFor(logging.DEBUG):
+            strokes = "".join("H" if self._handstroke_mask >> i & 1 else "B"
+                              for i in range(self._state.number_of_bells))
+            self.logger.debug("RECEIVED: Bells '%s'", strokes)
 
     # === INTERNAL CALLBACKS ===
 
-    def _on_bell_ring(self, data: JSON) -> None:
+    def _on_bell_ring(self, event: events.BellRung) -> None:
         """ Callback called when the client receives a signal that a bell has been rung. """
-        # Unpack the data and assign it expected types
-        global_bell_state: List[bool] = data['global_bell_state']
-        who_rang_raw: int = data["who_rang"]
-        who_rang = Bell.from_number(who_rang_raw)
-        # Overwrite the bellstate with the new information
-        self._update_bell_state([Stroke(b) for b in global_bell_state])
+        who_rang = event.bell
+        global_bell_state = event.global_bell_state
+        index = who_rang.index
+        # The bell rang at the opposite stroke to its new one
+        self.metrics.record_ring_received(
+            index, not global_bell_state[index] if index < len(global_bell_state) else None
+        )
+        number_of_bells = self._state.number_of_bells
+        if len(global_bell_state) != number_of_bells:
+            # If the size doesn't match what we expect, then fall back on overwriting the bell
+            # state with the new information
+            self._update_bell_state(global_bell_state)
+            number_of_bells = self._state.number_of_bells
+        elif index < number_of_bells:
+            # Otherwise, only the bell that rang has changed so we only need to update its bit
+            if global_bell_state[index]:
+                self._handstroke_mask |= 1 << index
+            else:
+                self._handstroke_mask &= ~(1 << index)
         # Only run the callbacks if the bells exist
-        new_stroke = self.get_stroke(who_rang)
-        if new_stroke is None:
-            self.logger.warning(
-                f"Bell {who_rang} rang, but the tower only has {self.number_of_bells} bells."
-            )
+        if index >= number_of_bells:
+            self.logger.warning("Bell %s rang, but the tower only has %s bells.", who_rang,
+                                number_of_bells)
         else:
-            for bell_ring_callback in self._invoke_on_bell_ring:
-                # Call the callback with the stroke of the bell **before** it rang, so that it is
-                # less confusing for the consumer of the library
-                bell_ring_callback(who_rang, new_stroke.opposite())
-
-    def _on_call(self, data: Dict[str, str]) -> None:
+            # Call the callbacks with the stroke of the bell **before** it rang (i.e. the opposite
+            # of its new stroke), so that it is less confusing for the consumer of the library
+            handstroke_mask = self._handstroke_mask
+            is_backstroke = handstroke_mask >> index & 1
+            if self.tracer.enabled_for(tracing.BELL_RUNG):
+                self.tracer.trace(tracing.BELL_RUNG, who_rang,
+                                  BACKSTROKE if is_backstroke else HANDSTROKE,
+                                  tracing.BellStates(handstroke_mask, number_of_bells))
+            callbacks = self._bell_ring_dispatch[is_backstroke][index]
+            if callbacks:
+                stroke = BACKSTROKE if is_backstroke else HANDSTROKE
+                self._invoke_callbacks(BELL_RING, callbacks, who_rang, stroke)
+
+    def _on_call(self, event: events.CallMade) -> None:
         """ Callback called when a call is made. """
-        call = data["call"]
-        self.logger.info(f"RECEIVED: Call '{call}'")
+        call = event.call
+        self.logger.info("RECEIVED: Call '%s'", call)
+        self._call_counts[call] += 1
 
         callbacks = self._invoke_on_call.get(call)
         if callbacks is None:
-            self.logger.warning(f"No callback found for '{call}'")
+            self.logger.debug("No callback found for '%s'", call)
         else:
-            for c in callbacks:
-                c()
+            self._invoke_callbacks("call", callbacks)
 
-    def _on_user_enter(self, data: JSON) -> None:
+    def _on_user_enter(self, event: events.UserEntered) -> None:
         """ Called when the server receives a new user. """
-        # Unpack the data and assign it expected types
-        user_id: int = data['user_id']
-        username: str = data['username']
         # Add the new user to the user list, so we can match up their ID with their username
-        self._user_name_map[user_id] = username
+        self._state = self._state.with_user(event.user_id, event.user_name)
         # Run callbacks
-        for c in self._invoke_on_user_enter:
-            c(user_id, username)
+        self._invoke_user_callbacks("user_enter", self._invoke_on_user_enter,
+                                    self._invoke_on_user_enter_by_id, event.user_id,
+                                    event.user_name)
 
-    def _on_user_leave(self, data: JSON) -> None:
+    def _on_user_leave(self, event: events.UserLeft) -> None:
         """ Called when the server broadcasts that a user has left. """
-        # Unpack the data and assign it the expected types
-        user_id_that_left: int = data["user_id"]
-        user_name_that_left: str = data["username"]
-
-        # Remove the user ID that left from our user list
-        if user_id_that_left not in self._user_name_map:
-            self.logger.warning(
-                f"User #{user_id_that_left}:'{user_name_that_left}' left, but wasn't in the user list."
-            )
-        elif self._user_name_map[user_id_that_left] != user_name_that_left:
-            self.logger.warning(f"User #{user_id_that_left}:'{user_name_that_left}' left, but that ID was \
-logged in as '{self._user_name_map[user_id_that_left]}'.")
-            del self._user_name_map[user_id_that_left]
-
-        bells_unassigned: List[Bell] = []
-
-        # Unassign all instances of that user
-        for bell, user in self._assigned_users.items():
-            if user == user_id_that_left:
-                bells_unassigned.append(bell)
-        for bell in bells_unassigned:
-            del self._assigned_users[bell]
-
-        self.logger.info(
-            f"RECEIVED: User #{user_id_that_left}:'{user_name_that_left}' left from bells {bells_unassigned}."
-        )
+        user_id_that_left = event.user_id
+        user_name_that_left = event.user_name
+
+        state = self._state
+        if user_id_that_left not in state.users:
+            self.logger.warning("User #%s:'%s' left, but wasn't in the user list.",
+                                user_id_that_left, user_name_that_left)
+        elif state.users[user_id_that_left] != user_name_that_left:
+            self.logger.warning("User #%s:'%s' left, but that ID was logged in as '%s'.",
+                                user_id_that_left, user_name_that_left,
+                                state.users[user_id_that_left])
+
+        # Remove the user ID that left from our user list, and unassign all of their bells
+        bells_unassigned = list(state.bells_of(user_id_that_left))
+        self._state = state.without_user(user_id_that_left)
+
+        self.logger.info("RECEIVED: User #%s:'%s' left from bells %s.", user_id_that_left,
+                         user_name_that_left, bells_unassigned)
         # Run callbacks
-        for c in self._invoke_on_user_leave:
-            c(user_id_that_left, user_name_that_left)
+        self._invoke_user_callbacks("user_leave", self._invoke_on_user_leave,
+                                    self._invoke_on_user_leave_by_id, user_id_that_left,
+                                    user_name_that_left)
 
-    def _on_user_list(self, user_list: JSON) -> None:
+    def _on_user_list(self, event: events.UserList) -> None:
         """ Called when the server broadcasts a user list when Wheatley joins a tower. """
-        for user in user_list['user_list']:
+        for user in event.users:
             self._on_user_enter(user)
 
-    def _on_assign_user(self, data: JSON) -> None:
+    def _on_assign_user(self, event: events.AssignUser) -> None:
         """ Callback called when a bell assignment is changed. """
-        raw_bell: int = data["bell"]
-        bell: Bell = Bell.from_number(raw_bell)
-        user: Optional[int] = data["user"] or None
-
-        assert isinstance(user, int) or user is None, \
-               f"User ID {user} is not an integer (it has type {type(user)})."
+        bell = event.bell
+        user = event.user_id
 
+        self._state = self._state.with_assignment(bell, user)
         if user is None:
-            self.logger.info(f"RECEIVED: Unassigned bell '{bell}'")
-            if bell in self._assigned_users:
-                del self._assigned_users[bell]
+            self.logger.info("RECEIVED: Unassigned bell '%s'", bell)
             # Invoke the '**un**assign' callback if a bell is being unassigned
-            for c in self._invoke_on_unassign:
-                c(bell)
+            self._invoke_callbacks("unassign", self._invoke_on_unassign, bell)
         else:
-            self._assigned_users[bell] = user
-            self.logger.info(f"RECEIVED: Assigned bell '{bell}' to '{self.user_name_from_id(user)}'")
+            self.logger.info("RECEIVED: Assigned bell '%s' to '%s'", bell,
+                             self.user_name_from_id(user))
             # Invoke the 'assign' callback if a bell is being assigned
-            for c in self._invoke_on_assign:
-                c(user, self.user_name_from_id(user), bell)
+            self._invoke_callbacks("assign", self._invoke_on_assign, user,
+                                   self.user_name_from_id(user), bell)
 
-    def _on_global_bell_state(self, data: JSON) -> None:
+    def _on_global_bell_state(self, event: events.GlobalState) -> None:
         """
         Callback called when receiving an update to the global tower state.
         """
-        global_bell_state: List[bool] = data["global_bell_state"]
-        self._update_bell_state([Stroke(x) for x in global_bell_state])
+        self._update_bell_state(event.global_bell_state)
 
         # These are sent for one of two reasons:
         # 1. A 's_global_state' is sent by the server to all new users so that they get a picture of
@@ -475,83 +769,620 @@ logged in as '{self._user_name_map[user_id_that_left]}'.")
         # The only way to tell these two reasons apart is that the first 's_global_state' is in case
         # (1), whereas all subsequent ones can be assumed to result from bells setting at handstroke
         if not self._waiting_for_first_global_state:
-            for c in self._invoke_on_set_at_hand:
-                c()
+            self._set_at_hand_count += 1
+            self._invoke_callbacks("set_at_hand", self._invoke_on_set_at_hand)
         self._waiting_for_first_global_state = False
 
-    def _on_size_change(self, data: JSON) -> None:
+        if self._state_before_resync is not None:
+            self._resync_state_time = time.monotonic()
+
+    def _on_size_change(self, event: events.SizeChange) -> None:
         """ Callback called when the number of bells in the room changes. """
-        new_size: int = data["size"]
+        new_size = event.size
         if new_size != self.number_of_bells:
-            # Remove the user who's bells have been removed (so that returning to a stage doesn't make
-            # Wheatley think the bells are still assigned)
-            self._assigned_users = {
-                bell: user
-                for (bell, user) in self._assigned_users.items()
-                if bell.number <= new_size
-            }
-            # Set the bells at handstroke
-            self._bell_state = self._bells_set_at_hand(new_size)
+            # Set the bells at handstroke, and remove the user who's bells have been removed (so
+            # that returning to a stage doesn't make Wheatley think the bells are still assigned)
+            self._set_bells_at_hand(new_size)
             # Handle all the callbacks
-            self.logger.info(f"RECEIVED: New tower size '{new_size}'")
-            for invoke_callback in self._invoke_on_size_change:
-                invoke_callback(new_size)
+            self.logger.info("RECEIVED: New tower size '%s'", new_size)
+            self._invoke_callbacks("size_change", self._invoke_on_size_change, new_size)
 
-    def _on_audio_change(self, data: JSON) -> None:
+    def _on_audio_change(self, event: events.AudioChange) -> None:
         """ Callback called when the bell/audio type switches between tower/hand. """
-        try:
-            new_bell_type = BellType.from_ringingroom_name(data["new_audio"])
-        except ValueError as e:
-            self.logger.warning(e)
         # It seems like Ringing Room sometimes sends the s_new_audio signal multiple times, and so
         # we only generate callbacks when the bell type is actually changed
-        if new_bell_type != self._bell_type:
-            self._bell_type = new_bell_type
+        if event.bell_type != self._bell_type:
+            self._bell_type = event.bell_type
             # Invoke the callbacks
-            for c in self._invoke_on_type_change:
-                c(self._bell_type)
+            self._invoke_callbacks("bell_type_change", self._invoke_on_type_change, self._bell_type)
 
-    def _on_chat(self, data: JSON) -> None:
+    def _on_chat(self, event: events.ChatMessage) -> None:
         """ Callback called when a chat message is received. """
-        user_name = data["user"]
-        message = data["msg"]
-        for c in self._invoke_on_chat:
-            c(user_name, message)
+        self._invoke_callbacks("chat", self._invoke_on_chat, event.user_name, event.message)
+
+    def _on_setting_change(self, event: events.WheatleySetting) -> None:
+        """ Callback called when some of Wheatley's settings are changed. """
+        settings = dict(self._wheatley_settings)
+        settings.update(event.settings)
+        self._wheatley_settings = MappingProxyType(settings)
+        for name, value in event.settings.items():
+            self.logger.info("RECEIVED: Wheatley setting '%s' changed to %r", name, value)
+            self._invoke_callbacks("setting_change", self._invoke_on_setting_change, name, value)
+
+    def _on_row_gen_change(self, event: events.WheatleyRowGen) -> None:
+        """
+        Callback called when the row generator is changed.  The row generator is compiled here,
+        long before 'Look To' is called, so that starting the touch doesn't have to wait for it.
+        """
+        row_gen = compile_row_gen(event.spec)
+        self.logger.info("RECEIVED: Row generator changed to %s", row_gen)
+        self._row_gen = row_gen
+        self._invoke_callbacks("row_gen_change", self._invoke_on_row_gen_change, row_gen)
+
+    def _on_stop_touch(self, event: events.WheatleyStopTouch) -> None:
+        """ Callback called when the touch is stopped. """
+        self.logger.info("RECEIVED: Stop touch")
+        self._invoke_callbacks("stop_touch", self._invoke_on_stop_touch)
+
+    # === INITIALISATION CODE ===
+
+    def _handle_signal(self, signal: str, data: JSON, timestamp: Optional[float] = None) -> None:
+        """
+        Passes a signal received from Ringing Room to the listeners, then decodes it and passes the
+        event to its internal callback and the event subscriptions.  `timestamp` is the
+        `time.perf_counter()` time at which the signal arrived, and defaults to now (it is given
+        explicitly when replaying recorded signals).
+        """
+        if timestamp is None:
+            timestamp = perf_counter()
+        self.metrics.record_signal(signal)
+        if self.tracer.enabled_for(tracing.SIGNAL):
+            self.tracer.trace(tracing.SIGNAL, signal, data)
+        for listener in self._signal_listeners:
+            try:
+                listener(signal, data, timestamp)
+            except Exception:
+                # A broken listener (e.g. a recorder) mustn't stop the signal from being handled
+                self.logger.exception("Signal listener %r failed on '%s'", listener, signal)
+        try:
+            event = events.decode_event(signal, data)
+        except EventDecodeError as e:
+            self.logger.warning(e)
+            return
+        if self._state_before_resync is None:
+            self._signal_handlers[signal](event)
+        else:
+            with self._resync_lock:
+                self._signal_handlers[signal](event)
+        self._invoke_event_subscriptions(event, timestamp)
+        self._notify_state_changed()
+
+    def _invoke_event_subscriptions(self, event: Event, timestamp: float) -> None:
+        """ Runs the subscriptions to an event's type, and then those to every event. """
+        subscriptions = self._invoke_on_event
+        if not subscriptions:
+            return
+        if type(event) in subscriptions:
+            self._invoke_callbacks("event", subscriptions[type(event)], event, timestamp)
+        if Event in subscriptions:
+            self._invoke_callbacks("event", subscriptions[Event], event, timestamp)
+
+    def _queue_depth_gauges(self) -> Dict[str, Callable[[], int]]:
+        """ Returns functions which measure the depths of this tower's queues, for `metrics`. """
+        return {}
+
+    def _event_handlers(self) -> Dict[str, Callable[[Any], None]]:
+        """
+        Returns a map from socket-io signal names to the internal callbacks that handle them, which
+        are passed the signal decoded by `belltower.events`.
+        """
+        return {
+            "s_call": self._on_call,
+            # Bell state callbacks
+            "s_bell_rung": self._on_bell_ring,
+            "s_global_state": self._on_global_bell_state,
+            "s_size_change": self._on_size_change,
+            "s_audio_change": self._on_audio_change,
+            # User change callbacks
+            "s_user_entered": self._on_user_enter,
+            "s_user_left": self._on_user_leave,
+            "s_set_userlist": self._on_user_list,
+            "s_assign_user": self._on_assign_user,
+            "s_msg_sent": self._on_chat,
+            # Wheatley specific callbacks
+            "s_wheatley_setting": self._on_setting_change,
+            "s_wheatley_row_gen": self._on_row_gen_change,
+            "s_wheatley_stop_touch": self._on_stop_touch,
+        }
+
+    # === RECONNECTING ===
+    # These are shared by both kinds of tower, which each open the connection and re-join the tower
+    # in their own way
+
+    def _on_disconnect(self) -> None:
+        """ Called whenever the socket-io connection closes. """
+        if self.tracer.enabled_for(tracing.DISCONNECT):
+            self.tracer.trace(tracing.DISCONNECT, self._url)
+        # The client is removed before deliberately disconnecting, so this must be unexpected
+        if self._socket_io_client is not None:
+            self.logger.warning("Lost connection to %s, reconnecting", self._url)
+            self._connection_lost = True
+
+    def _check_can_emit(self) -> None:
+        """
+        Raises `SocketIOClientError` if a signal emitted now would be rejected, because we're not
+        connected and the outage policy doesn't allow signals to be queued.
+        """
+        if not self.is_connected and not (self._connection_lost
+                                          and self._outage_policy == OUTAGE_QUEUE):
+            raise SocketIOClientError("Not Connected")
+
+    def _emit_while_disconnected(self, event: str, data: Any) -> None:
+        """ Handles a signal emitted whilst disconnected, according to the outage policy. """
+        self._check_can_emit()
+        if len(self._outage_queue) >= self.MAX_OUTAGE_QUEUE:
+            raise SocketIOClientError(
+                f"Not Connected, and {self.MAX_OUTAGE_QUEUE} signals are already waiting to be sent"
+            )
+        self._outage_queue.append((event, data))
+
+    def _start_reconnect(self) -> bool:
+        """
+        Records a new connection, returning True if it is a reconnect (in which case the tower state
+        starts being re-synchronised, and the caller must re-join the tower).
+        """
+        self.metrics.record_connect()
+        if self.tracer.enabled_for(tracing.CONNECT):
+            self.tracer.trace(tracing.CONNECT, self._url)
+        if not self._connection_lost:
+            return False
+        self._connection_lost = False
+        self.logger.info("Reconnected to %s, re-synchronising the tower state", self._url)
+        # Keep the state from before the first reconnect if we reconnect again whilst re-syncing
+        if self._state_before_resync is None:
+            self._state_before_resync = self._state
+        self._state = self._state.without_users()
+        self._waiting_for_first_global_state = True
+        return True
+
+    def _try_finish_resync(self) -> Optional[float]:
+        """
+        Finishes re-synchronising the tower state if all of the new state has arrived.  Returns the
+        number of seconds to wait before trying again, or None if the re-sync is no longer running.
+        """
+        if self._state_before_resync is None:
+            return None
+        if self._waiting_for_first_global_state:
+            return self.RESYNC_SETTLE_TIME
+        remaining = self._resync_state_time + self.RESYNC_SETTLE_TIME - time.monotonic()
+        if remaining > 0:
+            return remaining
+        self._finish_resync()
+        return None
+
+    def _finish_resync(self) -> None:
+        """
+        Generates the callbacks for the differences between the tower state from before the
+        connection was lost and the state received after re-joining.
+        """
+        old_state = self._state_before_resync
+        if old_state is None:
+            return
+        new_state = self._state
+        self._state_before_resync = None
+        if self.tracer.enabled_for(tracing.RESYNCED):
+            self.tracer.trace(tracing.RESYNCED)
+
+        for user_id, user_name in old_state.users.items():
+            if new_state.users.get(user_id) != user_name:
+                self._invoke_user_callbacks("user_leave", self._invoke_on_user_leave,
+                                            self._invoke_on_user_leave_by_id, user_id, user_name)
+        if new_state.number_of_bells != old_state.number_of_bells:
+            self._invoke_callbacks("size_change", self._invoke_on_size_change,
+                                   new_state.number_of_bells)
+        for bell in old_state.assignments:
+            if new_state.has_bell(bell) and bell not in new_state.assignments:
+                self._invoke_callbacks("unassign", self._invoke_on_unassign, bell)
+        for user_id, user_name in new_state.users.items():
+            if old_state.users.get(user_id) != user_name:
+                self._invoke_user_callbacks("user_enter", self._invoke_on_user_enter,
+                                            self._invoke_on_user_enter_by_id, user_id, user_name)
+        for bell, user_id in new_state.assignments.items():
+            if old_state.assignments.get(bell) != user_id:
+                self._invoke_callbacks("assign", self._invoke_on_assign, user_id,
+                                       new_state.users.get(user_id), bell)
+        self._notify_state_changed()
+
+
+class RingingRoomTower(BaseRingingRoomTower):
+    """ A Tower for Ringing Room. """
+
+    def __init__(self, tower_id: int, url: str = "ringingroom.com",
+                 run_version_check: bool = True, emit_queue_size: int = 0,
+                 dispatcher: Optional[CallbackDispatcher] = None,
+                 metadata_cache: Optional[MetadataCache] = None,
+                 outage_policy: str = OUTAGE_REJECT, queue_chat: bool = False) -> None:
+        """
+        Initialise a tower with a given room id and url.  If `emit_queue_size` is non-zero, then
+        outgoing signals are sent by a dedicated thread (with bell rings sent before any other
+        signals), and actions return as soon as their signal has been queued.  At most
+        `emit_queue_size` signals can be waiting to be sent - any more will raise
+        `EmitQueueFullError`.  If a `dispatcher` is given, then the user callbacks are run on its
+        threads instead of on the thread receiving signals from Ringing Room.  If a
+        `metadata_cache` is given, then the tower page and RR version are only fetched if they
+        aren't in the cache (or if the cached socket-io server can't be connected to).
+
+        If the connection drops, the tower reconnects automatically (with exponential backoff),
+        re-joins the tower and only generates callbacks for the parts of the tower state which
+        changed whilst it was disconnected.  Signals emitted whilst the connection is down raise
+        `SocketIOClientError` if `outage_policy` is `OUTAGE_REJECT`, or are sent once the tower is
+        re-joined if it is `OUTAGE_QUEUE` (in which case the actions return None, and ringing bells
+        returns True).
+
+        Chat messages are sent immediately, unless `queue_chat` is set - in which case they are
+        rate limited, merged and prioritised by a `belltower.chat.ChatQueue` (see `chat`).
+        """
+        if outage_policy not in (OUTAGE_REJECT, OUTAGE_QUEUE):
+            raise ValueError(f"Unknown outage policy '{outage_policy}'")
+
+        self.tower_id = tower_id
+        self._http_server_url = url
+        self._run_version_check = run_version_check
+        self._metadata_cache = metadata_cache
+        self._socket_io_client: Optional[socketio.Client] = None
+        self._emit_queue_size = emit_queue_size
+        self._emit_queue: Optional[EmitQueue] = None
+        self._dispatcher = dispatcher
+        self._outage_policy = outage_policy
+        self._queue_chat = queue_chat
+        # Notified after every signal is handled, to wake up `wait_for`
+        self._state_changed = threading.Condition()
+
+        self._init_state_and_callbacks()
+
+        if not self._load_cached_metadata():
+            self._fetch_metadata()
+
+    @classmethod
+    def offline(cls, tower_id: int, tower_name: str = "", bell_type: BellType = TOWER_BELLS) -> Any:
+        """
+        Creates a tower which is never connected to Ringing Room.  Signals can still be passed to
+        it with `_handle_signal` (e.g. when replaying a recorded session), which will run the
+        callbacks as though they were received from Ringing Room.
+        """
+        tower = cls.__new__(cls)
+        tower.tower_id = tower_id
+        tower._url, tower._tower_name, tower._bell_type = "", tower_name, bell_type
+        tower._http_server_url = ""
+        tower._run_version_check = False
+        tower._metadata_cache = None
+        tower._metadata_is_cached = False
+        tower._socket_io_client = None
+        tower._emit_queue_size = 0
+        tower._emit_queue = None
+        tower._dispatcher = None
+        tower._outage_policy = OUTAGE_REJECT
+        tower._queue_chat = False
+        tower._state_changed = threading.Condition()
+        tower._init_state_and_callbacks()
+        return tower
+
+    @classmethod
+    def open_many(cls, tower_ids: Iterable[int], url: str = "ringingroom.com",
+                  max_workers: int = 16, connect: bool = True, **kwargs: Any) -> Dict[int, Any]:
+        """
+        Creates (and, if `connect` is set, connects to) many towers concurrently, using at most
+        `max_workers` threads.  Returns a map from tower ID to either the tower or the exception
+        raised whilst opening it (e.g. `TowerNotFoundError`, `InvalidURLError` or
+        `InvalidRRVersionError`), so that one failure doesn't stop the other towers from opening.
+        Any other keyword arguments are passed to `__init__`.  Connected towers must be closed by
+        the caller, with `tower.__exit__(None, None, None)`.
+        """
+        def open_tower(tower_id: int) -> Any:
+            tower = cls(tower_id, url, **kwargs)
+            if connect:
+                tower.__enter__()
+            return tower
+
+        tower_ids = list(tower_ids)
+        results: Dict[int, Any] = {}
+        with ThreadPoolExecutor(max_workers=max_workers,
+                                thread_name_prefix="belltower-open") as executor:
+            futures = [executor.submit(open_tower, tower_id) for tower_id in tower_ids]
+            for tower_id, future in zip(tower_ids, futures):
+                exception = future.exception()
+                results[tower_id] = future.result() if exception is None else exception
+        return results
+
+    # ===== MISC =====
+
+    def wait_loaded(self, timeout: Optional[float] = 10.0) -> None:
+        """
+        Pause the current thread until this Tower's connection is open and stable, raising
+        `SocketIOClientError` if the bell state hasn't been received within `timeout` seconds.
+        """
+        if self._socket_io_client is None or not self._socket_io_client.connected:
+            raise SocketIOClientError("Not Connected")
+
+        if not self.wait_for(self._loaded_predicate(), timeout):
+            raise SocketIOClientError("Not received bell state from RingingRoom")
+
+    # ===== WAITING FOR EVENTS =====
+    # These block the current thread, so must not be called from callbacks that run on the thread
+    # receiving signals (i.e. when the tower has no dispatcher).  They return False on timeout.
+
+    def wait_for(self, predicate: Callable[[], bool], timeout: Optional[float] = None) -> bool:
+        """
+        Pause the current thread until `predicate()` returns True, or until `timeout` seconds have
+        passed.  The predicate is re-checked as soon as each signal from Ringing Room is handled.
+        """
+        with self._state_changed:
+            return self._state_changed.wait_for(predicate, timeout)
+
+    def wait_for_size(self, number_of_bells: int, timeout: Optional[float] = None) -> bool:
+        """ Pause the current thread until the tower has a given number of bells. """
+        return self.wait_for(self._size_predicate(number_of_bells), timeout)
+
+    def wait_for_user(self, user_name: str, timeout: Optional[float] = None) -> bool:
+        """ Pause the current thread until a user with a given name is in the tower. """
+        return self.wait_for(self._user_predicate(user_name), timeout)
+
+    def wait_for_call(self, call: str, timeout: Optional[float] = None) -> bool:
+        """ Pause the current thread until a given call is next made (e.g. `call.LOOK_TO`). """
+        return self.wait_for(self._call_predicate(call), timeout)
+
+    def wait_for_set_at_hand(self, timeout: Optional[float] = None) -> bool:
+        """ Pause the current thread until the bells are next set at handstroke. """
+        return self.wait_for(self._set_at_hand_predicate(), timeout)
+
+    # ===== ACTIONS =====
+
+    def ring_bell(self, bell: Bell, expected_stroke: Optional[Stroke] = None) -> bool:
+        """
+        Send a request to the the server if the bell can be rung on the given stroke.  Returns
+        `true` if the bell was rung successfully.
+        """
+        try:
+            data = self._bell_rung_data(bell, expected_stroke)
+            if data is None:
+                return False
+            self.metrics.record_ring_sent(bell.index, data["stroke"])
+            self._emit("c_bell_rung", data)
+            return True
+        except Exception as e:
+            self.logger.error(e)
+            return False
+
+    # The actions below return the future of their queued signal if the tower has an emit queue (see
+    # `__init__`), or None if the signal was sent immediately
+
+    def set_at_hand(self) -> Optional[Future]:
+        """ Sets all the bells at handstroke. """
+        self.logger.info("(EMIT): Setting bells at handstroke")
+        return self._emit("c_set_bells", {"tower_id": self.tower_id})
+    
+    def set_size(self, number: int) -> Optional[Future]:
+        """ Set the number of bells in the tower. """
+        self.logger.info("(EMIT): Setting size to %s", number)
+        return self._emit("c_size_change", {"new_size": number, "tower_id": self.tower_id})
+
+    def set_bell_type(self, new_type: BellType) -> Optional[Future]:
+        """ Set the bell type (tower or hand) of the current tower. """
+        self.logger.info("(EMIT): Setting bell type to %s", new_type)
+        return self._emit("c_audio_change", {
+            "new_audio": new_type.ringingroom_name(),
+            "tower_id": self.tower_id
+        })
+
+    def assign(self, user_id: Optional[int], bell: Bell) -> Optional[Future]:
+        """ Assign a user to a given bell. """
+        return self._emit("c_assign_user", self._assign_user_data(user_id, bell))
+
+    def unassign(self, bell: Bell) -> Optional[Future]:
+        """ Clear the assignment for a given bell. """
+        return self.assign(None, bell)
+
+    def unassign_all(self) -> None:
+        """ Unassign all the bells. """
+        for b in range(self.number_of_bells):
+            self.assign(None, Bell.from_index(b))
+
+    def ring_rows(self, rows: Iterable[Sequence[Bell]], peal_speed: float = 180.0,
+                  handstroke_gap: float = 1.0) -> StrikeReport:
+        """
+        Rings a sequence of rows (starting at handstroke) at a steady speed of `peal_speed` minutes
+        for a peal, with a handstroke gap of `handstroke_gap` blows.  Every blow is scheduled
+        against an absolute deadline, so the time taken to send signals doesn't cause drift.  This
+        blocks until all the rows have been rung (or `stop_ringing` is called), and returns a
+        report of how late each blow was sent.
+        """
+        self._strike_scheduler = StrikeScheduler(self, peal_speed, handstroke_gap)
+        try:
+            return self._strike_scheduler.ring_rows(rows)
+        finally:
+            self._strike_scheduler = None
+
+    def stop_ringing(self) -> None:
+        """ Stops `ring_rows` before its next blow.  Safe to call from callbacks. """
+        if self._strike_scheduler is not None:
+            self._strike_scheduler.stop()
+
+    def chat(self, user: str, message: str, email: str = "<belltower.py>",
+             priority: int = PRIORITY_NORMAL) -> Optional[Future]:
+        """
+        Sends a message on chat, using given user name (which doesn't have to valid).  If the tower
+        queues chat messages (see `__init__`), the message is rate limited and may be merged or (if
+        `priority` is `chat.PRIORITY_LOW`) dropped, as described in `belltower.chat`, and this
+        returns a future which resolves when the message has been sent (or is cancelled if the
+        message is dropped).  Otherwise, `priority` is ignored and the message is sent like any
+        other signal.
+        """
+        if not self._queue_chat:
+            return self._send_chat(user, message, email)
+        self._check_can_emit()
+        self.logger.debug("Queueing chat msg as '%s'/%s: %s", user, email, message)
+        if self._chat_sender is None:
+            self._chat_sender = ChatSender(self._create_chat_queue(), self._send_chat)
+        return self._chat_sender.put(user, message, email, priority)
+
+    def set_wheatley_setting(self, name: str, value: Any) -> Optional[Future]:
+        """ Changes one of Wheatley's settings for everyone in the tower. """
+        return self.set_wheatley_settings({name: value})
+
+    def set_wheatley_settings(self, settings: JSON) -> Optional[Future]:
+        """ Changes many of Wheatley's settings (given as a map from name to value) at once. """
+        self.logger.info("(EMIT): Changing Wheatley settings %s", settings)
+        return self._emit("c_wheatley_setting", {"tower_id": self.tower_id, "settings": settings})
+
+    def set_row_gen(self, spec: JSON) -> Optional[Future]:
+        """
+        Changes the row generator (method or composition) for everyone in the tower.  The spec is
+        also compiled straight away, so that the compiled copy is cached before it is echoed back.
+        """
+        row_gen = compile_row_gen(spec)
+        self.logger.info("(EMIT): Changing row generator to %s", row_gen)
+        return self._emit("c_wheatley_row_gen", {"tower_id": self.tower_id, "row_gen": spec})
+
+    def stop_touch(self) -> Optional[Future]:
+        """ Stops the touch being rung by Wheatley. """
+        self.logger.info("(EMIT): Stopping touch")
+        return self._emit("c_wheatley_stop_touch", {"tower_id": self.tower_id})
+
+    def check_version(self) -> str:
+        """
+        Checks that RR's version is compatible with this library, returning the version string.
+        """
+        # Get version from RR's API
+        response = http_session().get(self._version_api_url())
+        return self._check_version_response(response.text)
+
+    # ===== CALLS =====
+
+    def make_call(self, call: str) -> Optional[Future]:
+        """
+        Broadcast a given call to all the users in the Tower.  This does not have to have a
+        corresponding sound (like 'Bob', 'Single', 'Look To', etc.), any string can be passed and
+        will appear in the centre of everyone's screens.
+        """
+        self.logger.info("(EMIT): Calling '%s'", call)
+        return self._emit("c_call", {"call": call, "tower_id": self.tower_id})
+
+    def call_bob(self) -> Optional[Future]:
+        """ Calls a 'Bob' in the current tower.  Identical to `Tower.make_call(call.BOB)`. """
+        return self.make_call(call.BOB)
+
+    def call_single(self) -> Optional[Future]:
+        """ Calls a 'Single' in the current tower.  Identical to `Tower.make_call(call.SINGLE)`. """
+        return self.make_call(call.SINGLE)
+
+    def call_look_to(self) -> Optional[Future]:
+        """ Calls 'Look To' in the current tower.  Identical to `Tower.make_call(call.LOOK_TO)`. """
+        return self.make_call(call.LOOK_TO)
+
+    def call_go(self) -> Optional[Future]:
+        """ Calls 'Go' in the current tower.  Identical to `Tower.make_call(call.GO)`. """
+        return self.make_call(call.GO)
+
+    def call_thats_all(self) -> Optional[Future]:
+        """ Calls 'That's All' in the current tower.  Identical to `Tower.make_call(call.THATS_ALL)`. """
+        return self.make_call(call.THATS_ALL)
+
+    def call_stand(self) -> Optional[Future]:
+        """ Calls 'Stand' in the current tower.  Identical to `Tower.make_call(call.STAND)`. """
+        return self.make_call(call.STAND)
+
+    # ===== HELPER FUNCTIONS =====
+
+    def _emit(self, event: str, data: Any) -> Optional[Future]:
+        """
+        Emit a socket-io signal, or add it to the emit queue (returning its future) if this tower
+        has one.
+        """
+        if self.tracer.enabled_for(tracing.EMIT):
+            self.tracer.trace(tracing.EMIT, event, data)
+        if not self.is_connected:
+            self._emit_while_disconnected(event, data)
+            return None
+        if self._emit_queue is not None:
+            return self._emit_queue.put(event, data)
+        self._send(event, data)
+        return None
+
+    def _send(self, event: str, data: Any) -> None:
+        """ Sends a socket-io signal immediately, without checking for an outage. """
+        if self._socket_io_client is None:
+            raise SocketIOClientError("Not Connected")
+        self._socket_io_client.emit(event, data)
+
+    def _invoke_callbacks(self, event_type: str, callbacks: List[Callable[..., Any]],
+                          *args: Any) -> None:
+        """
+        Run every callback in a list of user callbacks with the given arguments, either immediately
+        or (if this tower has a `CallbackDispatcher`) on the dispatcher's threads.
+        """
+        if self._callbacks_held_back(event_type):
+            return
+        if self._dispatcher is not None:
+            self._dispatcher.dispatch(self, event_type, callbacks, *args)
+            return
+        super()._invoke_callbacks(event_type, callbacks, *args)
+
+    def _notify_state_changed(self) -> None:
+        """ Wakes up the threads waiting in `wait_for`, so that they re-check their predicates. """
+        with self._state_changed:
+            self._state_changed.notify_all()
+
+    def _queue_depth_gauges(self) -> Dict[str, Callable[[], int]]:
+        """ Returns functions which measure the depths of this tower's queues, for `metrics`. """
+        return {
+            "emit": lambda: self._emit_queue.depth if self._emit_queue else 0,
+            "callbacks": lambda: self._dispatcher.queue_depth if self._dispatcher else 0,
+            "chat": lambda: self._chat_queue.depth if self._chat_queue else 0,
+        }
 
     # === INITIALISATION CODE ===
 
+    def _fetch_metadata(self) -> None:
+        """ Fetches the tower page (and the RR version, if needed), and adds them to the cache. """
+        self._url, self._tower_name, self._bell_type = parse_page(
+            self.tower_id, self._http_server_url
+        )
+        # Check that RR has a compatible version
+        rr_version = self.check_version() if self._run_version_check else None
+        self._store_metadata(rr_version)
+
     def _create_client(self) -> None:
         """ Generates the socket-io client and attaches callbacks. """
-        self._socket_io_client = socketio.Client()
-        self._socket_io_client.connect(self._url)
-        self.logger.debug(f"Connected to {self._url}")
-
-        self._socket_io_client.on("s_call", self._on_call)
-        # Bell state callbacks
-        self._socket_io_client.on("s_bell_rung", self._on_bell_ring)
-        self._socket_io_client.on("s_global_state", self._on_global_bell_state)
-        self._socket_io_client.on("s_size_change", self._on_size_change)
-        self._socket_io_client.on("s_audio_change", self._on_audio_change)
-        # User change callbacks
-        self._socket_io_client.on("s_user_entered", self._on_user_enter)
-        self._socket_io_client.on("s_user_left", self._on_user_leave)
-        self._socket_io_client.on("s_set_userlist", self._on_user_list)
-        self._socket_io_client.on("s_assign_user", self._on_assign_user)
-        self._socket_io_client.on("s_msg_sent", self._on_chat)
-        """
-        # Wheatley specific callbacks
-        self._socket_io_client.on("s_wheatley_setting", self._on_setting_change)
-        self._socket_io_client.on("s_wheatley_row_gen", self._on_row_gen_change)
-        self._socket_io_client.on("s_wheatley_stop_touch", self._on_stop_touch)
-        """
+        self._socket_io_client = socketio.Client(reconnection_delay=self.RECONNECT_DELAY,
+                                                 reconnection_delay_max=self.RECONNECT_DELAY_MAX)
+        self._socket_io_client.on("connect", self._on_connect)
+        self._socket_io_client.on("disconnect", self._on_disconnect)
+        try:
+            self._socket_io_client.connect(self._url)
+        except socketio.exceptions.ConnectionError:
+            # The cached server may have been taken out of RR's load balancer
+            if not self._invalidate_cached_metadata():
+                raise
+            self._fetch_metadata()
+            self._socket_io_client.connect(self._url)
+        self.logger.debug("Connected to %s", self._url)
+
+        if self._emit_queue_size:
+            self._emit_queue = EmitQueue(self._socket_io_client.emit, self._emit_queue_size)
+            self._emit_queue.start()
+
+        for event in self._signal_handlers:
+            self._socket_io_client.on(event, functools.partial(self._handle_signal, event))
 
         self._join_tower()
         self._request_global_state()
 
     def _join_tower(self) -> None:
         """ Joins the tower as an anonymous user. """
-        self.logger.info(f"(EMIT): Joining tower {self.tower_id}")
-        self._emit(
+        self.logger.info("(EMIT): Joining tower %s", self.tower_id)
+        # These are sent directly (rather than with `_emit`) so that, when re-joining, they can't be
+        # rejected or sent after any signals waiting in the emit queue
+        self._send(
             "c_join",
             {"anonymous_user": True, "tower_id": self.tower_id},
         )
@@ -559,7 +1390,32 @@ logged in as '{self._user_name_map[user_id_that_left]}'.")
     def _request_global_state(self) -> None:
         """ Send a request to the server to get the current state of the tower. """
         self.logger.debug("(EMIT): Requesting global state.")
-        self._emit('c_request_global_state', {"tower_id": self.tower_id})
+        self._send('c_request_global_state', {"tower_id": self.tower_id})
+
+    # === RECONNECTING ===
+
+    def _on_connect(self) -> None:
+        """ Called whenever the socket-io connection opens, including when reconnecting. """
+        if self._start_reconnect():
+            self._rejoin()
+            threading.Thread(target=self._settle_resync, daemon=True,
+                             name="belltower-resync").start()
+
+    def _rejoin(self) -> None:
+        """ Re-joins the tower, then sends the signals that were queued whilst disconnected. """
+        self._join_tower()
+        self._request_global_state()
+        while self._outage_queue:
+            self._send(*self._outage_queue.popleft())
+
+    def _settle_resync(self) -> None:
+        """ Waits for the new state to arrive after reconnecting, then finishes the re-sync. """
+        while True:
+            with self._resync_lock:
+                delay = self._try_finish_resync()
+            if delay is None:
+                return
+            time.sleep(delay)
 
     # === ENTER/EXIT FOR 'WITH' BLOCKS ===
 
@@ -577,10 +1433,21 @@ logged in as '{self._user_name_map[user_id_that_left]}'.")
     def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
         """ Called when finishing a 'with' block.  Clears up the object and disconnects the session. """
         self.logger.debug("EXIT")
+        self._stop_chat_sender()
+        if self._emit_queue is not None:
+            self._emit_queue.stop()
+            self._emit_queue = None
         if self._socket_io_client:
             self.logger.info("Disconnect")
-            self._socket_io_client.disconnect()
-            self._socket_io_client = None
+            # Remove the client first, so that `_on_disconnect` knows not to reconnect
+            client, self._socket_io_client = self._socket_io_client, None
+            # socket-io doesn't stop reconnecting when it is told to disconnect, so stop any
+            # reconnection attempts explicitly
+            client._reconnect_abort.set()
+            client.disconnect()
+        self._connection_lost = False
+        self._outage_queue.clear()
+        self._state_before_resync = None
 
 
 class SocketIOClientError(Exception):
@@ -0,0 +1,133 @@
+"""
+A module which compiles the row generator specs sent in 's_wheatley_row_gen' signals.  Specs are
+compiled as soon as they are received (long before 'Look To' is called), and the compiled row
+generators are cached by a hash of the spec's contents, so that re-sending the same spec is free.
+
+A spec is a JSON object with a 'type'.  Specs of type 'method' are compiled into a
+`belltower.method.Method` (which requires `numpy`), and must contain:
+- 'place_notation' (or 'notation'): the place notation of one lead
+- 'stage': the number of bells
+- optionally 'title' (or 'name'), and the place notation of a 'bob' and a 'single'
+
+Other specs (e.g. 'composition', which refers to a CompLib URL) are kept uncompiled, so that bots
+can handle them themselves.  Method specs which can't be compiled (e.g. because their calls aren't
+strings of place notation) are also kept uncompiled, and the reason is logged as a warning.
+"""
+
+import collections
+import hashlib
+import json
+import logging
+import threading
+from typing import Optional, Dict, Any
+
+from belltower import call
+
+# A type alias for untyped JSON
+JSON = Dict[str, Any]
+
+# The number of compiled row generators kept in the cache
+CACHE_SIZE = 64
+
+logger = logging.getLogger("ROW GEN")
+
+
+def spec_hash(spec: JSON) -> str:
+    """ Returns a hash of the contents of a row generator spec (ignoring key order). """
+    canonical = json.dumps(spec, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+class RowGenerator:
+    """
+    A compiled row generator spec.  `method` is the compiled `Method` if the spec describes a
+    method, or None if the spec couldn't be compiled (in which case `error` says why, unless the
+    spec's type is just one that isn't compiled).
+    """
+
+    __slots__ = ("spec", "hash", "method", "error")
+
+    def __init__(self, spec: JSON, hash: str, method: Any = None,
+                 error: Optional[str] = None) -> None:
+        self.spec = spec
+        self.hash = hash
+        self.method = method
+        self.error = error
+
+    @property
+    def type(self) -> str:
+        """ Returns the type of the spec (e.g. 'method' or 'composition'). """
+        return str(self.spec.get("type", ""))
+
+    @property
+    def is_compiled(self) -> bool:
+        """ Returns True if the spec was compiled into a `Method`. """
+        return self.method is not None
+
+    def __repr__(self) -> str:
+        return f"RowGenerator({self.type!r}, {self.method!r}, {self.hash[:8]})"
+
+
+_cache: 'collections.OrderedDict[str, RowGenerator]' = collections.OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def compile_row_gen(spec: JSON) -> RowGenerator:
+    """
+    Compiles a row generator spec, or returns the cached result if a spec with the same contents
+    has already been compiled.
+    """
+    key = spec_hash(spec)
+    with _cache_lock:
+        row_gen = _cache.get(key)
+        if row_gen is not None:
+            _cache.move_to_end(key)
+            return row_gen
+
+    row_gen = _compile(spec, key)
+    with _cache_lock:
+        _cache[key] = row_gen
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return row_gen
+
+
+def clear_cache() -> None:
+    """ Removes every compiled row generator from the cache. """
+    with _cache_lock:
+        _cache.clear()
+
+
+def _compile(spec: JSON, key: str) -> RowGenerator:
+    """ Compiles a spec into a `RowGenerator`, without using the cache. """
+    if spec.get("type") != "method":
+        return RowGenerator(spec, key)
+    # Check that the calls are place notation before importing anything
+    for key_name in ("bob", "single"):
+        if key_name in spec and not isinstance(spec[key_name], str):
+            return _uncompiled(spec, key, f"The {key_name} {spec[key_name]!r} isn't place notation")
+    try:
+        # Imported here so that towers which never receive a method don't need numpy
+        from belltower.method import Method
+
+        place_notation = spec.get("place_notation", spec.get("notation"))
+        if not isinstance(place_notation, str):
+            raise ValueError("Method spec has no place notation")
+        calls = dict(Method.DEFAULT_CALLS)
+        for call_name, key_name in [(call.BOB, "bob"), (call.SINGLE, "single")]:
+            if key_name in spec:
+                calls[call_name] = spec[key_name]
+        method = Method(place_notation, int(spec["stage"]), spec.get("title", spec.get("name", "")),
+                        calls)
+        # Compile the leads with each call now, rather than when the first call is made
+        for call_name in calls:
+            method.lead(call_name=call_name)
+    except (ImportError, KeyError, TypeError, ValueError) as e:
+        return _uncompiled(spec, key, str(e))
+    return RowGenerator(spec, key, method)
+
+
+def _uncompiled(spec: JSON, key: str, error: str) -> RowGenerator:
+    """ Logs why a method spec can't be compiled, and returns it uncompiled. """
+    logger.warning("Can't compile row generator %s: %s", spec, error)
+    return RowGenerator(spec, key, error=error)
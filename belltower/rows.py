@@ -0,0 +1,163 @@
+"""
+A module containing `RowAssembler`, which groups the individual blows rung in a tower into rows.
+"""
+
+import array
+import logging
+import time
+from typing import Optional, Callable, List, Tuple, Any
+
+from belltower import Bell, Stroke, HANDSTROKE, BACKSTROKE
+from belltower.bell import MAX_BELL
+
+# A row of bells, in the order they rang
+Row = Tuple[Bell, ...]
+
+
+class RowAssembler:
+    """
+    Assembles the blows rung in a tower into rows.  A row is finished once every bell in the tower
+    has rung at the same stroke, at which point the `on_row` callbacks are called with the row, its
+    stroke and the time of each blow (from `time.perf_counter`, in the order of the row).
+
+    Each blow is written into preallocated buffers, so the only allocations are the ones needed to
+    pass each finished row to the callbacks.  If a blow arrives at the other stroke (or from a bell
+    which has already rung) before a row is finished, e.g. because a bell was rung early or not at
+    all, the unfinished row is discarded and counted in `incomplete_rows`.
+    """
+
+    logger_name = "ROWS"
+
+    def __init__(self, tower: Any = None, number_of_bells: int = 0) -> None:
+        """
+        Creates an assembler for rows of `number_of_bells` bells.  If a `tower` is given, then the
+        assembler is attached to it (see `attach`).
+        """
+        self._number_of_bells = number_of_bells
+        self._stroke = HANDSTROKE
+        # The row currently being assembled is `_bells[:_blows_in_row]`
+        self._bells: List[Optional[Bell]] = [None] * MAX_BELL
+        self._times = array.array("d", [0.0] * MAX_BELL)
+        self._blows_in_row = 0
+        # Bit `i` is set if the bell with index `i` has already rung in the current row
+        self._rung_mask = 0
+
+        self.rows_assembled = 0
+        self.incomplete_rows = 0
+
+        self._invoke_on_row: List[Callable[[Row, Stroke, array.array], Any]] = []
+        self._invoke_on_change: List[Callable[[int], Any]] = []
+
+        self.logger = logging.getLogger(self.logger_name)
+
+        if tower is not None:
+            self.attach(tower)
+
+    def attach(self, tower: Any) -> None:
+        """
+        Starts assembling the rows rung in a tower, resetting whenever the bells are set at hand or
+        the tower changes size.  The assembler listens to the tower's signals directly, so each
+        blow is timed by when its signal arrived (or was recorded, if it is being replayed) and the
+        callbacks are run on the thread which receives the signals.
+        """
+        self.reset(tower.number_of_bells)
+        tower.add_signal_listener(self._on_signal)
+
+    # ===== CALLBACK DECORATORS =====
+
+    def on_row(self, func: Callable[[Row, Stroke, array.array], Any]) \
+            -> Callable[[Row, Stroke, array.array], Any]:
+        """
+        Adds a callback for a row being finished.  The callback is passed the row, its stroke and an
+        array of the times when each bell in the row rang.
+        """
+        self._invoke_on_row.append(func)
+        return func
+
+    def on_change(self, func: Callable[[int], Any]) -> Callable[[int], Any]:
+        """
+        Adds a callback for the assembler being reset (because the bells were set at hand or the
+        tower size changed), which is passed the new number of bells.  The next row is always a
+        handstroke.
+        """
+        self._invoke_on_change.append(func)
+        return func
+
+    # ===== ASSEMBLING ROWS =====
+
+    def reset(self, number_of_bells: int) -> None:
+        """ Discards any unfinished row, so that the next blow starts a new handstroke row. """
+        self._number_of_bells = number_of_bells
+        self._stroke = HANDSTROKE
+        self._blows_in_row = 0
+        self._rung_mask = 0
+        for c in self._invoke_on_change:
+            c(number_of_bells)
+
+    def add_blow(self, bell: Bell, stroke: Stroke, timestamp: Optional[float] = None) -> None:
+        """
+        Adds a blow to the current row, finishing the row if every bell has now rung.  If no
+        timestamp is given, the current time is used.
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+
+        blows = self._blows_in_row
+        bell_bit = 1 << bell.index
+        if stroke is not self._stroke or self._rung_mask & bell_bit:
+            if blows:
+                self.incomplete_rows += 1
+                self.logger.debug("Discarding incomplete %s row (%d blows)", self._stroke, blows)
+            self._stroke = stroke
+            self._rung_mask = 0
+            blows = 0
+
+        if blows >= self._number_of_bells:
+            # More blows than bells means the tower size is out of date
+            self.logger.warning("Bell %s rang in a full row of %d bells", bell,
+                                self._number_of_bells)
+            return
+        self._bells[blows] = bell
+        self._times[blows] = timestamp
+        self._rung_mask |= bell_bit
+        blows += 1
+
+        if blows == self._number_of_bells:
+            row: Row = tuple(self._bells[:blows]) # type: ignore
+            timestamps = self._times[:blows]
+            self.rows_assembled += 1
+            # The next row is at the other stroke
+            self._stroke = stroke.opposite()
+            self._blows_in_row = 0
+            self._rung_mask = 0
+            for c in self._invoke_on_row:
+                c(row, stroke, timestamps)
+        else:
+            self._blows_in_row = blows
+
+    @property
+    def current_row(self) -> Row:
+        """ Returns the bells which have rung so far in the unfinished row. """
+        return tuple(self._bells[:self._blows_in_row]) # type: ignore
+
+    @property
+    def stroke(self) -> Stroke:
+        """ Returns the stroke of the row currently being assembled. """
+        return self._stroke
+
+    def _on_signal(self, signal: str, data: Any, timestamp: float) -> None:
+        """ Signal listener for the attached tower. """
+        if signal == "s_bell_rung":
+            bell = Bell.from_number(data["who_rang"])
+            global_bell_state = data["global_bell_state"]
+            if bell.index >= min(len(global_bell_state), self._number_of_bells):
+                return
+            # The blow's stroke is the one the bell was at **before** it rang
+            stroke = BACKSTROKE if global_bell_state[bell.index] else HANDSTROKE
+            self.add_blow(bell, stroke, timestamp)
+        elif signal == "s_size_change":
+            if data["size"] != self._number_of_bells:
+                self.reset(data["size"])
+        elif signal == "s_global_state":
+            # Sent when the bells are set at hand (or the tower is re-joined)
+            self.reset(len(data["global_bell_state"]))
@@ -0,0 +1,221 @@
+"""
+A module containing a scheduler which rings rows of bells at steady, precomputed times.  Every blow
+is scheduled against an absolute deadline on a monotonic clock (rather than sleeping for a fixed
+gap after each blow), so the time spent emitting signals never accumulates as drift.
+"""
+
+import abc
+import array
+import asyncio
+import math
+import threading
+import time
+from typing import Iterable, Iterator, Sequence, Tuple, Callable, Any
+
+from belltower import Bell, Stroke
+
+# The number of rows in a peal, used to convert peal speeds into gaps between blows
+PEAL_LENGTH = 5040
+
+
+def bell_gap_for_peal_speed(peal_speed: float, number_of_bells: int,
+                            handstroke_gap: float = 1.0) -> float:
+    """
+    Returns the number of seconds between consecutive blows needed to ring a peal in `peal_speed`
+    minutes on `number_of_bells` bells, where the handstroke gap is `handstroke_gap` blows long.
+    """
+    # Each whole pull (a handstroke and a backstroke row) takes `2n + handstroke_gap` blows
+    whole_pulls = PEAL_LENGTH / 2
+    return peal_speed * 60 / (whole_pulls * (2 * number_of_bells + handstroke_gap))
+
+
+class StrikeReport:
+    """ A report of how accurately a `StrikeScheduler` rang each blow. """
+
+    def __init__(self) -> None:
+        # The number of seconds that each blow was sent after its deadline (negative if early)
+        self.lateness = array.array("d")
+        self.rows_rung = 0
+        self.failed_blows = 0
+
+    @property
+    def number_of_blows(self) -> int:
+        """ Returns the number of blows that were attempted. """
+        return len(self.lateness)
+
+    @property
+    def mean_lateness(self) -> float:
+        """ Returns the mean number of seconds that blows were late by. """
+        return sum(self.lateness) / len(self.lateness) if self.lateness else 0.0
+
+    @property
+    def max_lateness(self) -> float:
+        """ Returns the number of seconds that the latest blow was late by. """
+        return max(self.lateness) if self.lateness else 0.0
+
+    @property
+    def rms_lateness(self) -> float:
+        """ Returns the root-mean-square lateness of all the blows, in seconds. """
+        if not self.lateness:
+            return 0.0
+        return math.sqrt(sum(x * x for x in self.lateness) / len(self.lateness))
+
+    def __str__(self) -> str:
+        return (f"{self.rows_rung} rows, {self.number_of_blows} blows "
+                + f"({self.failed_blows} failed): lateness mean {self.mean_lateness * 1000:.2f}ms, "
+                + f"rms {self.rms_lateness * 1000:.2f}ms, max {self.max_lateness * 1000:.2f}ms")
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class BaseStrikeScheduler(abc.ABC):
+    """
+    The parts of a strike scheduler which don't depend on how it waits or rings: the deadline of
+    every blow and the measurement of how late each blow was.  The strike time of every blow is
+    computed from the start time of the touch, and each signal is sent early by the (measured) time
+    taken to send a signal so that it leaves as close to its deadline as possible.
+    """
+
+    # The weight given to the newest measurement in the moving average of emit latency
+    EMIT_LATENCY_WEIGHT = 0.1
+
+    def __init__(self, tower: Any, peal_speed: float = 180.0, handstroke_gap: float = 1.0) -> None:
+        """
+        Creates a scheduler for a tower, which rings at a speed of `peal_speed` minutes for a peal
+        with a handstroke gap of `handstroke_gap` blows.
+        """
+        self._tower = tower
+        self.peal_speed = peal_speed
+        self.handstroke_gap = handstroke_gap
+        self._emit_latency = 0.0
+
+    @abc.abstractmethod
+    def stop(self) -> None:
+        """ Stops the rows being rung before the next blow. """
+
+    def _blows(self, rows: Iterable[Sequence[Bell]], first_row_index: int, start: float,
+               report: StrikeReport) -> Iterator[Tuple[Bell, Stroke, float]]:
+        """
+        Generates the `(bell, stroke, deadline)` of every blow in a sequence of rows, where the
+        first row starts at `start` and has the stroke of the row at `first_row_index`.  Rows are
+        counted in `report` once all their blows have been generated.
+        """
+        deadline = start
+        for row_index, row in enumerate(rows, first_row_index):
+            stroke = Stroke.from_index(row_index)
+            gap = bell_gap_for_peal_speed(self.peal_speed, len(row), self.handstroke_gap)
+            # Leave a handstroke gap before every handstroke row except the first
+            if stroke.is_hand() and report.rows_rung > 0:
+                deadline += gap * self.handstroke_gap
+            for bell in row:
+                yield bell, stroke, deadline
+                deadline += gap
+            report.rows_rung += 1
+
+    def _send_time(self, deadline: float) -> float:
+        """ Returns the time at which to start sending a blow, so that it is sent at `deadline`. """
+        return deadline - self._emit_latency
+
+    def _record_blow(self, report: StrikeReport, deadline: float, emit_start: float,
+                     emit_end: float, rang: bool) -> None:
+        """ Records how late a blow was, and updates the moving average of emit latency. """
+        if not rang:
+            report.failed_blows += 1
+        report.lateness.append(emit_end - deadline)
+        self._emit_latency += (emit_end - emit_start - self._emit_latency) \
+            * self.EMIT_LATENCY_WEIGHT
+
+
+class StrikeScheduler(BaseStrikeScheduler):
+    """
+    Rings rows of bells on a `RingingRoomTower` at a steady rate, blocking the calling thread and
+    waiting for each blow's deadline on `time.perf_counter`.
+    """
+
+    # Sleeping is only accurate to about a millisecond, so the last part of each wait is spent
+    # spinning instead
+    SPIN_TIME = 0.002
+
+    def __init__(self, tower: Any, peal_speed: float = 180.0, handstroke_gap: float = 1.0) -> None:
+        super().__init__(tower, peal_speed, handstroke_gap)
+        self._stop_event = threading.Event()
+
+    def ring_rows(self, rows: Iterable[Sequence[Bell]], first_row_index: int = 0) -> StrikeReport:
+        """
+        Rings a sequence of rows (which could be a generator), blocking until they have all been
+        rung or `stop` is called.  The first row is rung at the stroke of the row at
+        `first_row_index`, and starts immediately.
+        """
+        self._stop_event.clear()
+        report = StrikeReport()
+        clock = time.perf_counter
+
+        for bell, stroke, deadline in self._blows(rows, first_row_index, clock(), report):
+            self._wait_until(self._send_time(deadline))
+            if self._stop_event.is_set():
+                break
+            emit_start = clock()
+            rang = self._tower.ring_bell(bell, stroke)
+            self._record_blow(report, deadline, emit_start, clock(), rang)
+        return report
+
+    def stop(self) -> None:
+        """ Stops `ring_rows` before its next blow.  Safe to call from any thread. """
+        self._stop_event.set()
+
+    def _wait_until(self, target: float) -> None:
+        """ Blocks until `time.perf_counter()` reaches `target`, or `stop` is called. """
+        sleep_time = target - time.perf_counter() - self.SPIN_TIME
+        if sleep_time > 0 and self._stop_event.wait(sleep_time):
+            return
+        while time.perf_counter() < target:
+            pass
+
+
+class AsyncStrikeScheduler(BaseStrikeScheduler):
+    """
+    Rings rows of bells on an `AsyncRingingRoomTower` at a steady rate, sleeping until each blow's
+    deadline on the event loop's clock instead of blocking a thread.  Sleeping can't be made more
+    accurate by spinning (which would block the event loop), so blows are only accurate to about a
+    millisecond.
+    """
+
+    def __init__(self, tower: Any, peal_speed: float = 180.0, handstroke_gap: float = 1.0) -> None:
+        """ Creates a scheduler for an async tower.  Must be created from a coroutine. """
+        super().__init__(tower, peal_speed, handstroke_gap)
+        self._stop_event = asyncio.Event()
+
+    async def ring_rows(self, rows: Iterable[Sequence[Bell]],
+                        first_row_index: int = 0) -> StrikeReport:
+        """
+        Rings a sequence of rows (which could be a generator), returning once they have all been
+        rung or `stop` is called.  The first row is rung at the stroke of the row at
+        `first_row_index`, and starts immediately.
+        """
+        self._stop_event.clear()
+        report = StrikeReport()
+        clock = asyncio.get_event_loop().time
+
+        for bell, stroke, deadline in self._blows(rows, first_row_index, clock(), report):
+            await self._wait_until(self._send_time(deadline), clock)
+            if self._stop_event.is_set():
+                break
+            emit_start = clock()
+            rang = await self._tower.ring_bell(bell, stroke)
+            self._record_blow(report, deadline, emit_start, clock(), rang)
+        return report
+
+    def stop(self) -> None:
+        """ Stops `ring_rows` before its next blow.  Must be called from the event loop thread. """
+        self._stop_event.set()
+
+    async def _wait_until(self, target: float, clock: Callable[[], float]) -> None:
+        """ Sleeps until `clock()` reaches `target`, or `stop` is called. """
+        sleep_time = target - clock()
+        if sleep_time <= 0:
+            return
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), sleep_time)
+        except asyncio.TimeoutError:
+            pass
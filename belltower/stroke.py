@@ -4,10 +4,23 @@ from typing import Any
 
 
 class Stroke:
-    """ A new-type of 'bool' that encapsulates a stroke: i.e. HANDSTROKE or BACKSTROKE. """
+    """
+    A new-type of 'bool' that encapsulates a stroke: i.e. HANDSTROKE or BACKSTROKE.  There are only
+    ever two Stroke objects, so `Stroke(x)` and `opposite()` return one of those two constants
+    rather than allocating a new object.
+    """
 
-    def __init__(self, is_handstroke: bool) -> None:
-        self._is_handstroke = is_handstroke
+    __slots__ = ("_is_handstroke",)
+
+    def __new__(cls, is_handstroke: bool) -> 'Stroke':
+        return HANDSTROKE if is_handstroke else BACKSTROKE
+
+    @classmethod
+    def _create(cls, is_handstroke: bool) -> 'Stroke':
+        """ Allocates a new Stroke object.  Only used to create HANDSTROKE and BACKSTROKE. """
+        stroke = object.__new__(cls)
+        stroke._is_handstroke = is_handstroke
+        return stroke
 
     def is_hand(self) -> bool:
         """ Returns true if this Stroke represents a handstroke.
@@ -24,11 +37,11 @@ class Stroke:
     @classmethod
     def from_index(cls, index: int) -> 'Stroke':
         """ Returns the stroke of the row that would exist at a given index. """
-        return cls(index % 2 == 0)
+        return BACKSTROKE if index % 2 else HANDSTROKE
 
     def opposite(self) -> 'Stroke':
         """ Returns the opposite Stroke to the current one. """
-        return Stroke(not self._is_handstroke)
+        return BACKSTROKE if self._is_handstroke else HANDSTROKE
 
     def char(self) -> str:
         """ Returns a single-character string of 'H' or 'B'. """
@@ -41,12 +54,11 @@ class Stroke:
         return str(self)
 
     def __eq__(self, other: Any) -> bool:
-        if isinstance(other, Stroke):
-            return other._is_handstroke == self._is_handstroke
-        return False
+        # Strokes are interned, so this is an identity check
+        return self is other
 
     def __ne__(self, other: Any) -> bool:
-        return not self == other
+        return self is not other
 
     def __inverse__(self) -> 'Stroke':
         return self.opposite()
@@ -54,6 +66,10 @@ class Stroke:
     def __hash__(self) -> int:
         return self._is_handstroke.__hash__()
 
+    def __reduce__(self) -> Any:
+        """ Makes sure that copying or unpickling a Stroke returns HANDSTROKE or BACKSTROKE. """
+        return (Stroke, (self._is_handstroke,))
+
 
-HANDSTROKE: Stroke = Stroke(True)
-BACKSTROKE: Stroke = Stroke(False)
+HANDSTROKE: Stroke = Stroke._create(True)
+BACKSTROKE: Stroke = Stroke._create(False)
@@ -0,0 +1,235 @@
+"""
+A module containing `TowerPool`, which manages many `AsyncRingingRoomTower`s in one process so that
+they share one event loop, one HTTP session and one version check per socket-io server.
+"""
+
+import asyncio
+import collections
+import logging
+from typing import Optional, Dict, List, Iterable, Any
+
+from belltower.async_ringing_room import AsyncRingingRoomTower
+from belltower.metadata_cache import MetadataCache
+from belltower.ringing_room import InvalidRRVersionError
+
+
+class PoolHealth:
+    """ A snapshot of the health of every tower in a `TowerPool`. """
+
+    def __init__(self, towers_by_server: Dict[str, List[AsyncRingingRoomTower]]) -> None:
+        self.towers_by_server: Dict[str, int] = {}
+        self.disconnected_towers: List[int] = []
+        self.unloaded_towers: List[int] = []
+        for server, towers in towers_by_server.items():
+            self.towers_by_server[server] = len(towers)
+            for tower in towers:
+                if not tower.is_connected:
+                    self.disconnected_towers.append(tower.tower_id)
+                elif tower.number_of_bells == 0:
+                    self.unloaded_towers.append(tower.tower_id)
+
+    @property
+    def number_of_towers(self) -> int:
+        """ Returns the total number of towers in the pool. """
+        return sum(self.towers_by_server.values())
+
+    @property
+    def is_healthy(self) -> bool:
+        """ Returns True if every tower in the pool is connected and has received its state. """
+        return not self.disconnected_towers and not self.unloaded_towers
+
+    def __str__(self) -> str:
+        return (f"{self.number_of_towers} towers on {len(self.towers_by_server)} servers "
+                + f"({len(self.disconnected_towers)} disconnected, "
+                + f"{len(self.unloaded_towers)} not loaded)")
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class TowerPool:
+    """
+    A collection of `AsyncRingingRoomTower`s which are all driven by the same event loop, and share
+    one `aiohttp.ClientSession` for fetching tower pages.  Towers are joined and left by their IDs,
+    and are grouped by the load-balanced socket-io server that they connect to (so that the RR
+    version check is only run once per server).  Use with `async with`:
+
+        async with TowerPool() as pool:
+            tower = await pool.join(765432918)
+            ...
+
+    Requires `aiohttp` to be installed.
+    """
+
+    logger_name = "TOWER POOL"
+
+    def __init__(self, url: str = "ringingroom.com", run_version_check: bool = True,
+                 metadata_cache: Optional[MetadataCache] = None) -> None:
+        """
+        Create an empty pool of towers, all of which are hosted at `url`.  If a `metadata_cache` is
+        given, it is shared by all the towers in the pool.
+        """
+        self._url = url
+        self._run_version_check = run_version_check
+        self._metadata_cache = metadata_cache
+        self._http_session: Any = None
+        self._towers: Dict[int, AsyncRingingRoomTower] = {}
+        # The joins which are still in progress, so that concurrent joins of the same tower can
+        # wait for the first one (towers are only added to `_towers` once they are loaded)
+        self._joins: Dict[int, asyncio.Future] = {}
+        # The version check of each socket-io server, which is shared by every tower joining a tower
+        # on that server (so that concurrent joins only check each server once)
+        self._version_checks: Dict[str, asyncio.Future] = {}
+
+        self.logger = logging.getLogger(self.logger_name)
+
+    # ===== JOINING/LEAVING TOWERS =====
+
+    async def join(self, tower_id: int) -> AsyncRingingRoomTower:
+        """
+        Connect to a tower and add it to the pool, returning the connected tower once it has
+        received its state.  If the tower is already in the pool (or is being joined), the existing
+        tower is returned.
+        """
+        if tower_id in self._towers:
+            return self._towers[tower_id]
+
+        join = self._joins.get(tower_id)
+        if join is None:
+            join = asyncio.ensure_future(self._join(tower_id))
+            self._joins[tower_id] = join
+            join.add_done_callback(lambda f: self._on_join_done(tower_id, f))
+        # Shielded, so that cancelling one caller doesn't cancel the join for the others
+        return await asyncio.shield(join)
+
+    async def join_many(self, tower_ids: Iterable[int]) -> Dict[int, Any]:
+        """
+        Concurrently join many towers, returning a map from tower ID to either the connected tower
+        or the exception raised whilst joining it.
+        """
+        tower_ids = list(tower_ids)
+        results = await asyncio.gather(*[self.join(i) for i in tower_ids], return_exceptions=True)
+        return dict(zip(tower_ids, results))
+
+    async def leave(self, tower_id: int) -> None:
+        """ Disconnect from a tower and remove it from the pool. """
+        tower = self._towers.pop(tower_id, None)
+        if tower is None:
+            raise KeyError(f"Tower #{tower_id} is not in the pool")
+        await tower.disconnect()
+        self.logger.info("Left tower #%s", tower_id)
+
+    async def close(self) -> None:
+        """
+        Cancel any joins which are still in progress, leave every tower in the pool, and close the
+        shared HTTP session.
+        """
+        joins = list(self._joins.values())
+        for join in joins:
+            join.cancel()
+        await asyncio.gather(*joins, return_exceptions=True)
+        await asyncio.gather(*[self.leave(i) for i in list(self._towers)],
+                             return_exceptions=True)
+        if self._http_session is not None:
+            await self._http_session.close()
+            self._http_session = None
+
+    # ===== QUERIES =====
+
+    def get(self, tower_id: int) -> Optional[AsyncRingingRoomTower]:
+        """ Returns the tower with a given ID, or None if it isn't in the pool. """
+        return self._towers.get(tower_id)
+
+    @property
+    def towers(self) -> List[AsyncRingingRoomTower]:
+        """ Returns a list of every tower in the pool. """
+        return list(self._towers.values())
+
+    def towers_by_server(self) -> Dict[str, List[AsyncRingingRoomTower]]:
+        """ Returns the towers in the pool, grouped by the socket-io server they connect to. """
+        groups: Dict[str, List[AsyncRingingRoomTower]] = collections.defaultdict(list)
+        for tower in self._towers.values():
+            groups[tower.server_url].append(tower)
+        return dict(groups)
+
+    def health(self) -> PoolHealth:
+        """ Returns a snapshot of the health of every tower in the pool. """
+        return PoolHealth(self.towers_by_server())
+
+    def __contains__(self, tower_id: int) -> bool:
+        return tower_id in self._towers
+
+    def __len__(self) -> int:
+        return len(self._towers)
+
+    # ===== HELPER FUNCTIONS =====
+
+    async def _join(self, tower_id: int) -> AsyncRingingRoomTower:
+        """ Connects to a tower and waits for its state, then adds it to the pool. """
+        tower = AsyncRingingRoomTower(tower_id, self._url, run_version_check=False,
+                                      session=self._get_http_session(),
+                                      metadata_cache=self._metadata_cache)
+        try:
+            # Check the server's version before connecting, so that we never join a tower on an
+            # incompatible server
+            await tower.load_metadata()
+            if self._run_version_check:
+                await self._check_version(tower)
+            await tower.connect()
+            # The tower page is re-fetched if the (cached) server can't be connected to, in which
+            # case the tower may have connected to a different server
+            if self._run_version_check:
+                await self._check_version(tower)
+            await tower.wait_loaded()
+        except BaseException:
+            await tower.disconnect()
+            raise
+
+        self._towers[tower_id] = tower
+        self.logger.info("Joined tower #%s on %s", tower_id, tower.server_url)
+        return tower
+
+    def _on_join_done(self, tower_id: int, join: asyncio.Future) -> None:
+        """ Called when a join finishes, whether or not it succeeded. """
+        if self._joins.get(tower_id) is join:
+            del self._joins[tower_id]
+        # Stop asyncio warning about exceptions that no caller retrieved (e.g. after cancellation)
+        if not join.cancelled():
+            join.exception()
+
+    async def _check_version(self, tower: AsyncRingingRoomTower) -> None:
+        """
+        Checks the version of the server that a tower connects to, or waits for the check which is
+        already running (or has finished) for that server.  Raises `InvalidRRVersionError` if the
+        server is incompatible.
+        """
+        server = tower.server_url
+        check = self._version_checks.get(server)
+        if check is None:
+            check = asyncio.ensure_future(tower.check_version())
+            self._version_checks[server] = check
+        try:
+            # Shielded, so that cancelling one join doesn't cancel the check for the others
+            await asyncio.shield(check)
+        except InvalidRRVersionError:
+            raise
+        except Exception:
+            # Retry checks which failed for other reasons (e.g. a network error) next time
+            if self._version_checks.get(server) is check:
+                del self._version_checks[server]
+            raise
+
+    def _get_http_session(self) -> Any:
+        """ Gets the shared `aiohttp.ClientSession`, creating it if necessary. """
+        if self._http_session is None:
+            import aiohttp # type: ignore
+            self._http_session = aiohttp.ClientSession()
+        return self._http_session
+
+    # === ENTER/EXIT FOR 'ASYNC WITH' BLOCKS ===
+
+    async def __aenter__(self) -> Any:
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        await self.close()
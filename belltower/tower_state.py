@@ -0,0 +1,113 @@
+"""
+A module containing `TowerState`, an immutable snapshot of the structure of a tower (its size,
+users and bell assignments).  Towers replace their snapshot (with a single attribute assignment)
+whenever their structure changes, so any thread can read a consistent view of the tower without
+locking or copying.  The strokes of the bells change on every blow, so they aren't part of the
+snapshot - they are kept in a bitmask which is swapped in the same way.
+"""
+
+from types import MappingProxyType
+from typing import Optional, Dict, List, Mapping, Tuple, Any
+
+from belltower import Bell
+
+_EMPTY: Mapping[Any, Any] = MappingProxyType({})
+
+
+def _bells_by_user(assignments: Mapping[Bell, int]) -> Mapping[int, Tuple[Bell, ...]]:
+    """ Builds the reverse index of a set of assignments, with each user's bells in order. """
+    bells_by_user: Dict[int, List[Bell]] = {}
+    for bell in sorted(assignments, key=lambda b: b.index):
+        bells_by_user.setdefault(assignments[bell], []).append(bell)
+    return MappingProxyType({user: tuple(bells) for user, bells in bells_by_user.items()})
+
+
+class TowerState:
+    """
+    An immutable snapshot of the structure of a tower: its size, the users in the tower and the
+    bell assignments (plus the bells assigned to each user).  Every 'with_*' method returns a new
+    snapshot, sharing whatever hasn't changed with this one.
+    """
+
+    __slots__ = ("number_of_bells", "users", "assignments", "bells_by_user")
+
+    def __init__(self, number_of_bells: int = 0, users: Mapping[int, str] = _EMPTY,
+                 assignments: Mapping[Bell, int] = _EMPTY,
+                 bells_by_user: Optional[Mapping[int, Tuple[Bell, ...]]] = None) -> None:
+        """
+        Creates a snapshot.  The mappings must not be modified afterwards, so callers outside this
+        class should pass copies.
+        """
+        self.number_of_bells = number_of_bells
+        # Maps user IDs to user names
+        self.users = users if isinstance(users, MappingProxyType) else MappingProxyType(users)
+        # Maps each assigned bell to the ID of its user
+        self.assignments = (assignments if isinstance(assignments, MappingProxyType)
+                            else MappingProxyType(assignments))
+        # Maps each user ID to the bells assigned to that user
+        self.bells_by_user = (_bells_by_user(self.assignments) if bells_by_user is None
+                              else bells_by_user)
+
+    # ===== QUERIES =====
+
+    def has_bell(self, bell: Bell) -> bool:
+        """ Returns True if a given Bell is in the tower. """
+        return 0 <= bell.index < self.number_of_bells
+
+    def bells_of(self, user_id: int) -> Tuple[Bell, ...]:
+        """ Returns the bells assigned to a given user (in order), which may be empty. """
+        return self.bells_by_user.get(user_id, ())
+
+    # ===== UPDATES =====
+
+    def with_size(self, number_of_bells: int) -> 'TowerState':
+        """
+        Returns a snapshot with a new number of bells, where the assignments of any bells which no
+        longer exist are removed.
+        """
+        assignments = self.assignments
+        bells_by_user = self.bells_by_user
+        if any(bell.index >= number_of_bells for bell in assignments):
+            assignments = MappingProxyType({
+                bell: user for bell, user in assignments.items() if bell.index < number_of_bells
+            })
+            bells_by_user = None
+        return TowerState(number_of_bells, self.users, assignments, bells_by_user)
+
+    def with_user(self, user_id: int, user_name: str) -> 'TowerState':
+        """ Returns a snapshot where a given user is in the tower. """
+        users = dict(self.users)
+        users[user_id] = user_name
+        return TowerState(self.number_of_bells, users, self.assignments, self.bells_by_user)
+
+    def without_user(self, user_id: int) -> 'TowerState':
+        """ Returns a snapshot where a given user has left, and all their bells are unassigned. """
+        users = self.users
+        if user_id in users:
+            users = MappingProxyType({u: name for u, name in users.items() if u != user_id})
+        assignments = self.assignments
+        bells_by_user = self.bells_by_user
+        if user_id in bells_by_user:
+            assignments = MappingProxyType({
+                bell: user for bell, user in assignments.items() if user != user_id
+            })
+            bells_by_user = MappingProxyType({
+                user: bells for user, bells in bells_by_user.items() if user != user_id
+            })
+        return TowerState(self.number_of_bells, users, assignments, bells_by_user)
+
+    def with_assignment(self, bell: Bell, user_id: Optional[int]) -> 'TowerState':
+        """ Returns a snapshot where a bell is assigned to a user (or unassigned if None). """
+        assignments = dict(self.assignments)
+        if user_id is None:
+            assignments.pop(bell, None)
+        else:
+            assignments[bell] = user_id
+        return TowerState(self.number_of_bells, self.users, assignments)
+
+    def without_users(self) -> 'TowerState':
+        """ Returns a snapshot with no users and no assignments, but the same number of bells. """
+        return TowerState(self.number_of_bells)
+
+    def __repr__(self) -> str:
+        return f"TowerState({self.number_of_bells}, {dict(self.users)}, {dict(self.assignments)})"
@@ -0,0 +1,207 @@
+"""
+A module containing structured tracing for towers.  Trace points record a `TraceKind` and the raw
+values involved, which are only formatted into text when a sink asks for it (e.g. when a
+`RingBufferSink` is dumped after an incident).  Each tower has a `Tracer`, which is inactive until a
+sink is attached, so the cost of a trace point whilst tracing is off is one call to `enabled_for`.
+"""
+
+import collections
+import logging
+import time
+from typing import Callable, Deque, Dict, List, Tuple, Any
+
+
+class TraceKind:
+    """
+    A type of trace record, with a name (used to set sampling rates) and a `str.format` template
+    which formats the record's fields.
+    """
+
+    __slots__ = ("name", "template")
+
+    def __init__(self, name: str, template: str) -> None:
+        self.name = name
+        self.template = template
+
+    def __repr__(self) -> str:
+        return f"TraceKind({self.name!r})"
+
+
+# The kinds of record traced by towers
+SIGNAL = TraceKind("signal", "RECEIVED: '{0}' {1}")
+BELL_RUNG = TraceKind("bell_rung", "RECEIVED: Bell {0} rang at {1}, bells '{2}'")
+EMIT = TraceKind("emit", "(EMIT): '{0}' {1}")
+CONNECT = TraceKind("connect", "CONNECTION: Connected to {0}")
+DISCONNECT = TraceKind("disconnect", "CONNECTION: Disconnected from {0}")
+RESYNCED = TraceKind("resynced", "CONNECTION: Finished re-synchronising")
+
+
+class TraceRecord:
+    """ One traced event.  The fields are kept as raw values until the record is formatted. """
+
+    __slots__ = ("kind", "time", "fields")
+
+    def __init__(self, kind: TraceKind, time: float, fields: Tuple[Any, ...]) -> None:
+        self.kind = kind
+        # The time of the record, from `time.perf_counter`
+        self.time = time
+        self.fields = fields
+
+    def format(self) -> str:
+        """ Formats this record's fields into a message. """
+        return self.kind.template.format(*self.fields)
+
+    def __str__(self) -> str:
+        return f"[{self.time:.6f}] {self.format()}"
+
+    def __repr__(self) -> str:
+        return f"TraceRecord({self.kind.name!r}, {self.time}, {self.fields!r})"
+
+
+def _copy_value(value: Any) -> Any:
+    """
+    Copies the (JSON-like) dictionaries and lists in a field value, so that a record isn't changed
+    if the caller later modifies them.  Other values are assumed to be immutable.
+    """
+    if isinstance(value, dict):
+        return {k: _copy_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_value(v) for v in value]
+    return value
+
+
+class BellStates:
+    """
+    The strokes of every bell, which are only converted into a string (e.g. 'HHBH') when a trace
+    record is formatted.
+    """
+
+    __slots__ = ("handstroke_mask", "number_of_bells")
+
+    def __init__(self, handstroke_mask: int, number_of_bells: int) -> None:
+        self.handstroke_mask = handstroke_mask
+        self.number_of_bells = number_of_bells
+
+    def __str__(self) -> str:
+        return "".join("H" if self.handstroke_mask >> i & 1 else "B"
+                       for i in range(self.number_of_bells))
+
+
+# ===== SINKS =====
+
+class RingBufferSink:
+    """
+    Keeps the most recent `capacity` trace records, so that they can be dumped later.  The records
+    can outlive the signals they describe, so their fields are copied when they are added.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self._records: Deque[TraceRecord] = collections.deque(maxlen=capacity)
+
+    def __call__(self, record: TraceRecord) -> None:
+        fields = record.fields
+        if any(isinstance(f, (dict, list)) for f in fields):
+            record = TraceRecord(record.kind, record.time, tuple(map(_copy_value, fields)))
+        self._records.append(record)
+
+    def records(self) -> List[TraceRecord]:
+        """ Returns the buffered records, oldest first. """
+        return list(self._records)
+
+    def dump(self, logger: logging.Logger, log_level: int = logging.WARNING) -> None:
+        """ Formats and logs every buffered record, oldest first. """
+        logger.log(log_level, "===== LAST %s TRACE RECORDS =====", len(self._records))
+        for record in list(self._records):
+            logger.log(log_level, str(record))
+
+    def clear(self) -> None:
+        """ Removes every buffered record. """
+        self._records.clear()
+
+
+class LoggingSink:
+    """ Formats every trace record straight away, and logs it at `log_level`. """
+
+    def __init__(self, logger: logging.Logger, log_level: int = logging.DEBUG) -> None:
+        self.logger = logger
+        self.log_level = log_level
+
+    def __call__(self, record: TraceRecord) -> None:
+        if self.logger.isEnabledFor(self.log_level):
+            self.logger.log(self.log_level, record.format())
+
+
+# ===== TRACER =====
+
+class Tracer:
+    """
+    Passes trace records to a set of sinks, sampling each kind of record at its own rate.  Callers
+    should check `enabled_for` before tracing, so that nothing is allocated when there are no sinks
+    or the record isn't sampled:
+
+        if tracer.enabled_for(BELL_RUNG):
+            tracer.trace(BELL_RUNG, bell, stroke, states)
+    """
+
+    def __init__(self) -> None:
+        # True if there are any sinks (kept as a plain attribute so that checking it is cheap)
+        self.active = False
+        self._sinks: List[Callable[[TraceRecord], Any]] = []
+        # Only every `n`th record of each kind is traced (and no records if `n` is 0).  Kinds which
+        # aren't in this dictionary are always traced.
+        self._sample_every: Dict[TraceKind, int] = {}
+        self._sample_counts: Dict[TraceKind, int] = {}
+
+    def add_sink(self, sink: Callable[[TraceRecord], Any]) -> Callable[[TraceRecord], Any]:
+        """ Adds a sink, which is passed every (sampled) record.  Returns the sink. """
+        self._sinks.append(sink)
+        self.active = True
+        return sink
+
+    def remove_sink(self, sink: Callable[[TraceRecord], Any]) -> None:
+        """ Removes a sink, making the tracer inactive if it was the last one. """
+        self._sinks.remove(sink)
+        self.active = bool(self._sinks)
+
+    def set_sample_rate(self, kind: TraceKind, rate: float) -> None:
+        """
+        Sets the fraction of records of a given kind which are traced, e.g. 0.1 traces every 10th
+        record and 0 traces none.
+        """
+        if not 0 <= rate <= 1:
+            raise ValueError(f"Sample rate {rate} must be between 0 and 1")
+        if rate == 1:
+            self._sample_every.pop(kind, None)
+        else:
+            self._sample_every[kind] = round(1 / rate) if rate > 0 else 0
+        self._sample_counts[kind] = 0
+
+    def enabled_for(self, kind: TraceKind) -> bool:
+        """
+        Returns True if the next record of a given kind should be traced, i.e. if there are any
+        sinks and the record is sampled.
+        """
+        return self.active and self.sample(kind)
+
+    def sample(self, kind: TraceKind) -> bool:
+        """ Returns True if the next record of a given kind should be traced. """
+        every = self._sample_every.get(kind)
+        if every is None:
+            return True
+        if every == 0:
+            return False
+        count = self._sample_counts[kind]
+        self._sample_counts[kind] = count + 1
+        return count % every == 0
+
+    def trace(self, kind: TraceKind, *fields: Any) -> None:
+        """ Passes a trace record to every sink (without sampling it - see `enabled_for`). """
+        record = TraceRecord(kind, time.perf_counter(), fields)
+        for sink in self._sinks:
+            sink(record)
+
+    def dump(self, logger: logging.Logger, log_level: int = logging.WARNING) -> None:
+        """ Dumps the records held by every `RingBufferSink`. """
+        for sink in self._sinks:
+            if isinstance(sink, RingBufferSink):
+                sink.dump(logger, log_level)
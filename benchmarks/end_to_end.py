@@ -0,0 +1,89 @@
+"""
+End-to-end benchmark of `RingingRoomTower`, using a local `FakeRingingRoomServer`.  The server
+replays a stream of 's_bell_rung' signals into a tower (either a recorded stream, or generated
+rounds), and this measures the latency between the server sending each signal and the tower's
+`on_bell_ring` callback being run, as well as the number of rings processed per second.
+
+Run with `python benchmarks/end_to_end.py --help` to see the options.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from belltower import RingingRoomTower
+from belltower.fake_server import FakeRingingRoomServer, load_event_stream, rounds_stream
+
+TOWER_ID = 123456789
+
+
+def percentile(sorted_values, fraction):
+    """ Returns the value at a given fraction of the way through a sorted list. """
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run(events, speed, number_of_bells):
+    # Only the bell rings reach `on_bell_ring`, so only their send times can be paired with the
+    # receive times
+    ring_indices = [i for i, (_, event, _) in enumerate(events) if event == "s_bell_rung"]
+    number_of_rings = len(ring_indices)
+
+    with FakeRingingRoomServer() as server:
+        server.add_tower(TOWER_ID, size=number_of_bells)
+
+        tower = RingingRoomTower(TOWER_ID, server.url)
+        receive_times = []
+        all_received = threading.Event()
+
+        @tower.on_bell_ring
+        def on_bell_ring(bell, stroke):
+            receive_times.append(time.perf_counter())
+            if len(receive_times) == number_of_rings:
+                all_received.set()
+
+        with tower:
+            tower.wait_loaded()
+            event_send_times = server.replay(TOWER_ID, events, speed).result()
+            if not all_received.wait(timeout=30):
+                print(f"Only received {len(receive_times)}/{number_of_rings} bell rings")
+                return
+
+    send_times = [event_send_times[i] for i in ring_indices]
+    latencies = sorted((r - s) * 1000 for s, r in zip(send_times, receive_times))
+    duration = receive_times[-1] - send_times[0]
+
+    print(f"{number_of_rings} bell rings in {duration:.2f}s "
+          + f"({number_of_rings / duration:.0f} rings/s)")
+    print("Send-to-callback latency:")
+    for name, fraction in [("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0)]:
+        print(f"    {name}: {percentile(latencies, fraction):.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stream", help="A recorded event stream to replay, instead of rounds")
+    parser.add_argument("--bells", type=int, default=16,
+                        help="The number of bells in the tower (and ringing rounds)")
+    parser.add_argument("--rows", type=int, default=500, help="The number of rows of rounds")
+    parser.add_argument("--bell-gap", type=float, default=0.01,
+                        help="The number of seconds between blows of rounds")
+    parser.add_argument("--speed", type=float, default=None,
+                        help="Replay speed multiplier (default: as fast as possible)")
+    args = parser.parse_args()
+
+    if args.stream is not None:
+        events = load_event_stream(args.stream)
+    else:
+        events = list(rounds_stream(args.bells, args.rows, args.bell_gap))
+    run(events, args.speed, args.bells)
+    # Don't wait for socket-io's background threads to notice that the connection has closed
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
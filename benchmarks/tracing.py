@@ -0,0 +1,77 @@
+"""
+Micro-benchmark of the overhead of `belltower.tracing` on the path taken by every 's_bell_rung'
+signal.  Signals are handled by an offline tower with tracing off, with a `RingBufferSink`, and with
+a `RingBufferSink` which only samples 1% of the traced bell rings.  The cost of a disabled trace
+point (one call to `Tracer.enabled_for`) is also measured on its own.
+
+Run with `python benchmarks/tracing.py`.
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from belltower import RingingRoomTower, tracing
+from belltower.tracing import RingBufferSink, Tracer
+
+NUM_BELLS = 16
+NUM_BLOWS = 100_000
+
+
+def make_signals():
+    """ Generates the payloads of `NUM_BLOWS` 's_bell_rung' signals of rounds. """
+    state = [True] * NUM_BELLS
+    signals = []
+    for i in range(NUM_BLOWS):
+        index = i % NUM_BELLS
+        state[index] = not state[index]
+        signals.append({"who_rang": index + 1, "global_bell_state": list(state)})
+    return signals
+
+
+def handle_signals(tower, signals):
+    """ Handles the signals, returning the time taken per signal in microseconds. """
+    def run():
+        for data in signals:
+            tower._handle_signal("s_bell_rung", data)
+    seconds = min(timeit.repeat(run, number=1, repeat=5))
+    return seconds / len(signals) * 1e6
+
+
+def make_tower(sink=None, bell_rung_rate=1.0):
+    tower = RingingRoomTower.offline(1)
+    tower._handle_signal("s_size_change", {"size": NUM_BELLS})
+    tower.on_bell_ring(lambda bell, stroke: None)
+    if sink is not None:
+        tower.tracer.add_sink(sink)
+        tower.tracer.set_sample_rate(tracing.BELL_RUNG, bell_rung_rate)
+        tower.tracer.set_sample_rate(tracing.SIGNAL, bell_rung_rate)
+    return tower
+
+
+def main():
+    signals = make_signals()
+
+    # The cost of a trace point when tracing is off, compared to an empty loop
+    tracer = Tracer()
+    number = 1_000_000
+    guarded = min(timeit.repeat("if tracer.enabled_for(kind): tracer.trace(kind, 1, 2)",
+                                number=number, repeat=5,
+                                globals={"tracer": tracer, "kind": tracing.BELL_RUNG}))
+    empty = min(timeit.repeat("pass", number=number, repeat=5))
+    print(f"Disabled trace point: {(guarded - empty) / number * 1e9:.1f}ns")
+
+    off = handle_signals(make_tower(), signals)
+    print(f"Tracing off:          {off:.3f}us per signal")
+    for name, tower in [
+        ("Ring buffer (all):   ", make_tower(RingBufferSink(4096))),
+        ("Ring buffer (1%):    ", make_tower(RingBufferSink(4096), 0.01)),
+    ]:
+        on = handle_signals(tower, signals)
+        print(f"{name} {on:.3f}us per signal ({(on - off) / off:+.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Micro-benchmark of the objects allocated by the `Bell` and `Stroke` value types on the path taken
+by every 's_bell_rung' signal (i.e. `Bell.from_number`, `Stroke(is_handstroke)` and
+`Stroke.opposite()`).  The interned types are compared against copies of the original,
+non-interned classes.
+
+Run with `python benchmarks/value_types.py`.
+"""
+
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from belltower import Bell, Stroke
+
+NUM_BELLS = 16
+NUM_BLOWS = 100_000
+
+
+# ===== THE ORIGINAL (NON-INTERNED) VALUE TYPES =====
+
+class OriginalBell:
+    def __init__(self, index):
+        if index < 0 or index >= NUM_BELLS:
+            raise ValueError(f"'{index}' is not known bell index")
+        self.index = index
+
+    @classmethod
+    def from_number(cls, bell_num):
+        return cls(bell_num - 1)
+
+
+class OriginalStroke:
+    def __init__(self, is_handstroke):
+        self._is_handstroke = is_handstroke
+
+    def opposite(self):
+        return OriginalStroke(not self._is_handstroke)
+
+
+# ===== THE BENCHMARK =====
+
+def ring_callback_path(bell_cls, stroke_cls, blows):
+    """ Creates the value types needed to handle `NUM_BLOWS` 's_bell_rung' signals. """
+    for i in range(NUM_BLOWS):
+        bell = bell_cls.from_number(i % NUM_BELLS + 1)
+        stroke = stroke_cls(i // NUM_BELLS % 2 == 0).opposite()
+        if blows is not None:
+            blows.append((bell, stroke))
+
+
+def measure(name, bell_cls, stroke_cls):
+    # Time the path without keeping anything alive
+    seconds = min(timeit.repeat(lambda: ring_callback_path(bell_cls, stroke_cls, None),
+                                number=1, repeat=5))
+    # Keep every blow alive (as a recorder or analysis bot would) to count the distinct objects
+    # that have been allocated, and how much memory they take up
+    blows = []
+    tracemalloc.start()
+    ring_callback_path(bell_cls, stroke_cls, blows)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    distinct_objects = len({id(x) for blow in blows for x in blow})
+
+    print(f"{name}:")
+    print(f"    {seconds / NUM_BLOWS * 1e9:.0f} ns per blow")
+    print(f"    {distinct_objects} Bell/Stroke objects for {NUM_BLOWS} blows")
+    print(f"    {memory / 1024:.0f} KiB held after {NUM_BLOWS} blows")
+
+
+if __name__ == "__main__":
+    print(f"Simulating {NUM_BLOWS} blows on {NUM_BELLS} bells\n")
+    measure("Original Bell/Stroke", OriginalBell, OriginalStroke)
+    measure("Interned Bell/Stroke", Bell, Stroke)
@@ -1,15 +1,22 @@
-# Import the tower class, and 'time.sleep'
+# Import the tower class, 'time.sleep' and 'itertools.repeat'
 import time
+from itertools import repeat
 from belltower import *
+from belltower import call
 
-# Number of seconds between each bell stroke
-BELL_GAP = 0.3
+# The speed of the ringing, in minutes for a peal
+PEAL_SPEED = 180
 # Number of strokes that would fit into the handstroke gap
 HANDSTROKE_GAP = 1
 
 # Create a new tower, and tell it to join tower ID 765432918
 tower = RingingRoomTower(765432918)
 
+# Stop ringing when someone calls 'Stand'
+@tower.on_call(call.STAND)
+def on_stand():
+    tower.stop_ringing()
+
 # The 'with' block makes sure that 'tower' has a chance to gracefully shut
 # down the connection if the program crashes
 with tower:
@@ -21,20 +28,10 @@ with tower:
     tower.call_look_to()
     time.sleep(3)
 
-    # Keep count of how many rows have been rung
-    row_index = 0
-    while True:
-        # Figure out what stroke we're on
-        stroke = Stroke.from_index(row_index)
-
-        # Implement handstroke gap
-        if stroke.is_hand():
-            time.sleep(BELL_GAP * HANDSTROKE_GAP)
-
-        # Ring the row, expecting the bells to be on the right strokes
-        for i in range(tower.number_of_bells):
-            tower.ring_bell(Bell.from_index(i), stroke)
-            time.sleep(BELL_GAP)
-
-        # Increase the row count
-        row_index += 1
+    # Ring rounds until someone calls 'Stand'.  'ring_rows' schedules every blow
+    # against a steady clock, so the rhythm won't drift even if the connection
+    # is slow.  It returns a report of how accurately each blow was rung.
+    rounds = [Bell.from_index(i) for i in range(tower.number_of_bells)]
+    report = tower.ring_rows(repeat(rounds), peal_speed=PEAL_SPEED,
+                             handstroke_gap=HANDSTROKE_GAP)
+    print(report)
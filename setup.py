@@ -39,4 +39,8 @@ setuptools.setup(
         "python-engineio<4",
         "websocket-client"
     ],
+    extras_require={
+        "async": ["aiohttp"],
+        "analysis": ["numpy"],
+    },
 )
@@ -0,0 +1,31 @@
+""" Fixtures shared by the tests. """
+
+import time
+
+import pytest
+
+# The ID of the tower created on every fake server
+TOWER_ID = 123456789
+# How long to wait for a signal to arrive before failing a test
+TIMEOUT = 5.0
+
+
+@pytest.fixture
+def server():
+    """ A `FakeRingingRoomServer` hosting an 8-bell tower with ID `TOWER_ID`. """
+    pytest.importorskip("aiohttp")
+    from belltower.fake_server import FakeRingingRoomServer
+
+    with FakeRingingRoomServer() as server:
+        server.add_tower(TOWER_ID, "Test Tower", size=8)
+        yield server
+
+
+def wait_until(condition, timeout=TIMEOUT):
+    """ Polls `condition` until it returns True, returning False if that takes over `timeout`. """
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
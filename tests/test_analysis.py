@@ -0,0 +1,94 @@
+""" Tests of `belltower.analysis`. """
+
+import pytest
+
+from belltower import Bell, HANDSTROKE, BACKSTROKE
+from belltower.rows import RowAssembler
+
+np = pytest.importorskip("numpy")
+from belltower.analysis import StrikingAnalysis # pylint: disable=wrong-import-position
+
+ROUNDS = [Bell.from_number(n) for n in range(1, 5)]
+GAP = 0.2
+
+
+def perfect_times(number_of_rows, number_of_bells=4, handstroke_gap=1.0):
+    """ The times of perfectly struck rows, starting with a handstroke. """
+    times = []
+    t = 0.0
+    for row in range(number_of_rows):
+        if row > 0:
+            t += GAP * (handstroke_gap if row % 2 == 0 else 0)
+        times.append([t + i * GAP for i in range(number_of_bells)])
+        t += number_of_bells * GAP
+    return np.array(times)
+
+
+def test_perfect_striking():
+    analysis = StrikingAnalysis(4, capacity=1)
+    times = perfect_times(6)
+    for row, row_times in enumerate(times):
+        analysis.add_row(ROUNDS, HANDSTROKE if row % 2 == 0 else BACKSTROKE, row_times)
+    assert analysis.number_of_rows == 6
+    assert analysis.deviations() == pytest.approx(np.zeros((6, 4)))
+    assert analysis.mean_gap() == pytest.approx(GAP)
+    assert analysis.handstroke_gap_errors() == pytest.approx(np.zeros(2))
+    assert analysis.backstroke_gap_errors() == pytest.approx(np.zeros(3))
+
+
+def test_deviations_are_in_bell_order():
+    analysis = StrikingAnalysis(4)
+    times = perfect_times(2)
+    # In the first row (3124), the 3 and 4 strike 10ms late and the 1 and 2 strike 10ms early
+    times[0] += [0.01, -0.01, -0.01, 0.01]
+    bells = [[2, 0, 1, 3], [0, 1, 2, 3]]
+    analysis.add_rows(bells, times)
+    assert analysis.deviations(HANDSTROKE)[0] == pytest.approx([-0.01, -0.01, 0.01, 0.01])
+    assert analysis.deviations(BACKSTROKE)[0] == pytest.approx(np.zeros(4))
+    assert analysis.rms_by_bell()[0] == pytest.approx(0.01 / np.sqrt(2))
+    assert analysis.mean_deviation_by_bell(BACKSTROKE) == pytest.approx(np.zeros(4))
+
+
+def test_rolling_rms():
+    analysis = StrikingAnalysis(4)
+    times = perfect_times(4)
+    times[3, 0] += 0.02
+    times[3, 1:] -= 0.02 / 3
+    analysis.add_rows([[0, 1, 2, 3]] * 4, times)
+    rolling = analysis.rolling_rms_by_bell(window=2)
+    assert rolling.shape == (3, 4)
+    assert rolling[:2] == pytest.approx(np.zeros((2, 4)))
+    assert rolling[2, 0] > 0
+    assert analysis.rolling_rms_by_bell(window=5).shape == (0, 4)
+
+
+def test_gap_errors():
+    analysis = StrikingAnalysis(4)
+    times = perfect_times(4)
+    # A handstroke gap 0.1s too long
+    times[2:] += 0.1
+    analysis.add_rows([[0, 1, 2, 3]] * 4, times)
+    assert analysis.handstroke_gap_errors() == pytest.approx([0.1])
+    assert analysis.backstroke_gap_errors() == pytest.approx([0.0, 0.0])
+
+
+def test_attached_to_row_assembler():
+    assembler = RowAssembler(number_of_bells=4)
+    analysis = StrikingAnalysis(4)
+    analysis.attach(assembler)
+    for row, row_times in enumerate(perfect_times(4)):
+        stroke = HANDSTROKE if row % 2 == 0 else BACKSTROKE
+        for bell, t in zip(ROUNDS, row_times):
+            assembler.add_blow(bell, stroke, t)
+        if row == 1:
+            # Setting the bells at hand starts a new touch, so there's no gap before the next row
+            assembler.reset(4)
+    assert analysis.number_of_rows == 4
+    assert len(analysis.handstroke_gap_errors()) == 0
+    assert len(analysis.backstroke_gap_errors()) == 2
+    # Changing the number of bells clears the analysis
+    assembler.reset(6)
+    assert analysis.number_of_rows == 0
+    assert analysis.number_of_bells == 6
+    with pytest.raises(ValueError):
+        analysis.add_row(ROUNDS, HANDSTROKE, [0.0] * 4)
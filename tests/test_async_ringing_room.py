@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+
+from belltower import AsyncRingingRoomTower, RingingRoomTower, Bell, HANDSTROKE, BACKSTROKE, call
+from belltower.ringing_room import BaseRingingRoomTower, SocketIOClientError
+
+from conftest import TOWER_ID, TIMEOUT
+
+
+class RecordingClient:
+    """ Stands in for a connected `socketio.AsyncClient`, recording everything that is emitted. """
+
+    def __init__(self):
+        self.connected = True
+        self.emitted = []
+
+    async def emit(self, event, data):
+        self.emitted.append((event, data))
+
+
+def make_tower(size=8):
+    tower = AsyncRingingRoomTower(TOWER_ID, run_version_check=False)
+    tower._socket_io_client = RecordingClient()
+    tower._handle_signal("s_global_state", {"global_bell_state": [True] * size})
+    return tower
+
+
+def test_shares_base_but_not_sync_tower():
+    assert issubclass(AsyncRingingRoomTower, BaseRingingRoomTower)
+    assert not issubclass(AsyncRingingRoomTower, RingingRoomTower)
+    assert not hasattr(AsyncRingingRoomTower, "__enter__")
+
+
+def test_ring_bell_emits_and_checks_stroke():
+    async def main():
+        tower = make_tower()
+        assert await tower.ring_bell(Bell.from_number(3), HANDSTROKE)
+        assert not await tower.ring_bell(Bell.from_number(3), BACKSTROKE)
+        return tower._socket_io_client.emitted
+
+    assert asyncio.run(main()) == [
+        ("c_bell_rung", {"bell": 3, "stroke": True, "tower_id": TOWER_ID})
+    ]
+
+
+def test_calls_are_coroutines():
+    async def main():
+        tower = make_tower()
+        await tower.call_bob()
+        await tower.call_thats_all()
+        await tower.set_size(10)
+        return tower._socket_io_client.emitted
+
+    assert asyncio.run(main()) == [
+        ("c_call", {"call": call.BOB, "tower_id": TOWER_ID}),
+        ("c_call", {"call": call.THATS_ALL, "tower_id": TOWER_ID}),
+        ("c_size_change", {"new_size": 10, "tower_id": TOWER_ID}),
+    ]
+
+
+def test_emit_without_connection_fails():
+    async def main():
+        tower = AsyncRingingRoomTower(TOWER_ID, run_version_check=False)
+        with pytest.raises(SocketIOClientError):
+            await tower.call_go()
+
+    asyncio.run(main())
+
+
+def test_coroutine_callbacks_are_scheduled():
+    async def main():
+        tower = make_tower()
+        rings = []
+        calls = []
+
+        @tower.on_bell_ring
+        async def on_ring(bell, stroke):
+            await asyncio.sleep(0)
+            rings.append((bell, stroke))
+
+        @tower.on_call(call.BOB)
+        def on_bob():
+            calls.append(call.BOB)
+
+        tower._handle_signal("s_bell_rung",
+                             {"global_bell_state": [True, False] + [True] * 6, "who_rang": 2})
+        tower._handle_signal("s_call", {"call": call.BOB})
+        # The coroutine callback only runs once the event loop gets control
+        assert rings == []
+        assert calls == [call.BOB]
+        await asyncio.gather(*tower._callback_tasks)
+        assert tower.get_stroke(Bell.from_number(2)) == BACKSTROKE
+        return rings
+
+    assert asyncio.run(main()) == [(Bell.from_number(2), HANDSTROKE)]
+
+
+# ===== AGAINST A FAKE SERVER =====
+
+async def wait_until_async(condition, timeout=TIMEOUT):
+    """ Polls `condition` without blocking the event loop, returning False if it times out. """
+    deadline = asyncio.get_event_loop().time() + timeout
+    while not condition():
+        if asyncio.get_event_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+def test_ring_is_echoed_to_every_client(server):
+    async def ring():
+        ringer = AsyncRingingRoomTower(TOWER_ID, server.url)
+        listener = AsyncRingingRoomTower(TOWER_ID, server.url)
+        rings = []
+
+        # Coroutine functions can be used as callbacks
+        @listener.on_bell_ring
+        async def on_bell_ring(bell, stroke):
+            rings.append((bell, stroke))
+
+        async with ringer, listener:
+            await ringer.wait_loaded()
+            await listener.wait_loaded()
+            assert listener.tower_name == "Test Tower"
+            assert await ringer.ring_bell(Bell.from_number(1))
+            assert await wait_until_async(lambda: len(rings) == 1)
+            assert await wait_until_async(
+                lambda: ringer.get_stroke(Bell.from_number(1)) == BACKSTROKE
+            )
+        return rings
+
+    assert asyncio.run(ring()) == [(Bell.from_number(1), HANDSTROKE)]
+
+
+def test_set_size(server):
+    async def main():
+        async with AsyncRingingRoomTower(TOWER_ID, server.url) as tower:
+            await tower.wait_loaded()
+            await tower.set_size(10)
+            assert await wait_until_async(lambda: tower.number_of_bells == 10)
+        assert not tower.is_connected
+
+    asyncio.run(main())
+
+
+def test_wait_for_events(server):
+    async def main():
+        async with AsyncRingingRoomTower(TOWER_ID, server.url) as tower:
+            await tower.wait_loaded()
+            assert not await tower.wait_for_size(6, timeout=0.05)
+            await tower.set_size(6)
+            assert await tower.wait_for_size(6, timeout=TIMEOUT)
+
+            waiter = asyncio.ensure_future(tower.wait_for_call(call.LOOK_TO, timeout=TIMEOUT))
+            await asyncio.sleep(0)
+            await tower.call_look_to()
+            assert await waiter
+
+            server.add_user(TOWER_ID, 42, "Alice")
+            assert await tower.wait_for_user("Alice", timeout=TIMEOUT)
+            waiter = asyncio.ensure_future(tower.wait_for_set_at_hand(timeout=TIMEOUT))
+            await asyncio.sleep(0)
+            await tower.set_at_hand()
+            assert await waiter
+
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+""" Tests of the chat queue's rate limiting and merging (see `belltower.chat`). """
+
+import asyncio
+import time
+
+from belltower import RingingRoomTower
+from belltower.async_ringing_room import AsyncRingingRoomTower
+from belltower.chat import ChatQueue, TokenBucket, PRIORITY_LOW, PRIORITY_HIGH
+
+from conftest import TOWER_ID, wait_until
+
+
+class RecordingClient:
+    """ Stands in for a connected `socketio.AsyncClient`, recording the chat messages emitted. """
+
+    def __init__(self):
+        self.connected = True
+        self.messages = []
+
+    async def emit(self, event, data):
+        assert event == "c_msg_sent"
+        self.messages.append(data["msg"])
+
+
+def make_queue(**kwargs):
+    return ChatQueue(TokenBucket(1.0, 5), **kwargs)
+
+
+def after_window():
+    """ Returns a time (on the queue's clock) after the messages queued so far can be merged. """
+    return time.monotonic() + 1.0
+
+
+def test_messages_from_one_user_are_merged():
+    queue = make_queue()
+    now = time.monotonic()
+    first = queue.put("alice", "Look to", "a@b.c")
+    queue.put("bob", "Hello", "b@b.c")
+    last = queue.put("alice", "Treble's going", "a@b.c")
+
+    # Messages are held back for the coalescing window
+    batch, wait = queue.poll(now)
+    assert batch is None and wait > 0
+    later = after_window()
+    batch, wait = queue.poll(later)
+    assert batch[:3] == ("alice", "Look to | Treble's going", "a@b.c")
+    assert batch[3] == [first, last]
+    batch, _ = queue.poll(later)
+    assert batch[:2] == ("bob", "Hello")
+    assert queue.poll(later) == (None, None)
+    assert (queue.messages_sent, queue.messages_merged) == (2, 1)
+
+
+def test_merged_messages_are_limited_in_length():
+    queue = make_queue(max_length=10)
+    queue.put("alice", "12345", "")
+    queue.put("alice", "67890", "")
+    batch, _ = queue.poll(after_window())
+    assert batch[1] == "12345"
+    batch, _ = queue.poll(after_window())
+    assert batch[1] == "67890"
+
+
+def test_high_priority_messages_skip_the_queue():
+    queue = make_queue()
+    queue.put("alice", "Normal", "")
+    queue.put("bob", "Urgent", "", PRIORITY_HIGH)
+    # ... even before the coalescing window has passed
+    batch, _ = queue.poll()
+    assert batch[1] == "Urgent"
+
+
+def test_low_priority_messages_are_dropped_first():
+    queue = make_queue(max_depth=2)
+    kept = queue.put("alice", "Keep", "")
+    dropped = queue.put("bob", "Drop", "", PRIORITY_LOW)
+    queue.put("carol", "Also keep", "")
+    assert dropped.cancelled() and not kept.cancelled()
+    assert queue.depth == 2
+    batch, _ = queue.poll(after_window())
+    assert batch[1] == "Keep (+1 messages dropped)"
+
+
+def test_rate_limit():
+    queue = make_queue()
+    for i in range(10):
+        queue.put(f"user{i}", "Hi", "")
+    later = after_window()
+    sent = [queue.poll(later)[0] for _ in range(10)]
+    # Only the burst can be sent at once
+    assert sum(batch is not None for batch in sent) == 5
+
+
+def test_towers_send_chat_immediately_by_default():
+    async def main():
+        tower = AsyncRingingRoomTower(TOWER_ID, run_version_check=False)
+        tower._socket_io_client = RecordingClient()
+        assert await tower.chat("alice", "Look to") is None
+        assert await tower.chat("alice", "Treble's going") is None
+        assert tower.metrics.queue_depths()["chat"] == 0
+        return tower._socket_io_client.messages
+
+    assert asyncio.run(main()) == ["Look to", "Treble's going"]
+
+
+def test_towers_can_queue_chat():
+    async def main():
+        tower = AsyncRingingRoomTower(TOWER_ID, run_version_check=False, queue_chat=True)
+        tower.CHAT_COALESCE_WINDOW = 0.05
+        tower._socket_io_client = RecordingClient()
+        first = await tower.chat("alice", "Look to")
+        second = await tower.chat("alice", "Treble's going")
+        # The messages are only queued, and are merged when they are sent
+        assert tower._socket_io_client.messages == []
+        assert tower.metrics.queue_depths()["chat"] == 2
+        await asyncio.wait_for(asyncio.gather(first, second), 1.0)
+        tower._stop_chat_sender()
+        return tower._socket_io_client.messages
+
+    assert asyncio.run(main()) == ["Look to | Treble's going"]
+
+
+def test_chat_against_server(server):
+    received = []
+    tower = RingingRoomTower(TOWER_ID, server.url)
+    tower.on_chat(lambda user, message: received.append((user, message)))
+    with tower:
+        tower.wait_loaded()
+        tower.chat("alice", "Hello")
+        tower.chat("alice", "again")
+        assert wait_until(lambda: len(received) == 2)
+    assert received == [("alice", "Hello"), ("alice", "again")]
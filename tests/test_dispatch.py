@@ -0,0 +1,93 @@
+""" Tests of `belltower.dispatch.CallbackDispatcher`. """
+
+import threading
+
+import pytest
+
+from belltower import RingingRoomTower, Bell, HANDSTROKE
+from belltower.dispatch import CallbackDispatcher, BELL_RING, ORDER_PER_TOWER, ORDER_PER_BELL
+
+from conftest import TOWER_ID, TIMEOUT, wait_until
+
+
+@pytest.fixture
+def dispatcher():
+    dispatcher = CallbackDispatcher()
+    yield dispatcher
+    dispatcher.shutdown()
+
+
+def test_slow_callbacks_only_block_their_own_lane(dispatcher):
+    release = threading.Event()
+    done = []
+
+    dispatcher.dispatch("tower a", "chat", [lambda: release.wait(TIMEOUT)])
+    dispatcher.dispatch("tower a", "chat", [lambda: done.append("a chat")])
+    # Rings, and other towers' chat, don't wait for the blocked chat callback
+    dispatcher.dispatch("tower a", BELL_RING, [done.append], "a ring")
+    dispatcher.dispatch("tower b", "chat", [done.append], "b chat")
+    assert wait_until(lambda: len(done) == 2)
+    assert sorted(done) == ["a ring", "b chat"]
+    assert dispatcher.queue_depth == 2
+
+    release.set()
+    assert wait_until(lambda: dispatcher.queue_depth == 0)
+    assert done[-1] == "a chat"
+    assert dispatcher._lanes == {}
+
+
+def test_lanes_keep_order(dispatcher):
+    order = []
+    for i in range(200):
+        dispatcher.dispatch("tower", BELL_RING, [order.append], i)
+    assert wait_until(lambda: len(order) == 200)
+    assert order == list(range(200))
+
+
+def test_order_per_tower():
+    # Every callback of a tower runs in order, whatever its type
+    dispatcher = CallbackDispatcher(ordering=ORDER_PER_TOWER)
+    order = []
+    for i in range(100):
+        event_type = BELL_RING if i % 3 else "size_change"
+        dispatcher.dispatch("tower", event_type, [order.append], i)
+    dispatcher.shutdown()
+    assert order == list(range(100))
+
+
+def test_order_per_bell():
+    dispatcher = CallbackDispatcher(ordering=ORDER_PER_BELL)
+    release = threading.Event()
+    done = []
+    dispatcher.dispatch("tower", BELL_RING, [lambda b: release.wait(TIMEOUT)], Bell.from_number(1))
+    dispatcher.dispatch("tower", BELL_RING, [done.append], Bell.from_number(1))
+    dispatcher.dispatch("tower", BELL_RING, [done.append], Bell.from_number(2))
+    assert wait_until(lambda: done == [Bell.from_number(2)])
+    release.set()
+    dispatcher.shutdown()
+    assert done == [Bell.from_number(2), Bell.from_number(1)]
+
+
+def test_exceptions_are_logged(dispatcher, caplog):
+    done = []
+
+    def broken():
+        raise ValueError("oops")
+
+    dispatcher.dispatch("tower", "call", [broken, lambda: done.append(1)])
+    assert wait_until(lambda: dispatcher.queue_depth == 0)
+    assert done == [1]
+    assert "raised an exception" in caplog.text
+    with pytest.raises(ValueError):
+        CallbackDispatcher(ordering="random")
+
+
+def test_tower_callbacks_run_on_dispatcher(server, dispatcher):
+    threads = []
+    tower = RingingRoomTower(TOWER_ID, server.url, dispatcher=dispatcher)
+    tower.on_bell_ring(lambda bell, stroke: threads.append(threading.current_thread().name))
+    with tower:
+        tower.wait_loaded()
+        tower.ring_bell(Bell.from_number(1), HANDSTROKE)
+        assert wait_until(lambda: threads)
+    assert threads[0].startswith("belltower-ring-callback")
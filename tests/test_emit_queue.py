@@ -0,0 +1,96 @@
+""" Tests of `belltower.emit_queue` and of towers which send signals through an emit queue. """
+
+import threading
+
+import pytest
+
+from belltower import RingingRoomTower, Bell, HANDSTROKE
+from belltower.emit_queue import EmitQueue, EmitQueueFullError, PRIORITY_RING
+
+from conftest import TOWER_ID, TIMEOUT, wait_until
+
+
+class GatedSender:
+    """ A `send` function which records each signal, but only once `gate` is set. """
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.sent = []
+
+    def __call__(self, event, data):
+        self.gate.wait(TIMEOUT)
+        if data == "fail":
+            raise ConnectionError("transport closed")
+        self.sent.append(event)
+
+
+def test_signals_are_sent_in_priority_order():
+    sender = GatedSender()
+    queue = EmitQueue(sender, max_size=10)
+    queue.start()
+    try:
+        # The sender thread takes the first signal straight away, and blocks on the gate
+        first = queue.put("c_msg_sent", None)
+        assert wait_until(lambda: queue.depth == 0)
+        futures = [queue.put(event, None) for event in
+                   ["c_msg_sent", "c_size_change", "c_call", "c_bell_rung", "c_bell_rung"]]
+        futures.append(queue.put("c_custom", None, priority=PRIORITY_RING))
+        assert queue.depth == 6
+        sender.gate.set()
+        for future in [first] + futures:
+            assert future.result(TIMEOUT) is None
+    finally:
+        queue.stop()
+    assert sender.sent == ["c_msg_sent", "c_bell_rung", "c_bell_rung", "c_custom", "c_call",
+                           "c_size_change", "c_msg_sent"]
+
+
+def test_full_queue():
+    sender = GatedSender()
+    queue = EmitQueue(sender, max_size=2)
+    # Without the sender thread running, nothing leaves the queue
+    queue.put("c_call", None)
+    queue.put("c_call", None)
+    with pytest.raises(EmitQueueFullError):
+        queue.put("c_bell_rung", None)
+
+    queue.block = True
+    sender.gate.set()
+    threading.Timer(0.05, queue.start).start()
+    # Blocks until the sender has made space
+    queue.put("c_bell_rung", None).result(TIMEOUT)
+    queue.stop()
+    assert sender.sent == ["c_call", "c_call", "c_bell_rung"]
+
+
+def test_failures_and_stop():
+    sender = GatedSender()
+    queue = EmitQueue(sender)
+    queue.start()
+    failed = queue.put("c_call", "fail")
+    sender.gate.set()
+    with pytest.raises(ConnectionError):
+        failed.result(TIMEOUT)
+
+    sender.gate.clear()
+    blocked = queue.put("c_call", None)
+    assert wait_until(lambda: queue.depth == 0)
+    leftover = queue.put("c_call", None)
+    queue.stop(timeout=0.05)
+    assert leftover.cancelled()
+    sender.gate.set()
+    assert blocked.result(TIMEOUT) is None
+
+
+def test_tower_with_emit_queue(server):
+    rings = []
+    tower = RingingRoomTower(TOWER_ID, server.url, emit_queue_size=100)
+    tower.on_bell_ring(lambda bell, stroke: rings.append(bell))
+    with tower:
+        tower.wait_loaded()
+        assert tower.ring_bell(Bell.from_number(1), HANDSTROKE)
+        tower.set_size(6).result(TIMEOUT)
+        assert tower.call_bob().result(TIMEOUT) is None
+        assert wait_until(lambda: tower.number_of_bells == 6)
+    assert rings == [Bell.from_number(1)]
+    assert tower._emit_queue is None
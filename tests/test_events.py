@@ -0,0 +1,75 @@
+""" Tests of `belltower.events`, and the event subscriptions of towers. """
+
+import logging
+
+import pytest
+
+from belltower import RingingRoomTower, Bell, HAND_BELLS
+from belltower import events
+from belltower.events import Event, EventDecodeError, decode_event
+
+from conftest import TOWER_ID
+
+
+def test_decode_events():
+    assert decode_event("s_bell_rung", {"who_rang": 3, "global_bell_state": [True, False]}) \
+        == events.BellRung(Bell.from_number(3), [True, False])
+    assert decode_event("s_size_change", {"size": "6"}) == events.SizeChange(6)
+    assert decode_event("s_audio_change", {"new_audio": "Hand"}) == events.AudioChange(HAND_BELLS)
+    assert decode_event("s_set_userlist", {"user_list": [{"user_id": 4, "username": "Alice"}]}) \
+        == events.UserList([events.UserEntered(4, "Alice")])
+    # An assignment to user 0 is an unassignment
+    assert decode_event("s_assign_user", {"bell": 2, "user": 0}) \
+        == events.AssignUser(Bell.from_number(2), None)
+    assert repr(events.ChatMessage("Alice", "Hi")) == "ChatMessage(user_name='Alice', message='Hi')"
+    assert events.CallMade("Bob") != events.ChatMessage("Bob", "")
+
+
+@pytest.mark.parametrize("signal, data", [
+    ("s_bell_rung", {"global_bell_state": []}),
+    ("s_size_change", {"size": "six"}),
+    ("s_audio_change", {"new_audio": "Cowbells"}),
+    ("s_assign_user", {"bell": 2, "user": "Alice"}),
+    ("s_set_userlist", {"user_list": None}),
+])
+def test_malformed_events(signal, data):
+    with pytest.raises(EventDecodeError):
+        decode_event(signal, data)
+
+
+def test_events_are_abstract_and_slotted():
+    with pytest.raises(TypeError):
+        Event() # pylint: disable=abstract-class-instantiated
+
+    class NoDecoder(Event):
+        __slots__ = ()
+
+    with pytest.raises(TypeError):
+        NoDecoder() # pylint: disable=abstract-class-instantiated
+    with pytest.raises(AttributeError):
+        events.CallMade("Bob").extra = 1 # pylint: disable=assigning-non-slot
+
+
+def test_subscriptions():
+    tower = RingingRoomTower.offline(TOWER_ID)
+    calls = []
+    every_event = []
+    tower.on_event(events.CallMade)(lambda event, timestamp: calls.append((event.call, timestamp)))
+    tower.on_event()(lambda event, timestamp: every_event.append(type(event)))
+
+    tower._handle_signal("s_size_change", {"size": 4}, 1.0)
+    tower._handle_signal("s_call", {"call": "Bob"}, 2.0)
+    assert calls == [("Bob", 2.0)]
+    assert every_event == [events.SizeChange, events.CallMade]
+
+
+def test_malformed_signals_are_dropped(caplog):
+    tower = RingingRoomTower.offline(TOWER_ID)
+    tower._handle_signal("s_size_change", {"size": 4})
+    every_event = []
+    tower.on_event()(lambda event, timestamp: every_event.append(event))
+    with caplog.at_level(logging.WARNING):
+        tower._handle_signal("s_assign_user", {"bell": 1, "user": "Alice"})
+    assert "Invalid 's_assign_user' signal" in caplog.text
+    assert every_event == []
+    assert tower.get_assignment(Bell.from_number(1)) is None
@@ -0,0 +1,59 @@
+""" Tests of the load generator in `belltower.loadgen`. """
+
+import pytest
+
+from belltower.loadgen import (ClientResult, LoadReport, bell_gap_for_blow_rate, run_load,
+                               LATENCY_BUCKETS)
+from belltower.metrics import Histogram
+
+from conftest import TOWER_ID
+
+
+def test_bell_gap_for_blow_rate():
+    # Without a handstroke gap, the gap is just the inverse of the blow rate
+    assert bell_gap_for_blow_rate(10.0, 8, handstroke_gap=0) == pytest.approx(0.1)
+    # A whole pull of 8 bells with a handstroke gap of 1 blow is 17 gaps long, and rings 16 blows
+    gap = bell_gap_for_blow_rate(10.0, 8)
+    assert 16 / (17 * gap) == pytest.approx(10.0)
+
+
+def test_histograms_merge():
+    a, b = Histogram((1.0, 2.0)), Histogram((1.0, 2.0))
+    a.observe(0.5)
+    b.observe(1.5)
+    b.observe(1.5)
+    a.merge(b)
+    assert (a.count, a.sum, a.counts) == (3, 3.5, [1, 2, 0])
+    with pytest.raises(ValueError):
+        a.merge(Histogram((1.0,)))
+
+
+def test_report():
+    results = [ClientResult(1, 0), ClientResult(1, 1), ClientResult(2, 0)]
+    for result in results:
+        result.rings_sent = 10
+        for _ in range(9):
+            result.latency.observe(0.01)
+    results[2].error = "TimeoutError: "
+    report = LoadReport(results, 2.0)
+    assert report.latency.buckets == LATENCY_BUCKETS
+    assert (report.rings_sent, report.rings_echoed) == (30, 27)
+    assert report.failed_clients == [results[2]]
+    lines = str(report).splitlines()
+    assert lines[:3] == [
+        "3 clients in 2 towers, 1 failed",
+        "30 rings sent in 2.0s (15.0 blows/s), 3 not echoed",
+        "Emit-to-echo latency: mean 10.00ms",
+    ]
+    assert lines[-1] == "Tower 2 client 0 failed: TimeoutError: "
+
+
+def test_run_load_against_server(server):
+    report = run_load(server.url, [TOWER_ID], clients=2, number_of_bells=4, blow_rate=40.0,
+                      duration=0.5, processes=1)
+    assert report.failed_clients == []
+    assert len(report.results) == 2
+    # Every blow is rung by one of the clients, and echoed back to it
+    assert report.rings_sent == pytest.approx(20, abs=2)
+    assert report.rings_echoed == report.rings_sent
+    assert all(result.rings_sent > 0 for result in report.results)
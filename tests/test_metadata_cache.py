@@ -0,0 +1,104 @@
+""" Tests of `belltower.metadata_cache.MetadataCache`. """
+
+import os
+
+import pytest
+
+import belltower.metadata_cache
+import belltower.ringing_room
+from belltower import RingingRoomTower, TOWER_BELLS, HAND_BELLS
+from belltower.metadata_cache import MetadataCache, TowerMetadata
+
+from conftest import TOWER_ID, wait_until
+
+
+def metadata(server_ip="https://server.example/", **kwargs):
+    return TowerMetadata(server_ip, "Test Tower", TOWER_BELLS, "1.0", **kwargs)
+
+
+def test_get_put_and_invalidate():
+    cache = MetadataCache()
+    cache.put("ringingroom.com", 1, metadata())
+    # URLs are fixed in the same way as when fetching the tower page
+    assert cache.get("https://ringingroom.com", 1).server_ip == "https://server.example/"
+    assert cache.get("ringingroom.com", 2) is None
+    cache.invalidate("ringingroom.com", 1)
+    assert cache.get("ringingroom.com", 1) is None
+    assert len(cache) == 0
+
+
+def test_entries_expire():
+    cache = MetadataCache(ttl=10)
+    cache.put("ringingroom.com", 1, metadata(fetch_time=0))
+    assert cache.get("ringingroom.com", 1) is None
+
+
+def test_saves_are_debounced(tmp_path):
+    path = str(tmp_path / "cache.json")
+    with MetadataCache(path=path, save_delay=60) as cache:
+        for tower_id in range(100):
+            cache.put("ringingroom.com", tower_id, metadata())
+        assert not os.path.exists(path)
+    assert len(MetadataCache(path=path)) == 100
+
+    cache = MetadataCache(path=path, save_delay=0.01)
+    cache.clear()
+    assert wait_until(lambda: len(MetadataCache(path=path)) == 0)
+    # Only the cache file (and its lock) are left behind
+    assert sorted(os.listdir(tmp_path)) == ["cache.json", "cache.json.lock"]
+
+
+def test_saves_merge_with_other_processes(tmp_path):
+    path = str(tmp_path / "cache.json")
+    with MetadataCache(path=path) as first:
+        first.put("ringingroom.com", 1, metadata())
+        first.put("ringingroom.com", 2, metadata())
+    second = MetadataCache(path=path)
+    third = MetadataCache(path=path)
+
+    second.put("ringingroom.com", 3, metadata())
+    second.invalidate("ringingroom.com", 1)
+    second.flush()
+    third.put("ringingroom.com", 4, metadata(server_ip="https://new.example/"))
+    third.flush()
+
+    reloaded = MetadataCache(path=path)
+    assert [tower_id for _, tower_id in sorted(reloaded._entries)] == [2, 3, 4]
+    assert reloaded.get("ringingroom.com", 4).server_ip == "https://new.example/"
+
+
+def test_unreadable_files_are_ignored(tmp_path, caplog):
+    path = tmp_path / "cache.json"
+    path.write_text("not json")
+    assert len(MetadataCache(path=str(path))) == 0
+    assert "Ignoring unreadable metadata cache" in caplog.text
+
+
+def test_towers_use_the_cache(server, monkeypatch):
+    cache = MetadataCache()
+    RingingRoomTower(TOWER_ID, server.url, metadata_cache=cache)
+    assert cache.get(server.url, TOWER_ID).rr_version is not None
+
+    def fail(*args):
+        raise AssertionError("The tower page was fetched")
+
+    monkeypatch.setattr(belltower.ringing_room, "parse_page", fail)
+    monkeypatch.setattr(RingingRoomTower, "check_version", fail)
+    tower = RingingRoomTower(TOWER_ID, server.url, metadata_cache=cache)
+    assert tower.tower_name == "Test Tower"
+    with tower:
+        tower.wait_loaded()
+        assert tower.number_of_bells == 8
+
+
+def test_stale_servers_are_refetched(server):
+    cache = MetadataCache()
+    # Nothing listens on port 1, so the cached server can't be connected to
+    cache.put(server.url, TOWER_ID, TowerMetadata("http://127.0.0.1:1", "Old Name", HAND_BELLS,
+                                                  "1.0"))
+    tower = RingingRoomTower(TOWER_ID, server.url, metadata_cache=cache)
+    assert tower.tower_name == "Old Name"
+    with tower:
+        tower.wait_loaded()
+        assert tower.tower_name == "Test Tower"
+    assert cache.get(server.url, TOWER_ID).server_ip == tower.server_url
@@ -0,0 +1,73 @@
+""" Tests of `belltower.method`. """
+
+import pytest
+
+from belltower import call, Bell
+
+np = pytest.importorskip("numpy")
+# pylint: disable=wrong-import-position
+from belltower.method import (Method, PlaceNotationError, compile_place_notation, to_bells,
+                              iter_bells)
+
+PLAIN_BOB_MINOR = "x16x16x16,12"
+
+
+def row(row_str):
+    return [Bell.from_str(c).index for c in row_str]
+
+
+def test_compile_place_notation():
+    assert compile_place_notation("x14", 4).tolist() == [[1, 0, 3, 2], [0, 2, 1, 3]]
+    # Implied places at the ends of the row are added
+    assert compile_place_notation("1", 6).tolist() == [[0, 2, 1, 4, 3, 5]]
+    assert compile_place_notation("4", 6).tolist() == [[0, 2, 1, 3, 5, 4]]
+    assert compile_place_notation("5", 6).tolist() == [[1, 0, 3, 2, 4, 5]]
+    assert compile_place_notation("3", 5).tolist() == [[1, 0, 2, 4, 3]]
+    # Palindromic blocks
+    assert len(compile_place_notation(PLAIN_BOB_MINOR, 6)) == 12
+    assert (compile_place_notation("&x1,+2", 4).tolist()
+            == compile_place_notation("x1x2", 4).tolist())
+    # The arrays are cached and read-only
+    assert compile_place_notation("x14", 4) is compile_place_notation("x14", 4)
+    assert not compile_place_notation("x14", 4).flags.writeable
+
+
+@pytest.mark.parametrize("place_notation, stage",
+                         [("x", 5), ("7", 6), ("1q", 6), ("13", 6), ("", 6)])
+def test_invalid_place_notation(place_notation, stage):
+    with pytest.raises(PlaceNotationError):
+        compile_place_notation(place_notation, stage)
+
+
+def test_plain_course():
+    method = Method(PLAIN_BOB_MINOR, 6, "Plain Bob Minor")
+    assert method.lead_length == 12
+    assert method.leads_in_plain_course() == 5
+    course = method.plain_course()
+    assert course.shape == (61, 6)
+    assert course[0].tolist() == course[-1].tolist() == row("123456")
+    assert course[1].tolist() == row("214365")
+    assert course[12].tolist() == row("135264")
+    # Every row in a plain course of Plain Bob Minor is different
+    assert len({tuple(r) for r in course[:-1].tolist()}) == 60
+
+
+def test_calls():
+    method = Method(PLAIN_BOB_MINOR, 6)
+    assert method.lead(call_name=call.BOB)[-1].tolist() == row("123564")
+    assert method.lead(call_name=call.SINGLE)[-1].tolist() == row("132564")
+    # Leads can start from any lead head
+    assert method.lead(row("123564"))[0].tolist() == row("123564")
+    # Three bobs in a row come back to rounds
+    touch = method.touch([call.BOB] * 3)
+    assert touch.shape == (37, 6)
+    assert touch[-1].tolist() == row("123456")
+    with pytest.raises(ValueError):
+        method.lead(call_name="Not a call")
+
+
+def test_to_bells():
+    rows = Method(PLAIN_BOB_MINOR, 6).lead()[:2]
+    expected = [tuple(Bell.from_str(c) for c in r) for r in ("123456", "214365")]
+    assert to_bells(rows) == expected
+    assert list(iter_bells(rows)) == expected
@@ -0,0 +1,111 @@
+""" Tests of `belltower.metrics`. """
+
+import urllib.request
+
+import pytest
+
+import belltower.metrics
+from belltower import RingingRoomTower, Bell, HANDSTROKE
+from belltower.metrics import Histogram, TowerMetrics, PrometheusExporter, prometheus_text
+
+from conftest import TOWER_ID, wait_until
+
+
+class FakeClock:
+    """ Stands in for the `time` module, with a clock that only moves when told to. """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(belltower.metrics, "time", clock)
+    return clock
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(1, 2, 5))
+    for value in (0.5, 1.5, 1.5, 4, 10):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.mean == pytest.approx(3.5)
+    assert histogram.percentile(0.5) == 2
+    assert histogram.percentile(1.0) == float("inf")
+
+
+def test_echo_round_trip(clock):
+    metrics = TowerMetrics(echo_timeout=10)
+    metrics.record_ring_sent(0, True)
+    clock.now += 0.02
+    metrics.record_ring_received(0, True)
+    assert metrics.echo_round_trip.count == 1
+    assert metrics.echo_round_trip.sum == pytest.approx(0.02)
+    # Rings of bells we didn't ring aren't round trips
+    metrics.record_ring_received(1, True)
+    assert metrics.echo_round_trip.count == 1
+
+
+def test_dropped_rings_are_forgotten(clock):
+    metrics = TowerMetrics(echo_timeout=10)
+    # Someone else rang the bell at the other stroke
+    metrics.record_ring_sent(0, True)
+    metrics.record_ring_received(0, False)
+    metrics.record_ring_received(0, True)
+    # The echo took too long
+    metrics.record_ring_sent(1, True)
+    clock.now += 11
+    metrics.record_ring_received(1, True)
+    # The connection was lost
+    metrics.record_ring_sent(2, True)
+    metrics.record_connect()
+    metrics.record_connect()
+    metrics.record_ring_received(2, True)
+    assert metrics.echo_round_trip.count == 0
+    assert metrics.reconnects == 1
+
+
+def test_signal_rates_are_windowed(clock):
+    metrics = TowerMetrics(rate_window=10)
+    clock.now += 100
+    for _ in range(50):
+        metrics.record_signal("s_bell_rung")
+    clock.now += 5
+    for _ in range(20):
+        metrics.record_signal("s_bell_rung")
+        metrics.record_signal("s_call")
+    assert metrics.signal_rates() == {"s_bell_rung": 7.0, "s_call": 2.0}
+    # Once the first burst leaves the window, it no longer counts towards the rate
+    clock.now += 8
+    assert metrics.signal_rates() == {"s_bell_rung": 2.0, "s_call": 2.0}
+    assert metrics.signals_received["s_bell_rung"] == 70
+    clock.now += 20
+    assert metrics.signal_rates() == {}
+
+
+def test_prometheus_labels_are_escaped():
+    tower = RingingRoomTower.offline(TOWER_ID)
+    tower._url = 'http://a"b\\c\nd/'
+    tower.metrics.queue_depth_gauges["odd \"queue\""] = lambda: 3
+    text = prometheus_text([tower])
+    assert 'server="http://a\\"b\\\\c\\nd/"' in text
+    assert 'queue="odd \\"queue\\""} 3' in text
+    # Every sample is on its own line
+    assert all(line.startswith(("#", "belltower_")) for line in text.splitlines())
+
+
+def test_exporter_serves_tower_metrics(server):
+    tower = RingingRoomTower(TOWER_ID, server.url)
+    with tower, PrometheusExporter([tower], port=0) as exporter:
+        tower.wait_loaded()
+        tower.ring_bell(Bell.from_number(1), HANDSTROKE)
+        assert wait_until(lambda: tower.metrics.echo_round_trip.count == 1)
+        with urllib.request.urlopen(exporter.url) as response:
+            text = response.read().decode("utf-8")
+    assert f'belltower_echo_round_trip_seconds_count{{tower_id="{TOWER_ID}"' in text
+    assert 'event="s_bell_rung"} 1' in text
+    assert tower.metrics.queue_depths() == {"emit": 0, "callbacks": 0, "chat": 0}
@@ -0,0 +1,73 @@
+""" Tests of `belltower.proving`. """
+
+import pytest
+
+from belltower import call, Bell, HANDSTROKE, BACKSTROKE
+from belltower.rows import RowAssembler
+
+np = pytest.importorskip("numpy")
+# pylint: disable=wrong-import-position
+from belltower.method import Method
+from belltower.proving import Prover, pack_row, pack_rows, false_pairs, first_false_pair, is_true
+
+PLAIN_BOB_MINOR = Method("x16x16x16,12", 6)
+
+
+def test_pack_rows():
+    rows = [[0, 1, 2, 3], [1, 0, 3, 2]]
+    assert pack_rows(rows).tolist() == [pack_row(r) for r in rows]
+    assert pack_row([Bell.from_number(2), Bell.from_number(1)]) == pack_row([1, 0])
+    assert pack_row([15] * 16) == 2 ** 64 - 1
+    with pytest.raises(ValueError):
+        pack_rows([[0] * 17])
+
+
+def test_prove_touches():
+    # The final lead head of a touch which comes round repeats its first row
+    course = PLAIN_BOB_MINOR.plain_course()
+    assert is_true(course[:-1])
+    assert not is_true(course)
+    assert false_pairs(course) == [(0, 60)]
+
+    # Two plain courses are false against each other
+    false_touch = PLAIN_BOB_MINOR.touch([None] * 10)[:-1]
+    pairs = false_pairs(false_touch)
+    assert len(pairs) == 60
+    assert pairs[:2] == [(0, 60), (1, 61)]
+    assert first_false_pair(false_touch) == (0, 60)
+    assert first_false_pair(PLAIN_BOB_MINOR.touch([call.BOB] * 3)[:-1]) is None
+
+
+def test_prover():
+    found = []
+    prover = Prover()
+    prover.on_false(lambda first, second, row: found.append((first, second, row)))
+    rows = PLAIN_BOB_MINOR.plain_course()
+    assert prover.add_rows(rows[:30]) == []
+    for r in rows[30:].tolist():
+        prover.add_row(r)
+    assert prover.number_of_rows == 61
+    assert prover.false_pairs == [(0, 60)]
+    assert found == [(0, 60, (0, 1, 2, 3, 4, 5))]
+    assert not prover.is_true
+
+    prover.reset()
+    assert prover.is_true
+    assert prover.add_rows(rows[:2]) == []
+    assert prover.add_rows(rows[:1]) == [(0, 2)]
+    assert prover.first_false_pair == (0, 2)
+
+
+def test_attached_to_row_assembler():
+    rounds = [Bell.from_number(n) for n in range(1, 5)]
+    assembler = RowAssembler(number_of_bells=4)
+    prover = Prover()
+    prover.attach(assembler)
+    for stroke in (HANDSTROKE, BACKSTROKE):
+        for bell in rounds:
+            assembler.add_blow(bell, stroke)
+    assert prover.false_pairs == [(0, 1)]
+    # Setting the bells at hand starts a new touch
+    assembler.reset(4)
+    assert prover.number_of_rows == 0
+    assert prover.is_true
@@ -0,0 +1,122 @@
+""" Tests of recording sessions and reading them back (see `belltower.recording`). """
+
+import os
+
+import pytest
+
+from belltower import RingingRoomTower, Bell, HANDSTROKE, HAND_BELLS
+from belltower.recording import SessionRecorder, SessionReader
+
+from conftest import TOWER_ID
+
+SIGNALS = [
+    ("s_size_change", {"size": 4}),
+    ("s_user_entered", {"user_id": 5, "username": "Alice"}),
+    ("s_assign_user", {"bell": 2, "user": 5}),
+    ("s_call", {"call": "Look to"}),
+    ("s_msg_sent", {"user": "Alice", "msg": "Hello!"}),
+    ("s_msg_sent", {"user": "Bob", "msg": "Hi", "email": "bob@example.com",
+                    "time": "2021-01-01T12:00:00.000Z"}),
+    ("s_wheatley_setting", {"settings": {"sensitivity": 0.6}}),
+]
+
+
+def rounds(number_of_bells, number_of_rows):
+    """ Generates the 's_bell_rung' signals of rounds, starting with the bells at handstroke. """
+    bell_state = [True] * number_of_bells
+    for _ in range(number_of_rows):
+        for place in range(number_of_bells):
+            bell_state[place] = not bell_state[place]
+            yield "s_bell_rung", {"who_rang": place + 1, "global_bell_state": list(bell_state)}
+
+
+def record(path, signals):
+    tower = RingingRoomTower.offline(TOWER_ID, "Test Tower", HAND_BELLS)
+    with SessionRecorder(tower, str(path)) as recorder:
+        for signal, data in signals:
+            if signal in tower._signal_handlers:
+                tower._handle_signal(signal, data)
+            else:
+                recorder.record(signal, data)
+
+
+def read(path):
+    with SessionReader(str(path)) as reader:
+        return [(signal, data) for _, signal, data in reader.signals()]
+
+
+def test_round_trip(tmp_path):
+    signals = SIGNALS + list(rounds(4, 2))
+    record(tmp_path / "session.rec", signals)
+    with SessionReader(str(tmp_path / "session.rec")) as reader:
+        assert (reader.tower_id, reader.tower_name) == (TOWER_ID, "Test Tower")
+        assert reader.bell_type == HAND_BELLS
+        recorded = list(reader.signals())
+    assert [(signal, data) for _, signal, data in recorded] == signals
+    times = [seconds for seconds, _, _ in recorded]
+    assert times == sorted(times)
+
+
+def test_unusual_payloads_are_kept(tmp_path):
+    signals = [
+        ("s_bell_rung", {"who_rang": 1, "global_bell_state": []}),
+        ("s_user_entered", {"user_id": 2 ** 40, "username": "Big"}),
+        ("s_user_entered", {"user_id": 6, "username": 1234}),
+        ("s_msg_sent", {"user": None, "msg": "anonymous"}),
+        ("s_call", {}),
+    ]
+    path = tmp_path / "session.rec"
+    tower = RingingRoomTower.offline(TOWER_ID)
+    with SessionRecorder(tower, str(path)) as recorder:
+        for signal, data in signals:
+            recorder.record(signal, data)
+        # Payloads that can't be stored at all are skipped
+        recorder.record("s_call", {"call": object()})
+    assert read(path) == signals
+
+
+def test_listeners_are_given_timestamps(tmp_path):
+    path = tmp_path / "session.rec"
+    tower = RingingRoomTower.offline(TOWER_ID)
+    with SessionRecorder(tower, str(path)) as recorder:
+        start = recorder._start_time
+        tower._handle_signal("s_size_change", {"size": 6}, start + 1.5)
+        tower._handle_signal("s_size_change", {"size": 8}, start + 2.25)
+    with SessionReader(str(path)) as reader:
+        assert [seconds for seconds, _, _ in reader.signals()] == [1.5, 2.25]
+
+
+def test_truncated_recording_stops_at_last_signal(tmp_path, caplog):
+    path = tmp_path / "session.rec"
+    signals = SIGNALS + list(rounds(4, 1))
+    record(path, signals)
+    size = os.path.getsize(path)
+    # Cut the final ring in half
+    with open(path, "r+b") as f:
+        f.truncate(size - 3)
+    assert read(path) == signals[:-1]
+    assert "truncated" in caplog.text
+    # Cut the JSON payload of the Wheatley setting
+    end_of_messages = size - 4 * 8 - len(b'{"settings": {"sensitivity": 0.6}}') + 5
+    with open(path, "r+b") as f:
+        f.truncate(end_of_messages)
+    assert read(path) == SIGNALS[:-1]
+
+    with open(path, "r+b") as f:
+        f.truncate(10)
+    with pytest.raises(ValueError):
+        SessionReader(str(path))
+
+
+def test_replay(tmp_path):
+    record(tmp_path / "session.rec", SIGNALS + list(rounds(4, 4)))
+    with SessionReader(str(tmp_path / "session.rec")) as reader:
+        tower = reader.offline_tower()
+        rings = []
+        tower.on_bell_ring(lambda bell, stroke: rings.append((bell, stroke)))
+        reader.replay(tower, speed=None)
+    assert tower.number_of_bells == 4
+    assert tower.user_name_from_id(5) == "Alice"
+    assert tower.get_assignment(Bell.from_number(2)) == 5
+    assert len(rings) == 16
+    assert rings[:2] == [(Bell.from_number(1), HANDSTROKE), (Bell.from_number(2), HANDSTROKE)]
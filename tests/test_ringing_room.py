@@ -0,0 +1,296 @@
+import threading
+
+import pytest
+
+import belltower.ringing_room
+from belltower import RingingRoomTower, Bell, HANDSTROKE, BACKSTROKE, TOWER_BELLS, call
+from belltower.page_parsing import TowerNotFoundError
+from belltower.ringing_room import SocketIOClientError, OUTAGE_QUEUE
+
+from conftest import TOWER_ID, TIMEOUT, wait_until
+
+
+class RecordingClient:
+    """ Stands in for a connected `socketio.Client`, recording everything that is emitted. """
+
+    def __init__(self):
+        self.connected = True
+        self.emitted = []
+
+    def emit(self, event, data):
+        self.emitted.append((event, data))
+
+
+@pytest.fixture
+def tower(monkeypatch):
+    monkeypatch.setattr(
+        belltower.ringing_room, "parse_page",
+        lambda tower_id, url: ("http://localhost/", "Test Tower", TOWER_BELLS)
+    )
+    tower = RingingRoomTower(TOWER_ID, run_version_check=False)
+    tower._socket_io_client = RecordingClient()
+    tower._handle_signal("s_global_state", {"global_bell_state": [True] * 6})
+    return tower
+
+
+def test_handlers_update_state(tower):
+    rings = []
+    tower.on_bell_ring(lambda bell, stroke: rings.append((bell, stroke)))
+
+    tower._handle_signal("s_bell_rung", {"global_bell_state": [False] + [True] * 5, "who_rang": 1})
+    tower._handle_signal("s_set_userlist", {"user_list": [{"user_id": 4, "username": "Alice"}]})
+    tower._handle_signal("s_assign_user", {"bell": 1, "user": 4})
+
+    assert rings == [(Bell.from_number(1), HANDSTROKE)]
+    assert tower.get_stroke(Bell.from_number(1)) == BACKSTROKE
+    assert tower.all_users == {4: "Alice"}
+    assert tower.get_assignment(Bell.from_number(1)) == 4
+
+
+def test_actions_emit(tower):
+    assert tower.ring_bell(Bell.from_number(2), HANDSTROKE)
+    assert not tower.ring_bell(Bell.from_number(2), BACKSTROKE)
+    tower.call_bob()
+    assert tower._socket_io_client.emitted[0] == (
+        "c_bell_rung", {"bell": 2, "stroke": True, "tower_id": TOWER_ID}
+    )
+    assert tower._socket_io_client.emitted[1] == ("c_call", {"call": "Bob", "tower_id": TOWER_ID})
+
+
+def test_version_check(tower):
+    tower._check_version_response('{"socketio-version": "1.0"}')
+    with pytest.raises(belltower.ringing_room.InvalidRRVersionError):
+        tower._check_version_response('{"socketio-version": "2.0"}')
+
+
+def test_emit_without_connection_fails(tower):
+    tower._socket_io_client.connected = False
+    with pytest.raises(SocketIOClientError):
+        tower.set_at_hand()
+
+
+def test_bell_state_bitmask(tower):
+    rings = []
+    tower.on_bell_ring(lambda bell, stroke: rings.append((bell.number, stroke)))
+
+    tower._handle_signal("s_bell_rung",
+                         {"global_bell_state": [True, False] + [True] * 4, "who_rang": 2})
+    tower._handle_signal("s_bell_rung", {"global_bell_state": [True] * 6, "who_rang": 2})
+    assert rings == [(2, HANDSTROKE), (2, BACKSTROKE)]
+    assert [tower.get_stroke(Bell.from_index(i)) for i in range(6)] == [HANDSTROKE] * 6
+
+    # A ring with a different size overwrites the whole state
+    tower._handle_signal("s_bell_rung", {"global_bell_state": [False] * 8, "who_rang": 8})
+    assert tower.number_of_bells == 8
+    assert tower.get_stroke(Bell.from_number(1)) == BACKSTROKE
+    assert rings[-1] == (8, HANDSTROKE)
+
+    # Bells outside the tower are ignored
+    tower._handle_signal("s_bell_rung", {"global_bell_state": [False] * 8, "who_rang": 12})
+    assert len(rings) == 3
+    assert tower.get_stroke(Bell.from_number(12)) is None
+
+    tower._handle_signal("s_size_change", {"size": 4})
+    assert tower.number_of_bells == 4
+    assert all(tower.get_stroke(Bell.from_index(i)) == HANDSTROKE for i in range(4))
+
+
+def test_filtered_subscriptions(tower):
+    rings = []
+    tower.on_bell_ring(lambda bell, stroke: rings.append(("all", bell.number)))
+    tower.on_bell_ring(bells=[Bell.from_number(2)])(
+        lambda bell, stroke: rings.append(("2", bell.number))
+    )
+
+    @tower.on_bell_ring(bells=[Bell.from_number(1), Bell.from_number(2)], stroke=BACKSTROKE)
+    def on_back(bell, stroke):
+        rings.append(("back", bell.number))
+
+    tower._handle_signal("s_bell_rung", {"global_bell_state": [False] + [True] * 5, "who_rang": 1})
+    tower._handle_signal("s_bell_rung", {"global_bell_state": [True] * 6, "who_rang": 1})
+    tower._handle_signal("s_bell_rung",
+                         {"global_bell_state": [True, False] + [True] * 4, "who_rang": 2})
+    assert rings == [("all", 1), ("all", 1), ("back", 1), ("all", 2), ("2", 2)]
+
+    entered = []
+    tower.on_user_enter(lambda user_id, name: entered.append(("all", name)))
+    tower.on_user_enter(user_id=5)(lambda user_id, name: entered.append(("5", name)))
+    left = []
+    tower.on_user_leave(user_id=5)(lambda user_id, name: left.append(name))
+    tower._handle_signal("s_user_entered", {"user_id": 4, "username": "Alice"})
+    tower._handle_signal("s_user_entered", {"user_id": 5, "username": "Bob"})
+    tower._handle_signal("s_user_left", {"user_id": 4, "username": "Alice"})
+    tower._handle_signal("s_user_left", {"user_id": 5, "username": "Bob"})
+    assert entered == [("all", "Alice"), ("all", "Bob"), ("5", "Bob")]
+    assert left == ["Bob"]
+
+
+def test_wait_for_times_out(tower):
+    assert tower.wait_for(lambda: tower.number_of_bells == 6, timeout=0)
+    assert not tower.wait_for_size(10, timeout=0.05)
+    assert not tower.wait_for_call(call.BOB, timeout=0.05)
+
+
+# ===== AGAINST A FAKE SERVER =====
+
+def test_ring_is_echoed(server):
+    tower = RingingRoomTower(TOWER_ID, server.url)
+    rings = []
+    tower.on_bell_ring(lambda bell, stroke: rings.append((bell, stroke)))
+    with tower:
+        tower.wait_loaded()
+        assert tower.number_of_bells == 8
+        assert tower.tower_name == "Test Tower"
+        assert tower.ring_bell(Bell.from_number(3), HANDSTROKE)
+        assert wait_until(lambda: len(rings) == 1)
+        assert rings == [(Bell.from_number(3), HANDSTROKE)]
+        assert tower.get_stroke(Bell.from_number(3)) == BACKSTROKE
+        assert server.get_tower(TOWER_ID).bell_state[2] is False
+
+
+def test_ring_at_wrong_stroke_is_refused(server):
+    with RingingRoomTower(TOWER_ID, server.url) as tower:
+        tower.wait_loaded()
+        assert not tower.ring_bell(Bell.from_number(1), BACKSTROKE)
+        assert server.get_tower(TOWER_ID).bell_state == [True] * 8
+
+
+def test_size_and_calls_round_trip(server):
+    calls = []
+    tower = RingingRoomTower(TOWER_ID, server.url)
+    tower.on_call(call.LOOK_TO)(lambda: calls.append(call.LOOK_TO))
+    with tower:
+        tower.wait_loaded()
+        tower.set_size(6)
+        assert wait_until(lambda: tower.number_of_bells == 6)
+        tower.call_look_to()
+        assert wait_until(lambda: calls == [call.LOOK_TO])
+
+
+def test_signals_from_server_are_handled(server):
+    left = []
+    tower = RingingRoomTower(TOWER_ID, server.url)
+    tower.on_user_leave(lambda user_id, user_name: left.append((user_id, user_name)))
+    with tower:
+        tower.wait_loaded()
+        server.add_user(TOWER_ID, 42, "Alice")
+        assert wait_until(lambda: tower.user_name_from_id(42) == "Alice")
+        server.remove_user(TOWER_ID, 42)
+        assert wait_until(lambda: left == [(42, "Alice")])
+
+
+def test_replay(server):
+    rings = []
+    tower = RingingRoomTower(TOWER_ID, server.url)
+    tower.on_bell_ring(lambda bell, stroke: rings.append(bell.number))
+    events = [
+        (0.001, "s_bell_rung", {"global_bell_state": [i > b for i in range(8)], "who_rang": b + 1})
+        for b in range(8)
+    ]
+    with tower:
+        tower.wait_loaded()
+        send_times = server.replay(TOWER_ID, events, speed=None).result(TIMEOUT)
+        assert len(send_times) == 8
+        assert wait_until(lambda: len(rings) == 8)
+    assert rings == list(range(1, 9))
+
+
+def test_open_many(server):
+    server.add_tower(TOWER_ID + 1, "Other Tower", size=6)
+    results = RingingRoomTower.open_many([TOWER_ID, TOWER_ID + 1, 1], server.url)
+    try:
+        assert isinstance(results[1], TowerNotFoundError)
+        for tower_id, size in [(TOWER_ID, 8), (TOWER_ID + 1, 6)]:
+            results[tower_id].wait_loaded()
+            assert results[tower_id].number_of_bells == size
+    finally:
+        for result in results.values():
+            if isinstance(result, RingingRoomTower):
+                result.__exit__(None, None, None)
+
+
+def test_wait_for_events(server):
+    with RingingRoomTower(TOWER_ID, server.url) as tower:
+        tower.wait_loaded()
+        # Waits only wake on events which happen after they start
+        threading.Timer(0.05, tower.call_bob).start()
+        assert tower.wait_for_call(call.BOB, timeout=TIMEOUT)
+        assert not tower.wait_for_call(call.BOB, timeout=0.1)
+
+        tower.set_size(6)
+        assert tower.wait_for_size(6, timeout=TIMEOUT)
+        server.add_user(TOWER_ID, 42, "Alice")
+        assert tower.wait_for_user("Alice", timeout=TIMEOUT)
+
+        tower.ring_bell(Bell.from_number(1), HANDSTROKE)
+        threading.Timer(0.05, tower.set_at_hand).start()
+        assert tower.wait_for_set_at_hand(timeout=TIMEOUT)
+        assert tower.get_stroke(Bell.from_number(1)) == HANDSTROKE
+
+
+def test_resync_only_reports_differences(tower):
+    tower.RESYNC_SETTLE_TIME = 0.2
+    events = []
+    tower.on_user_enter(lambda user_id, name: events.append(("enter", user_id)))
+    tower.on_user_leave(lambda user_id, name: events.append(("leave", user_id)))
+    tower.on_size_change(lambda size: events.append(("size", size)))
+    tower.on_set_at_hand(lambda: events.append("set at hand"))
+    tower._handle_signal("s_set_userlist", {"user_list": [{"user_id": 1, "username": "Alice"},
+                                                          {"user_id": 2, "username": "Bob"}]})
+    events.clear()
+
+    # The connection drops, and a ring is queued until it comes back
+    tower._outage_policy = OUTAGE_QUEUE
+    tower._on_disconnect()
+    tower._socket_io_client.connected = False
+    assert tower.ring_bell(Bell.from_number(1), HANDSTROKE)
+    assert tower._socket_io_client.emitted == []
+    tower._socket_io_client.connected = True
+    tower._on_connect()
+    assert [event for event, _ in tower._socket_io_client.emitted] == [
+        "c_join", "c_request_global_state", "c_bell_rung"
+    ]
+
+    # Whilst disconnected, Bob left and Carol arrived
+    tower._handle_signal("s_set_userlist", {"user_list": [{"user_id": 1, "username": "Alice"},
+                                                          {"user_id": 3, "username": "Carol"}]})
+    tower._handle_signal("s_size_change", {"size": 6})
+    tower._handle_signal("s_global_state", {"global_bell_state": [True] * 6})
+    assert events == []
+    assert wait_until(lambda: events)
+    assert events == [("leave", 2), ("enter", 3)]
+
+
+def test_outage_reject(tower):
+    tower._on_disconnect()
+    tower._socket_io_client.connected = False
+    with pytest.raises(SocketIOClientError):
+        tower.call_bob()
+
+
+def test_reconnects_after_server_restart():
+    pytest.importorskip("aiohttp")
+    from belltower.fake_server import FakeRingingRoomServer
+
+    entered = []
+    server = FakeRingingRoomServer()
+    server.add_tower(TOWER_ID, "Test Tower", size=8)
+    with server:
+        tower = RingingRoomTower(TOWER_ID, server.url)
+        tower.on_user_enter(lambda user_id, name: entered.append(name))
+        tower.__enter__()
+        tower.wait_loaded()
+    try:
+        assert wait_until(lambda: not tower.is_connected)
+
+        # Ringing Room comes back on the same port, with someone new in the tower
+        restarted = FakeRingingRoomServer(port=int(server.url.rsplit(":", 1)[1]))
+        restarted.add_tower(TOWER_ID, "Test Tower", size=8)
+        restarted.get_tower(TOWER_ID).users[7] = "Alice"
+        with restarted:
+            assert wait_until(lambda: entered == ["Alice"], timeout=10)
+            assert tower.is_connected
+            assert tower.number_of_bells == 8
+            assert tower.metrics.reconnects == 1
+    finally:
+        tower.__exit__(None, None, None)
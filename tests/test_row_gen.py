@@ -0,0 +1,88 @@
+""" Tests of `belltower.row_gen`, and the Wheatley signals of towers. """
+
+import logging
+
+import pytest
+
+from belltower import RingingRoomTower
+from belltower import row_gen
+from belltower.row_gen import compile_row_gen, spec_hash
+
+from conftest import TOWER_ID, wait_until
+
+PLAIN_BOB_MINOR = {"type": "method", "title": "Plain Bob Minor", "stage": 6,
+                   "place_notation": "x16x16x16,12", "bob": "14", "single": "1234"}
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    row_gen.clear_cache()
+    yield
+    row_gen.clear_cache()
+
+
+def test_methods_are_compiled_and_cached():
+    pytest.importorskip("numpy")
+    compiled = compile_row_gen(PLAIN_BOB_MINOR)
+    assert compiled.is_compiled and compiled.error is None
+    assert compiled.type == "method"
+    assert compiled.method.lead_length == 12
+    # A spec with the same contents (in any order) is only compiled once
+    reordered = dict(reversed(list(PLAIN_BOB_MINOR.items())))
+    assert spec_hash(reordered) == spec_hash(PLAIN_BOB_MINOR)
+    assert compile_row_gen(reordered) is compiled
+
+
+def test_compositions_are_not_compiled(caplog):
+    with caplog.at_level(logging.WARNING):
+        composition = compile_row_gen({"type": "composition", "url": "https://complib.org/1"})
+    assert not composition.is_compiled
+    assert composition.error is None
+    assert caplog.messages == []
+
+
+@pytest.mark.parametrize("spec, error", [
+    # Calls must be strings of place notation (rather than being converted to strings)
+    (dict(PLAIN_BOB_MINOR, bob=14), "The bob 14 isn't place notation"),
+    (dict(PLAIN_BOB_MINOR, single=None), "The single None isn't place notation"),
+    ({"type": "method", "stage": 6}, "Method spec has no place notation"),
+])
+def test_invalid_methods_are_not_compiled(caplog, spec, error):
+    with caplog.at_level(logging.WARNING, "ROW GEN"):
+        compiled = compile_row_gen(spec)
+    assert not compiled.is_compiled
+    assert compiled.error == error
+    assert len(caplog.records) == 1 and error in caplog.messages[0]
+
+
+def test_tower_handles_wheatley_signals():
+    tower = RingingRoomTower.offline(TOWER_ID)
+    settings, row_gens, stops = [], [], []
+    tower.on_setting_change(lambda name, value: settings.append((name, value)))
+    tower.on_row_gen_change(row_gens.append)
+    tower.on_stop_touch(lambda: stops.append(True))
+
+    new_settings = {"sensitivity": 0.6, "use_up_down_in": True}
+    tower._handle_signal("s_wheatley_setting", {"settings": new_settings})
+    tower._handle_signal("s_wheatley_row_gen", {"row_gen": {"type": "composition", "url": "x"}})
+    tower._handle_signal("s_wheatley_stop_touch", {})
+
+    assert settings == [("sensitivity", 0.6), ("use_up_down_in", True)]
+    assert dict(tower.wheatley_settings) == {"sensitivity": 0.6, "use_up_down_in": True}
+    assert [r.type for r in row_gens] == ["composition"]
+    assert tower.row_gen is row_gens[0]
+    assert stops == [True]
+
+
+def test_row_gen_against_server(server):
+    pytest.importorskip("numpy")
+    row_gens = []
+    tower = RingingRoomTower(TOWER_ID, server.url)
+    tower.on_row_gen_change(row_gens.append)
+    with tower:
+        tower.wait_loaded()
+        tower.set_row_gen(PLAIN_BOB_MINOR)
+        assert wait_until(lambda: len(row_gens) == 1)
+    # The echoed spec was already compiled when it was sent
+    assert row_gens[0] is compile_row_gen(PLAIN_BOB_MINOR)
+    assert tower.row_gen.method.name == "Plain Bob Minor"
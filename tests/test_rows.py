@@ -0,0 +1,78 @@
+""" Tests of `belltower.rows`. """
+
+from belltower import RingingRoomTower, Bell, HANDSTROKE, BACKSTROKE
+from belltower.rows import RowAssembler
+
+from conftest import TOWER_ID
+
+
+def bells(row_str):
+    return tuple(Bell.from_str(c) for c in row_str)
+
+
+def ring_signals(tower, row_str, start_time):
+    """ Passes the signals for a row rung in an offline tower, one blow per 0.1s. """
+    state = [tower.get_stroke(Bell.from_number(n)).is_hand()
+             for n in range(1, tower.number_of_bells + 1)]
+    for i, bell in enumerate(bells(row_str)):
+        state[bell.index] = not state[bell.index]
+        data = {"who_rang": bell.number, "global_bell_state": list(state)}
+        tower._handle_signal("s_bell_rung", data, start_time + i / 10)
+
+
+def test_add_blow():
+    rows = []
+    assembler = RowAssembler(number_of_bells=4)
+    assembler.on_row(lambda row, stroke, times: rows.append((row, stroke, list(times))))
+    for i, bell in enumerate(bells("1234")):
+        assembler.add_blow(bell, HANDSTROKE, i)
+    assert assembler.current_row == ()
+    for i, bell in enumerate(bells("21")):
+        assembler.add_blow(bell, BACKSTROKE, 4 + i)
+    assert assembler.current_row == bells("21")
+    assert assembler.stroke == BACKSTROKE
+    assert rows == [(bells("1234"), HANDSTROKE, [0, 1, 2, 3])]
+    assert assembler.rows_assembled == 1
+
+
+def test_incomplete_rows_are_discarded():
+    rows = []
+    assembler = RowAssembler(number_of_bells=3)
+    assembler.on_row(lambda row, stroke, times: rows.append((row, stroke)))
+    # The 2 rings twice in the same row, so the row restarts from its second blow
+    for bell in bells("12213"):
+        assembler.add_blow(bell, HANDSTROKE)
+    # A blow at the other stroke discards the unfinished row
+    assembler.add_blow(Bell.from_number(3), BACKSTROKE)
+    for bell in bells("123"):
+        assembler.add_blow(bell, HANDSTROKE)
+    assert rows == [(bells("213"), HANDSTROKE), (bells("123"), HANDSTROKE)]
+    assert assembler.incomplete_rows == 2
+
+
+def test_attached_to_tower():
+    tower = RingingRoomTower.offline(TOWER_ID)
+    tower._handle_signal("s_size_change", {"size": 4}, 0.0)
+    tower._handle_signal("s_global_state", {"global_bell_state": [True] * 4}, 0.0)
+
+    rows = []
+    changes = []
+    assembler = RowAssembler(tower)
+    assembler.on_row(lambda row, stroke, times: rows.append((row, stroke, list(times))))
+    assembler.on_change(changes.append)
+
+    # Blows are timed by their signals
+    ring_signals(tower, "1234", 10.0)
+    ring_signals(tower, "21", 11.0)
+    assert rows == [(bells("1234"), HANDSTROKE, [10.0, 10.1, 10.2, 10.3])]
+    # Setting the bells at hand discards the unfinished row
+    tower._handle_signal("s_global_state", {"global_bell_state": [True] * 4}, 12.0)
+    assert assembler.current_row == ()
+    assert assembler.stroke == HANDSTROKE
+    # As does changing the size, after which rows have the new number of bells
+    ring_signals(tower, "1", 13.0)
+    tower._handle_signal("s_size_change", {"size": 3}, 14.0)
+    ring_signals(tower, "132", 15.0)
+    assert rows[1:] == [(bells("132"), HANDSTROKE, [15.0, 15.1, 15.2])]
+    assert changes == [4, 3]
+    assert assembler.incomplete_rows == 0
@@ -0,0 +1,106 @@
+""" Tests of the strike schedulers in `belltower.scheduling`. """
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from belltower import RingingRoomTower, Bell, HANDSTROKE, BACKSTROKE
+from belltower.scheduling import StrikeScheduler, AsyncStrikeScheduler, bell_gap_for_peal_speed
+
+from conftest import TOWER_ID, wait_until
+
+ROUNDS = [Bell.from_number(n) for n in range(1, 5)]
+# A peal speed which gives a 10ms gap between 4 bells with a handstroke gap of 1
+PEAL_SPEED = 0.01 * 2520 * 9 / 60
+
+
+class RecordingTower:
+    """ Stands in for a tower, recording when each bell was rung. """
+
+    def __init__(self, clock=time.perf_counter, fail=()):
+        self.clock = clock
+        self.fail = fail
+        self.blows = []
+
+    def ring_bell(self, bell, stroke):
+        self.blows.append((bell, stroke, self.clock()))
+        return bell not in self.fail
+
+
+class AsyncRecordingTower(RecordingTower):
+    async def ring_bell(self, bell, stroke):
+        return RecordingTower.ring_bell(self, bell, stroke)
+
+
+def check_blows(blows, number_of_rows):
+    assert [(b, s) for b, s, _ in blows] == [
+        (bell, HANDSTROKE if row % 2 == 0 else BACKSTROKE)
+        for row in range(number_of_rows) for bell in ROUNDS
+    ]
+    # Every blow is rung at its own time (so late blows can't make the blows after them drift),
+    # where the gap before each handstroke row includes the handstroke gap.  The tolerance allows
+    # for the odd blow being delayed by other threads.
+    start = blows[0][2]
+    for i, (_, _, t) in enumerate(blows):
+        expected = 0.01 * i + 0.01 * (i // 8)
+        assert t - start == pytest.approx(expected, abs=0.03)
+
+
+def test_bell_gap_for_peal_speed():
+    assert bell_gap_for_peal_speed(PEAL_SPEED, 4) == pytest.approx(0.01)
+    # Ringing a 3 hour peal of Minor takes 5040 rows of 13 blows per whole pull
+    assert bell_gap_for_peal_speed(180, 6, 1.0) * 2520 * 13 == pytest.approx(180 * 60)
+
+
+def test_rows_are_rung_on_time():
+    tower = RecordingTower(fail={Bell.from_number(2)})
+    report = StrikeScheduler(tower, PEAL_SPEED).ring_rows([ROUNDS] * 6)
+    check_blows(tower.blows, 6)
+    assert report.rows_rung == 6
+    assert report.number_of_blows == 24
+    assert report.failed_blows == 6
+    assert report.max_lateness < 0.03
+
+
+def test_stop_from_another_thread():
+    tower = RecordingTower()
+    scheduler = StrikeScheduler(tower, PEAL_SPEED)
+    threading.Timer(0.1, scheduler.stop).start()
+    start = time.perf_counter()
+    report = scheduler.ring_rows(iter(lambda: ROUNDS, None))
+    assert time.perf_counter() - start == pytest.approx(0.1, abs=0.05)
+    assert 0 < report.rows_rung < 20
+
+
+def test_async_rows_are_rung_on_time():
+    async def main():
+        tower = AsyncRecordingTower(asyncio.get_event_loop().time)
+        scheduler = AsyncStrikeScheduler(tower, PEAL_SPEED)
+        report = await scheduler.ring_rows([ROUNDS] * 4)
+        check_blows(tower.blows, 4)
+        assert report.rows_rung == 4
+
+        # Stopping doesn't ring any more blows
+        asyncio.get_event_loop().call_later(0.05, scheduler.stop)
+        report = await scheduler.ring_rows(iter(lambda: ROUNDS, None))
+        assert 0 < report.rows_rung < 10
+        assert len(tower.blows) == 16 + report.number_of_blows
+
+    asyncio.run(main())
+
+
+def test_ring_rows_against_server(server):
+    rings = []
+    tower = RingingRoomTower(TOWER_ID, server.url)
+    tower.on_bell_ring(lambda bell, stroke: rings.append(bell))
+    with tower:
+        tower.wait_loaded()
+        tower.set_size(4)
+        assert wait_until(lambda: tower.number_of_bells == 4)
+        report = tower.ring_rows([ROUNDS] * 2, peal_speed=PEAL_SPEED)
+        assert wait_until(lambda: len(rings) == 8)
+    assert report.failed_blows == 0
+    assert rings == ROUNDS * 2
+    assert server.get_tower(TOWER_ID).bell_state == [True] * 4
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+import belltower.tower_pool
+from belltower import AsyncRingingRoomTower, TowerPool
+from belltower.ringing_room import InvalidRRVersionError
+
+
+class FakeTower(AsyncRingingRoomTower):
+    """ An `AsyncRingingRoomTower` which pretends to connect, counting how often it does so. """
+
+    connects = 0
+    version_checks = 0
+    fail_ids = set()
+    bad_version_servers = set()
+
+    async def load_metadata(self):
+        self._url = f"http://server{self.tower_id % 2}/"
+
+    async def check_version(self):
+        FakeTower.version_checks += 1
+        await asyncio.sleep(0.01)
+        if self._url in self.bad_version_servers:
+            raise InvalidRRVersionError("2.0", "1.0")
+
+    async def connect(self):
+        FakeTower.connects += 1
+        await asyncio.sleep(0.01)
+        if self.tower_id in self.fail_ids:
+            raise ConnectionError("server not available")
+        self.connected = True
+
+    async def wait_loaded(self):
+        await asyncio.sleep(0.01)
+        self._handle_signal("s_global_state", {"global_bell_state": [True] * 8})
+
+    async def disconnect(self):
+        self.connected = False
+
+    @property
+    def is_connected(self):
+        return getattr(self, "connected", False)
+
+
+@pytest.fixture(autouse=True)
+def fake_towers(monkeypatch):
+    monkeypatch.setattr(belltower.tower_pool, "AsyncRingingRoomTower", FakeTower)
+    monkeypatch.setattr(FakeTower, "connects", 0)
+    monkeypatch.setattr(FakeTower, "version_checks", 0)
+    monkeypatch.setattr(FakeTower, "fail_ids", set())
+    monkeypatch.setattr(FakeTower, "bad_version_servers", set())
+
+
+def test_concurrent_joins_share_one_loaded_tower():
+    async def main():
+        async with TowerPool() as pool:
+            towers = await asyncio.gather(pool.join(1), pool.join(1), pool.join(1))
+            assert towers[0] is towers[1] is towers[2]
+            assert towers[0].number_of_bells == 8
+            assert FakeTower.connects == 1
+            assert len(pool) == 1
+            assert pool.health().is_healthy
+
+    asyncio.run(main())
+
+
+def test_failed_join_is_not_added():
+    async def main():
+        FakeTower.fail_ids.add(3)
+        async with TowerPool() as pool:
+            results = await asyncio.gather(pool.join(3), pool.join(3), return_exceptions=True)
+            assert all(isinstance(r, ConnectionError) for r in results)
+            assert FakeTower.connects == 1
+            assert 3 not in pool
+            # A later join tries again
+            FakeTower.fail_ids.clear()
+            tower = await pool.join(3)
+            assert tower.is_connected
+            assert pool.get(3) is tower
+
+    asyncio.run(main())
+
+
+def test_version_checked_once_per_server():
+    async def main():
+        FakeTower.bad_version_servers.add("http://server1/")
+        async with TowerPool() as pool:
+            results = await pool.join_many(range(6))
+            assert FakeTower.version_checks == 2
+            assert sorted(pool.towers_by_server()) == ["http://server0/"]
+            assert all(isinstance(results[i], InvalidRRVersionError) for i in (1, 3, 5))
+            # Towers on the incompatible server are never connected
+            assert FakeTower.connects == 3
+
+    asyncio.run(main())
+
+
+def test_close_leaves_every_tower():
+    async def main():
+        pool = TowerPool()
+        towers = await pool.join_many([2, 4])
+        pending = asyncio.ensure_future(pool.join(6))
+        await asyncio.sleep(0)
+        await pool.close()
+        assert len(pool) == 0
+        assert not any(t.is_connected for t in towers.values())
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+
+    asyncio.run(main())
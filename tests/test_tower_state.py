@@ -0,0 +1,83 @@
+""" Tests of `belltower.tower_state`, and the snapshots held by towers. """
+
+import pytest
+
+from belltower import RingingRoomTower, Bell, HANDSTROKE, BACKSTROKE
+from belltower.tower_state import TowerState
+
+from conftest import TOWER_ID
+
+
+def bell(number):
+    return Bell.from_number(number)
+
+
+def test_updates_return_new_snapshots():
+    empty = TowerState()
+    state = empty.with_size(6).with_user(1, "Alice").with_user(2, "Bob")
+    state = state.with_assignment(bell(1), 1).with_assignment(bell(5), 2)
+    state = state.with_assignment(bell(3), 1)
+    assert empty.number_of_bells == 0 and len(empty.users) == 0
+    assert state.number_of_bells == 6
+    assert dict(state.users) == {1: "Alice", 2: "Bob"}
+    assert state.bells_of(1) == (bell(1), bell(3))
+    assert state.bells_of(3) == ()
+    assert state.has_bell(bell(6)) and not state.has_bell(bell(7))
+    # The snapshots are read-only
+    with pytest.raises(TypeError):
+        state.users[3] = "Charlie"
+    with pytest.raises(AttributeError):
+        state.colour = "red" # pylint: disable=assigning-non-slot
+
+    # Unassigning bells
+    unassigned = state.with_assignment(bell(1), None)
+    assert unassigned.bells_of(1) == (bell(3),)
+    assert state.bells_of(1) == (bell(1), bell(3))
+
+
+def test_removing_users_and_bells():
+    state = TowerState(8, {1: "Alice", 2: "Bob"}, {bell(2): 1, bell(7): 1, bell(8): 2})
+    left = state.without_user(1)
+    assert dict(left.users) == {2: "Bob"}
+    assert dict(left.assignments) == {bell(8): 2}
+    assert left.bells_of(1) == ()
+    # Shrinking the tower removes the assignments of bells which no longer exist
+    smaller = state.with_size(6)
+    assert dict(smaller.assignments) == {bell(2): 1}
+    assert smaller.bells_of(2) == ()
+    # Unchanged parts of the snapshot are shared
+    assert smaller.users is state.users
+    assert state.with_size(10).assignments is state.assignments
+    cleared = state.without_users()
+    assert cleared.number_of_bells == 8
+    assert len(cleared.users) == len(cleared.assignments) == 0
+
+
+def test_ringing_doesnt_replace_snapshot():
+    tower = RingingRoomTower.offline(TOWER_ID)
+    tower._handle_signal("s_size_change", {"size": 6})
+    tower._handle_signal("s_user_entered", {"user_id": 1, "username": "Alice"})
+    tower._handle_signal("s_assign_user", {"bell": 2, "user": 1})
+    snapshot = tower.state
+    tower._handle_signal("s_bell_rung", {"who_rang": 2,
+                                         "global_bell_state": [True, False] + [True] * 4})
+    assert tower.state is snapshot
+    assert tower.get_stroke(bell(2)) == BACKSTROKE
+    assert tower.get_stroke(bell(1)) == HANDSTROKE
+    assert tower.get_bells_of(1) == (bell(2),)
+    # Structural changes make a new snapshot, leaving the old one untouched
+    tower._handle_signal("s_size_change", {"size": 4})
+    assert tower.state is not snapshot
+    assert snapshot.number_of_bells == 6
+    assert tower.number_of_bells == 4
+
+
+def test_user_leaving_is_removed():
+    tower = RingingRoomTower.offline(TOWER_ID)
+    tower._handle_signal("s_size_change", {"size": 6})
+    tower._handle_signal("s_user_entered", {"user_id": 1, "username": "Alice"})
+    tower._handle_signal("s_assign_user", {"bell": 3, "user": 1})
+    tower._handle_signal("s_user_left", {"user_id": 1, "username": "Alice"})
+    assert len(tower.all_users) == 0
+    assert tower.get_assignment(bell(3)) is None
+    assert tower.get_bells_of(1) == ()
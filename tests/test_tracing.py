@@ -0,0 +1,73 @@
+""" Tests of `belltower.tracing`, and the trace points of towers. """
+
+import logging
+
+import pytest
+
+from belltower import RingingRoomTower, Bell, HANDSTROKE, tracing
+from belltower.tracing import Tracer, RingBufferSink, LoggingSink, BellStates
+
+from conftest import TOWER_ID
+
+
+def test_inactive_until_a_sink_is_added():
+    tracer = Tracer()
+    assert not tracer.enabled_for(tracing.SIGNAL)
+    sink = tracer.add_sink(RingBufferSink())
+    assert tracer.enabled_for(tracing.SIGNAL)
+    tracer.remove_sink(sink)
+    assert not tracer.active
+
+
+def test_sampling():
+    tracer = Tracer()
+    tracer.add_sink(RingBufferSink())
+    tracer.set_sample_rate(tracing.BELL_RUNG, 0.25)
+    tracer.set_sample_rate(tracing.EMIT, 0)
+    sampled = [tracer.enabled_for(tracing.BELL_RUNG) for _ in range(8)]
+    assert sampled == [True, False, False, False] * 2
+    assert not tracer.enabled_for(tracing.EMIT)
+    # Other kinds are always traced
+    assert tracer.enabled_for(tracing.SIGNAL)
+    with pytest.raises(ValueError):
+        tracer.set_sample_rate(tracing.SIGNAL, 2)
+
+
+def test_ring_buffer():
+    tracer = Tracer()
+    sink = tracer.add_sink(RingBufferSink(capacity=2))
+    data = {"global_bell_state": [True, True]}
+    tracer.trace(tracing.SIGNAL, "s_global_state", data)
+    # Changing the data afterwards doesn't change the record
+    data["global_bell_state"][0] = False
+    assert sink.records()[0].fields[1] == {"global_bell_state": [True, True]}
+    # Only the most recent records are kept
+    tracer.trace(tracing.CONNECT, "http://localhost/")
+    tracer.trace(tracing.RESYNCED)
+    assert [r.kind for r in sink.records()] == [tracing.CONNECT, tracing.RESYNCED]
+    sink.clear()
+    assert sink.records() == []
+
+
+def test_logging_sink(caplog):
+    tracer = Tracer()
+    tracer.add_sink(LoggingSink(logging.getLogger("TEST")))
+    with caplog.at_level(logging.DEBUG, "TEST"):
+        tracer.trace(tracing.BELL_RUNG, Bell.from_number(2), HANDSTROKE, BellStates(0b101, 3))
+    assert caplog.messages == ["RECEIVED: Bell 2 rang at HANDSTROKE, bells 'HBH'"]
+
+
+def test_tower_trace_points(caplog):
+    tower = RingingRoomTower.offline(TOWER_ID)
+    sink = tower.tracer.add_sink(RingBufferSink())
+    tower._handle_signal("s_size_change", {"size": 4})
+    tower._handle_signal("s_bell_rung", {"who_rang": 1, "global_bell_state": [False] + [True] * 3})
+    records = sink.records()
+    assert [r.kind for r in records] == [tracing.SIGNAL, tracing.SIGNAL, tracing.BELL_RUNG]
+    assert records[2].format() == "RECEIVED: Bell 1 rang at HANDSTROKE, bells 'BHHH'"
+
+    # The records are dumped with the rest of the tower's state
+    with caplog.at_level(logging.WARNING):
+        tower.dump_debug_state()
+    assert "===== LAST 3 TRACE RECORDS =====" in caplog.messages
+    assert any("RECEIVED: 's_size_change'" in message for message in caplog.messages)
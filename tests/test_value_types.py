@@ -0,0 +1,47 @@
+import copy
+import pickle
+
+import pytest
+
+from belltower import Bell, Stroke, HANDSTROKE, BACKSTROKE, BellType, HAND_BELLS, TOWER_BELLS
+from belltower.bell import MAX_BELL
+
+
+def test_bells_are_interned():
+    assert Bell.from_number(3) is Bell.from_index(2) is Bell.from_str("3") is Bell(2)
+    assert Bell.from_str("E") is Bell.from_number(11)
+    assert Bell.from_number(1) != Bell.from_number(2)
+    assert {Bell.from_number(1): "treble"}[Bell.from_index(0)] == "treble"
+
+
+def test_bell_ranges():
+    for bad in (0, MAX_BELL + 1):
+        with pytest.raises(ValueError):
+            Bell.from_number(bad)
+    with pytest.raises(ValueError):
+        Bell.from_index(-1)
+    with pytest.raises(ValueError):
+        Bell.from_str("?")
+
+
+def test_strokes_and_bell_types_are_interned():
+    assert Stroke(True) is HANDSTROKE
+    assert Stroke(False) is BACKSTROKE
+    assert HANDSTROKE.opposite() is BACKSTROKE
+    assert Stroke.from_index(1) is BACKSTROKE
+    assert BellType(True) is HAND_BELLS
+    assert BellType(False) is TOWER_BELLS
+
+
+@pytest.mark.parametrize("value", [Bell.from_number(7), HANDSTROKE, BACKSTROKE, HAND_BELLS])
+def test_copies_stay_interned(value):
+    assert copy.copy(value) is value
+    assert copy.deepcopy(value) is value
+    assert pickle.loads(pickle.dumps(value)) is value
+
+
+def test_slots():
+    with pytest.raises(AttributeError):
+        Bell.from_number(1).colour = "red"
+    with pytest.raises(AttributeError):
+        HANDSTROKE.colour = "red"